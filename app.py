@@ -1,15 +1,68 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, jsonify, session
+from flask import Flask, Request, render_template, request, redirect, url_for, flash, send_from_directory, send_file, jsonify, session
 import json
 import os
 import uuid
 import base64
 import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
-from compreface_client import cadastrar_face, deletar_face
+import math
+import requests
+from compreface_client import CompreFaceIndisponivel, cadastrar_face, deletar_face, obter_cliente, reconhecer_face
+from metadata_store import criar_backend
+from job_queue import FilaJobs
+from recognition_cache import CacheReconhecimento
+from image_pipeline import (
+    THUMBNAIL_SIZES, ImagemInvalida, gerar_thumbnail, gerar_thumbnails,
+    hash_conteudo, hash_perceptual, normalizar_imagem
+)
 from functools import wraps
 
+# 📦 Limites de upload
+MAX_UPLOAD_BYTES = int(os.environ.get("FACE_MANAGER_MAX_UPLOAD_BYTES", 20 * 1024 * 1024))
+MAX_REQUEST_BYTES = int(os.environ.get("FACE_MANAGER_MAX_REQUEST_BYTES", 64 * 1024 * 1024))
+
+class UploadLimitado:
+    """Arquivo temporário em disco que recusa partes maiores que o limite"""
+    
+    def __init__(self, limite):
+        self._arquivo = tempfile.TemporaryFile()
+        self._limite = limite
+        self._escritos = 0
+    
+    def write(self, dados):
+        self._escritos += len(dados)
+        if self._escritos > self._limite:
+            raise RequestEntityTooLarge()
+        return self._arquivo.write(dados)
+    
+    def __getattr__(self, nome):
+        return getattr(self._arquivo, nome)
+
+# 📦 Cadastro em lote: o NDJSON é lido linha a linha, então o limite pode ser maior
+MAX_BATCH_REQUEST_BYTES = int(os.environ.get("FACE_MANAGER_MAX_BATCH_REQUEST_BYTES", 1024 * 1024 * 1024))
+
+class FaceManagerRequest(Request):
+    """Request que grava arquivos de multipart/form-data direto em disco (sem buffer em memória)"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return UploadLimitado(MAX_UPLOAD_BYTES)
+    
+    @property
+    def max_content_length(self):
+        if self.url_rule is not None and self.url_rule.endpoint == "api_cadastrar_lote":
+            return MAX_BATCH_REQUEST_BYTES
+        return super().max_content_length
+
 app = Flask(__name__)
 app.secret_key = 'sua_chave_secreta_multi_cliente_face_manager_2024'
+app.request_class = FaceManagerRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
 
 # 🌐 Tentar importar flask-cors, se falhar usar método manual
 try:
@@ -52,7 +105,7 @@ def after_request(response):
     response = add_cors_headers(response)
     
     # Adicionar anti-cache para rotas específicas
-    if request.endpoint in ['client_dashboard', 'editar', 'deletar', 'api_listar_pessoas']:
+    if request.endpoint in ['client_dashboard', 'editar', 'deletar', 'api_listar_pessoas', 'api_obter_job']:
         response = add_no_cache_headers(response)
     
     return response
@@ -74,6 +127,16 @@ CLIENTS_FOLDER = "clients"
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 DEFAULT_CLIENT = "carrefour"
 
+# 🗄️ Backend de metadados (FACE_MANAGER_STORAGE=json|sqlite)
+metadata_backend = criar_backend(clients_folder=CLIENTS_FOLDER)
+
+# ⏳ Fila de cadastros assíncronos (estado em disco, visível a todos os workers)
+JOBS_FOLDER = os.environ.get("FACE_MANAGER_JOBS_FOLDER", "jobs")
+fila_jobs = FilaJobs(JOBS_FOLDER)
+
+# 🧠 Cache de reconhecimento (cliente + hash da imagem normalizada)
+cache_reconhecimento = CacheReconhecimento()
+
 # 📁 Lista de clientes disponíveis
 AVAILABLE_CLIENTS = {
     "carrefour": "Carrefour",
@@ -82,6 +145,38 @@ AVAILABLE_CLIENTS = {
     "buybye": "Buybye"
 }
 
+# 📄 Paginação da listagem de pessoas
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+LISTAGEM_PARAMS = {"limit", "cursor", "fields", "name_prefix", "email_prefix", "created_after"}
+SEARCH_LIMIT = 20
+
+# 📦 Cadastro em lote
+BATCH_MAX_ITEMS = int(os.environ.get("FACE_MANAGER_BATCH_MAX_ITEMS", 10000))
+BATCH_CONCURRENCY = int(os.environ.get("FACE_MANAGER_BATCH_CONCURRENCY", 8))
+RECOGNIZE_BATCH_MAX_IMAGES = int(os.environ.get("FACE_MANAGER_RECOGNIZE_BATCH_MAX_IMAGES", 100))
+# Exclusão em lote/purga: metadados gravados a cada bloco de exclusões concluídas
+DELETE_CHUNK_SIZE = int(os.environ.get("FACE_MANAGER_DELETE_CHUNK_SIZE", 200))
+
+# 🧬 Cadastro da mesma foto: recusado com referência ao subject existente (allow_duplicate libera)
+DEDUP_IMAGES = int(os.environ.get("FACE_MANAGER_DEDUP_IMAGES", 1))
+# > 0 também recusa fotos quase iguais (recomprimidas/redimensionadas) pelo hash perceptual
+DEDUP_DHASH_DISTANCE = int(os.environ.get("FACE_MANAGER_DEDUP_DHASH_DISTANCE", 0))
+
+# 🖼️ Imagens versionadas por hash (thumbnails gerados no cadastro)
+IMAGE_VARIANTS = {"original"} | {str(tamanho) for tamanho in THUMBNAIL_SIZES}
+IMAGE_VERSION_LENGTH = 16
+IMAGE_CACHE_MAX_AGE = 31536000  # 1 ano: a URL muda quando a imagem muda
+
+# 📊 Paginação do dashboard
+DASHBOARD_PAGE_SIZE = 50
+MAX_DASHBOARD_PAGE_SIZE = 200
+DASHBOARD_SORT_FIELDS = {
+    "name": "Nome",
+    "email": "Email",
+    "created_at": "Data de cadastro"
+}
+
 # =====================
 # 🛠️ FUNÇÕES UTILITÁRIAS
 # =====================
@@ -92,27 +187,16 @@ def get_client_path(cliente, subfolder=""):
         return os.path.join(CLIENTS_FOLDER, cliente, subfolder)
     return os.path.join(CLIENTS_FOLDER, cliente)
 
-def get_metadata_file(cliente):
-    """Retorna o caminho do arquivo metadata.json do cliente"""
-    return os.path.join(get_client_path(cliente), "metadata.json")
-
 def get_faces_folder(cliente):
     """Retorna o caminho da pasta faces do cliente"""
     return get_client_path(cliente, "faces")
 
 def ensure_client_structure(cliente):
     """Garante que a estrutura de pastas do cliente existe"""
-    client_folder = get_client_path(cliente)
     faces_folder = get_faces_folder(cliente)
-    metadata_file = get_metadata_file(cliente)
     
     # Criar pastas se não existirem
     os.makedirs(faces_folder, exist_ok=True)
-    
-    # Criar metadata.json se não existir
-    if not os.path.exists(metadata_file):
-        with open(metadata_file, "w", encoding="utf-8") as f:
-            json.dump({}, f, indent=2, ensure_ascii=False)
 
 def validate_client(cliente):
     """Valida se o cliente existe na lista de clientes disponíveis"""
@@ -122,21 +206,332 @@ def allowed_file(filename):
     """Verifica se o arquivo tem extensão permitida"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def carregar_metadata(cliente):
-    """Carrega os metadados do cliente específico"""
+def agora_iso():
+    """Timestamp atual em UTC no formato ISO 8601 (usado em created_at)"""
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def codificar_cursor(subject_id):
+    """Cursor opaco de paginação a partir do último subject_id da página"""
+    return base64.urlsafe_b64encode(subject_id.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decodificar_cursor(cursor):
+    """Inverso de codificar_cursor. Lança ValueError se o cursor for inválido"""
+    try:
+        # validate=True: caracteres fora do alfabeto não são descartados em silêncio
+        subject_id = base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode("utf-8")
+    except Exception:
+        raise ValueError("cursor inválido")
+    if not subject_id:
+        raise ValueError("cursor inválido")
+    return subject_id
+
+def ler_filtros_listagem(args):
+    """Extrai os filtros name_prefix, email_prefix e created_after da query string"""
+    filtros = {}
+    for campo in ("name_prefix", "email_prefix"):
+        if args.get(campo):
+            filtros[campo] = args[campo]
+    if args.get("created_after"):
+        try:
+            data = datetime.fromisoformat(args["created_after"].replace("Z", "+00:00"))
+        except ValueError:
+            raise ValueError("created_after deve estar no formato ISO 8601")
+        if data.tzinfo is None:
+            data = data.replace(tzinfo=timezone.utc)
+        filtros["created_after"] = data.astimezone(timezone.utc).isoformat(timespec="seconds")
+    return filtros
+
+def projetar_pessoa(pessoa, campos):
+    """Retorna só os campos pedidos em fields= (ou a pessoa inteira)"""
+    if not campos:
+        return pessoa
+    return {campo: pessoa[campo] for campo in campos if campo in pessoa}
+
+class CadastroDuplicado(Exception):
+    """Outro cadastro gravou o mesmo email/imagem antes deste (ex: jobs assíncronos concorrentes)"""
+
+    def __init__(self, conflitos):
+        mensagem = ("Email já cadastrado para este cliente" if conflitos.get("duplicate_email_of")
+                    else "Imagem já cadastrada para este cliente")
+        super().__init__(mensagem)
+        self.conflitos = conflitos
+        self.detalhes = {"status": 409, **conflitos}
+
+def verificar_duplicados(cliente, email, telefone):
+    """Retorna os subject_ids que já usam o email/telefone (chaves vazias são omitidas)"""
     ensure_client_structure(cliente)
-    metadata_file = get_metadata_file(cliente)
+    duplicados = {
+        "duplicate_email_of": sorted(metadata_backend.ids_com_email(cliente, email)),
+        "duplicate_phone_of": sorted(metadata_backend.ids_com_telefone(cliente, telefone))
+    }
+    return {chave: ids for chave, ids in duplicados.items() if ids}
+
+def verificar_imagem_duplicada(cliente, image_data):
+    """Retorna {"duplicate_image_of": [...]} se a imagem normalizada já está cadastrada no cliente"""
+    if not DEDUP_IMAGES:
+        return {}
+    ids = metadata_backend.ids_com_imagem(cliente, hash_conteudo(image_data))
+    if DEDUP_DHASH_DISTANCE > 0:
+        ids |= metadata_backend.ids_com_imagem_parecida(cliente, hash_perceptual(image_data), DEDUP_DHASH_DISTANCE)
+    return {"duplicate_image_of": sorted(ids)} if ids else {}
+
+def get_thumbnail_path(cliente, subject_id, tamanho):
+    """Retorna o caminho do thumbnail de uma pessoa (faces/thumbs/<tamanho>/<id>.jpg)"""
+    return os.path.join(get_faces_folder(cliente), "thumbs", str(tamanho), f"{subject_id}.jpg")
+
+def gerar_thumbnails_pessoa(cliente, subject_id, img_path):
+    """Gera os thumbnails no cadastro (falha não impede o cadastro)"""
+    try:
+        gerar_thumbnails(img_path, lambda tamanho: get_thumbnail_path(cliente, subject_id, tamanho))
+    except Exception as e:
+        print(f"⚠️ Aviso: Erro ao gerar thumbnails de {subject_id}: {e}")
+
+def garantir_thumbnail(cliente, subject_id, img_path, tamanho):
+    """Caminho do thumbnail, gerando na hora para pessoas cadastradas antes dos thumbnails"""
+    thumb_path = get_thumbnail_path(cliente, subject_id, tamanho)
+    if not os.path.exists(thumb_path):
+        gerar_thumbnail(img_path, thumb_path, tamanho)
+    return thumb_path
+
+def remover_arquivos_imagem(cliente, subject_id, pessoa):
+    """Remove a imagem e os thumbnails da pessoa. Retorna os caminhos removidos"""
+    caminhos = [os.path.join(get_faces_folder(cliente), pessoa["image"])]
+    caminhos += [get_thumbnail_path(cliente, subject_id, tamanho) for tamanho in THUMBNAIL_SIZES]
+    removidos = []
+    for caminho in caminhos:
+        if os.path.exists(caminho):
+            os.remove(caminho)
+            removidos.append(caminho)
+    return removidos
+
+@app.template_global()
+def url_imagem(cliente, subject_id, pessoa, variante="original"):
+    """URL versionada pelo hash da imagem (cache imutável no navegador)
+
+    Somente leitura: pessoas antigas sem image_hash recebem a URL sem versão
+    (revalidada pelo navegador) até `python metadata_store.py hashes`.
+    """
+    image_hash = pessoa.get("image_hash")
+    if not image_hash:
+        return url_for('uploaded_file', cliente=cliente, filename=pessoa["image"])
     
-    with open(metadata_file, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return url_for(
+        'imagem_versionada',
+        cliente=cliente,
+        subject_id=subject_id,
+        versao=image_hash[:IMAGE_VERSION_LENGTH],
+        variante=str(variante)
+    )
 
-def salvar_metadata(cliente, metadata):
-    """Salva os metadados do cliente específico"""
+def valor_verdadeiro(valor):
+    """Interpreta booleanos vindos de JSON ou de campos de formulário ("true", "1")"""
+    if isinstance(valor, str):
+        return valor.strip().lower() in ("1", "true", "sim", "yes", "on")
+    return bool(valor)
+
+def salvar_imagem_pessoa(cliente, data, image_data):
+    """Grava a imagem normalizada e os thumbnails. Retorna (subject_id, pessoa)"""
     ensure_client_structure(cliente)
-    metadata_file = get_metadata_file(cliente)
+    subject_id = str(uuid.uuid4())
+    filename = secure_filename(f"{subject_id}.jpg")
+    img_path = os.path.join(get_faces_folder(cliente), filename)
+    
+    with open(img_path, "wb") as f:
+        f.write(image_data)
+    gerar_thumbnails_pessoa(cliente, subject_id, img_path)
+    
+    pessoa = {
+        "name": data["name"],
+        "email": data["email"],
+        "phone": data["phone"],
+        "image": filename,
+        "image_hash": hash_conteudo(image_data),
+        "image_dhash": hash_perceptual(image_data),
+        "created_at": agora_iso()
+    }
+    return subject_id, pessoa
+
+def enviar_compreface(cliente, subject_id, pessoa):
+    """Cadastra a face salva no CompreFace. Retorna (api_subject_id, compreface_response)
+
+    Se o CompreFace recusar a face, os arquivos gravados são removidos.
+    """
+    api_subject_id = f"{cliente}_{subject_id}"
+    img_path = os.path.join(get_faces_folder(cliente), pessoa["image"])
+    try:
+        compreface_response = cadastrar_face(img_path, api_subject_id)
+    except Exception:
+        remover_arquivos_imagem(cliente, subject_id, pessoa)
+        raise
+    # A nova face pode mudar qualquer reconhecimento já guardado do cliente
+    cache_reconhecimento.invalidar_cliente(cliente)
+    return api_subject_id, compreface_response
+
+def deletar_face_cliente(cliente, subject_id):
+    """Deleta a face no CompreFace e invalida os reconhecimentos em cache que a citam"""
+    api_subject_id = f"{cliente}_{subject_id}"
+    try:
+        return deletar_face(api_subject_id)
+    finally:
+        # Só depois da exclusão: um reconhecimento feito enquanto ela corria ainda
+        # encontraria a face e seria guardado. Também após falha/timeout, em que o
+        # CompreFace pode ter removido a face mesmo assim.
+        cache_reconhecimento.invalidar_subject(cliente, api_subject_id)
+
+def confirmar_cadastro(cliente, subject_id, pessoa, permitir_duplicado=False):
+    """Cadastra a face no CompreFace e só então grava os metadados
+
+    Sem permitir_duplicado, a gravação confere de novo (atomicamente) email e
+    imagem: se outro cadastro chegou antes, desfaz este e levanta CadastroDuplicado.
+    """
+    api_subject_id, compreface_response = enviar_compreface(cliente, subject_id, pessoa)
+    
+    # Salvar metadados
+    if permitir_duplicado:
+        metadata_backend.gravar(cliente, subject_id, pessoa)
+        return api_subject_id, compreface_response
+    conflitos = metadata_backend.gravar_se_unico(cliente, subject_id, pessoa, imagem=bool(DEDUP_IMAGES))
+    if conflitos:
+        try:
+            deletar_face_cliente(cliente, subject_id)
+        finally:
+            remover_arquivos_imagem(cliente, subject_id, pessoa)
+        raise CadastroDuplicado(conflitos)
+    return api_subject_id, compreface_response
+
+def registrar_pessoa(cliente, data, image_data, permitir_duplicado=False):
+    """Salva a imagem normalizada, cadastra no CompreFace e grava os metadados
+
+    Retorna (subject_id, api_subject_id, compreface_response, pessoa).
+    """
+    subject_id, pessoa = salvar_imagem_pessoa(cliente, data, image_data)
+    api_subject_id, compreface_response = confirmar_cadastro(cliente, subject_id, pessoa, permitir_duplicado)
+    return subject_id, api_subject_id, compreface_response, pessoa
+
+def executar_job_cadastro(dados):
+    """Tarefa da fila: conclui um cadastro cuja imagem já foi salva"""
+    cliente, subject_id, pessoa = dados["client"], dados["subject_id"], dados["person"]
+    permitir_duplicado = dados.get("allow_duplicate", False)
+    if not permitir_duplicado:
+        # A verificação da requisição não enxerga jobs ainda na fila: confere antes do CompreFace
+        ids_email = metadata_backend.ids_com_email(cliente, pessoa["email"])
+        ids_imagem = metadata_backend.ids_com_imagem(cliente, pessoa.get("image_hash")) if DEDUP_IMAGES else set()
+        conflitos = {chave: sorted(ids) for chave, ids in
+                     (("duplicate_email_of", ids_email), ("duplicate_image_of", ids_imagem)) if ids}
+        if conflitos:
+            remover_arquivos_imagem(cliente, subject_id, pessoa)
+            raise CadastroDuplicado(conflitos)
+    api_subject_id, compreface_response = confirmar_cadastro(cliente, subject_id, pessoa, permitir_duplicado)
+    return {
+        "subject_id": dados["subject_id"],
+        "api_subject_id": api_subject_id,
+        "compreface_response": compreface_response,
+        "person": dados["person"]
+    }
+
+def descartar_job_cadastro(job):
+    """Remove a imagem de um cadastro assíncrono interrompido antes de confirmar"""
+    dados = job["data"]
+    remover_arquivos_imagem(dados["client"], dados["subject_id"], dados["person"])
+
+TAREFAS_JOBS = {"enroll": executar_job_cadastro}
+fila_jobs.recuperar(TAREFAS_JOBS, ao_falhar=descartar_job_cadastro)
+
+def ler_itens_lote():
+    """Itens do lote: NDJSON (um JSON por linha, lido em streaming), lista JSON ou {"persons": [...]}
+
+    Gera (indice, item, erro). Linhas inválidas viram erro do item, sem abortar o lote.
+    """
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        indice = 0
+        for linha in request.stream:
+            if not linha.strip():
+                continue
+            try:
+                yield indice, json.loads(linha), None
+            except ValueError as e:
+                yield indice, None, f"JSON inválido: {e}"
+            indice += 1
+        return
+    
+    if (request.content_length or 0) > MAX_REQUEST_BYTES:
+        raise RequestEntityTooLarge("Lotes grandes devem usar NDJSON (application/x-ndjson)")
+    data = request.get_json()
+    itens = data.get("persons") if isinstance(data, dict) else data
+    if not isinstance(itens, list):
+        raise ValueError('Envie uma lista de pessoas, {"persons": [...]} ou NDJSON')
+    for indice, item in enumerate(itens):
+        yield indice, item, None
+
+def cadastrar_item_lote(cliente, item, emails_lote, imagens_lote, lock_lote):
+    """Valida, normaliza e envia ao CompreFace um item do lote (sem gravar metadados)
+
+    Retorna (resultado, subject_id, pessoa); subject_id é None quando o item falhou.
+    O email e a imagem reservados no lote são liberados se o item falhar.
+    """
+    if not isinstance(item, dict):
+        return {"status": 400, "error": "Item deve ser um objeto JSON"}, None, None
+    for field in ("name", "email", "phone", "image_base64"):
+        if field not in item:
+            return {"status": 400, "error": f"Campo obrigatório: {field}"}, None, None
     
-    with open(metadata_file, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    permitir_duplicado = valor_verdadeiro(item.get("allow_duplicate"))
+    email = str(item["email"]).strip().lower()
+    email_reservado = image_hash = None
+    cadastrado = False
+    try:
+        # Duplicado na base ou repetido dentro do próprio lote
+        duplicados = verificar_duplicados(cliente, item["email"], item["phone"])
+        with lock_lote:
+            repetido = email in emails_lote
+            if not repetido:
+                emails_lote.add(email)
+                email_reservado = email
+        if (duplicados.get("duplicate_email_of") or repetido) and not permitir_duplicado:
+            return {"status": 409, "error": "Email já cadastrado para este cliente", **duplicados}, None, None
+        
+        try:
+            obter_cliente().verificar_disponivel()
+        except CompreFaceIndisponivel as e:
+            return {"status": 503, "error": str(e), "retry_after": math.ceil(e.retry_after)}, None, None
+        
+        try:
+            image_data = normalizar_imagem(base64.b64decode(item["image_base64"]))
+        except (ImagemInvalida, ValueError) as e:
+            return {"status": 400, "error": str(e)}, None, None
+        
+        # Mesma foto na base ou repetida dentro do próprio lote
+        duplicada = verificar_imagem_duplicada(cliente, image_data)
+        hash_item = hash_conteudo(image_data)
+        with lock_lote:
+            repetida = DEDUP_IMAGES and hash_item in imagens_lote
+            if not repetida:
+                imagens_lote.add(hash_item)
+                image_hash = hash_item
+        if (duplicada or repetida) and not permitir_duplicado:
+            return {"status": 409, "error": "Imagem já cadastrada para este cliente", **duplicados, **duplicada}, None, None
+        duplicados.update(duplicada)
+        
+        try:
+            subject_id, pessoa = salvar_imagem_pessoa(cliente, item, image_data)
+            api_subject_id, _ = enviar_compreface(cliente, subject_id, pessoa)
+        except CompreFaceIndisponivel as e:
+            return {"status": 503, "error": str(e), "retry_after": math.ceil(e.retry_after)}, None, None
+        except Exception as e:
+            return {"status": 502, "error": str(e)}, None, None
+        cadastrado = True
+        return {"status": 201, "subject_id": subject_id, "api_subject_id": api_subject_id, **duplicados}, subject_id, pessoa
+    finally:
+        if not cadastrado:
+            # Item falhou: email e imagem continuam livres para os itens seguintes
+            with lock_lote:
+                emails_lote.discard(email_reservado)
+                imagens_lote.discard(image_hash)
+
+def carregar_metadata(cliente):
+    """Carrega todos os metadados do cliente específico"""
+    ensure_client_structure(cliente)
+    return metadata_backend.carregar(cliente)
 
 # =====================
 # 🔐 SISTEMA DE AUTENTICAÇÃO
@@ -196,12 +591,40 @@ def client_dashboard(cliente):
         return redirect(url_for('client_dashboard', cliente=DEFAULT_CLIENT))
     
     try:
-        metadata = carregar_metadata(cliente)
         client_display_name = AVAILABLE_CLIENTS[cliente]
         
+        # Parâmetros de busca, ordenação e paginação
+        busca = request.args.get("q", "").strip()
+        ordem = request.args.get("sort", "name")
+        if ordem not in DASHBOARD_SORT_FIELDS:
+            ordem = "name"
+        decrescente = request.args.get("dir") == "desc"
+        por_pagina = min(max(request.args.get("per_page", DASHBOARD_PAGE_SIZE, type=int), 1), MAX_DASHBOARD_PAGE_SIZE)
+        pagina_atual = max(request.args.get("page", 1, type=int), 1)
+        
+        ensure_client_structure(cliente)
+        total_encontrado, pessoas = metadata_backend.pagina(
+            cliente,
+            busca=busca or None,
+            ordem=ordem,
+            decrescente=decrescente,
+            offset=(pagina_atual - 1) * por_pagina,
+            limite=por_pagina
+        )
+        total_paginas = max((total_encontrado + por_pagina - 1) // por_pagina, 1)
+        
         return render_template(
             "index.html", 
-            pessoas=metadata,
+            pessoas=pessoas,
+            total_pessoas=metadata_backend.contar(cliente),
+            total_encontrado=total_encontrado,
+            busca=busca,
+            ordem=ordem,
+            direcao="desc" if decrescente else "asc",
+            pagina_atual=pagina_atual,
+            total_paginas=total_paginas,
+            por_pagina=por_pagina,
+            ordenacoes=DASHBOARD_SORT_FIELDS,
             cliente_atual=cliente,
             cliente_nome=client_display_name,
             clientes_disponiveis=AVAILABLE_CLIENTS,
@@ -229,27 +652,31 @@ def editar(cliente, subject_id):
         return redirect(url_for('client_dashboard', cliente=DEFAULT_CLIENT))
     
     try:
-        metadata = carregar_metadata(cliente)
+        pessoa_atual = metadata_backend.obter(cliente, subject_id)
         
-        if subject_id not in metadata:
+        if pessoa_atual is None:
             flash('❌ Pessoa não encontrada!', 'error')
             return redirect(url_for('client_dashboard', cliente=cliente))
         
         # Capturar nome antigo para comparação
-        nome_antigo = metadata[subject_id]["name"]
+        nome_antigo = pessoa_atual["name"]
         
-        # Atualizar dados
-        metadata[subject_id]["name"] = request.form["name"]
-        metadata[subject_id]["email"] = request.form["email"]
-        metadata[subject_id]["phone"] = request.form["phone"]
+        # Atualizar dados (leitura + escrita atômicas no backend)
+        pessoa = metadata_backend.atualizar(cliente, subject_id, {
+            "name": request.form["name"],
+            "email": request.form["email"],
+            "phone": request.form["phone"]
+        })
+        if pessoa is None:
+            flash('❌ Pessoa não encontrada!', 'error')
+            return redirect(url_for('client_dashboard', cliente=cliente))
         
-        salvar_metadata(cliente, metadata)
         client_name = AVAILABLE_CLIENTS[cliente]
         
         # Flash message mais detalhada
-        flash(f'✅ SUCESSO: Dados de "{nome_antigo}" atualizados para "{metadata[subject_id]["name"]}" no {client_name}!', 'success')
+        flash(f'✅ SUCESSO: Dados de "{nome_antigo}" atualizados para "{pessoa["name"]}" no {client_name}!', 'success')
         
-        print(f"🔧 EDIÇÃO REALIZADA: {nome_antigo} -> {metadata[subject_id]['name']} no cliente {cliente}")
+        print(f"🔧 EDIÇÃO REALIZADA: {nome_antigo} -> {pessoa['name']} no cliente {cliente}")
         
     except Exception as e:
         flash(f'❌ Erro ao editar: {str(e)}', 'error')
@@ -267,41 +694,41 @@ def deletar(cliente, subject_id):
         return redirect(url_for('client_dashboard', cliente=DEFAULT_CLIENT))
     
     try:
-        metadata = carregar_metadata(cliente)
+        pessoa = metadata_backend.obter(cliente, subject_id)
         
-        if subject_id not in metadata:
+        if pessoa is None:
             flash('❌ Pessoa não encontrada!', 'error')
             return redirect(url_for('client_dashboard', cliente=cliente))
         
         # Obter informações da pessoa
-        pessoa = metadata[subject_id]
         nome = pessoa["name"]
         email = pessoa["email"]
         
         # Deletar da API do CompreFace (com prefixo do cliente)
         api_subject_id = f"{cliente}_{subject_id}"
         try:
-            deletar_face(api_subject_id)
+            deletar_face_cliente(cliente, subject_id)
             print(f"✅ Face deletada da API CompreFace: {api_subject_id}")
+        except CompreFaceIndisponivel:
+            raise
         except Exception as api_error:
             print(f"⚠️ Aviso: Erro ao deletar da API CompreFace: {api_error}")
         
-        # Deletar arquivo de imagem
-        faces_folder = get_faces_folder(cliente)
-        img_path = os.path.join(faces_folder, pessoa["image"])
-        if os.path.exists(img_path):
-            os.remove(img_path)
+        # Deletar arquivo de imagem e thumbnails
+        for img_path in remover_arquivos_imagem(cliente, subject_id, pessoa):
             print(f"🗑️ Imagem removida: {img_path}")
         
         # Remover dos metadados
-        del metadata[subject_id]
-        salvar_metadata(cliente, metadata)
+        metadata_backend.remover(cliente, subject_id)
         
         client_name = AVAILABLE_CLIENTS[cliente]
         flash(f'🗑️ DELETADO: "{nome}" ({email}) foi removido com sucesso do {client_name}!', 'success')
         
         print(f"🗑️ EXCLUSÃO REALIZADA: {nome} ({email}) removido do cliente {cliente}")
         
+    except CompreFaceIndisponivel as e:
+        # Nada é removido localmente: a face continuaria cadastrada no CompreFace
+        flash(f'⏳ CompreFace indisponível, tente novamente em {math.ceil(e.retry_after)}s.', 'warning')
     except Exception as e:
         flash(f'❌ Erro ao deletar: {str(e)}', 'error')
         print(f"🚨 ERRO NA EXCLUSÃO: {str(e)}")
@@ -319,14 +746,40 @@ def uploaded_file(cliente, filename):
     faces_folder = get_faces_folder(cliente)
     response = send_from_directory(faces_folder, filename)
     
-    # Adicionar headers para evitar cache de imagens
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    response.headers['Last-Modified'] = 'Wed, 01 Jan 1997 12:00:00 GMT'
+    # URL sem versão: o navegador pode guardar, mas revalida (ETag/Last-Modified -> 304)
+    response.headers['Cache-Control'] = 'private, no-cache'
     
     return response
 
+@app.route("/<cliente>/media/<subject_id>/<versao>/<variante>")
+@login_required
+def imagem_versionada(cliente, subject_id, versao, variante):
+    """Serve a face (original ou thumbnail) numa URL com hash do conteúdo (cache imutável)"""
+    if not validate_client(cliente) or variante not in IMAGE_VARIANTS:
+        return "Imagem não encontrada", 404
+    
+    pessoa = metadata_backend.obter(cliente, subject_id)
+    if pessoa is None or not pessoa.get("image_hash"):
+        return "Imagem não encontrada", 404
+    
+    # Imagem trocada desde que a URL foi gerada: redirecionar para a versão atual
+    versao_atual = pessoa["image_hash"][:IMAGE_VERSION_LENGTH]
+    if versao != versao_atual:
+        return redirect(url_imagem(cliente, subject_id, pessoa, variante))
+    
+    etag = f"{versao_atual}-{variante}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        img_path = os.path.join(get_faces_folder(cliente), pessoa["image"])
+        if variante != "original":
+            img_path = garantir_thumbnail(cliente, subject_id, img_path, int(variante))
+        response = send_file(os.path.abspath(img_path), mimetype="image/jpeg" if variante != "original" else None, conditional=False)
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'private, max-age={IMAGE_CACHE_MAX_AGE}, immutable'
+    return response
+
 @app.route("/trocar_cliente", methods=["POST"])
 @login_required
 def trocar_cliente():
@@ -353,65 +806,133 @@ def api_listar_clientes():
 
 @app.route("/api/<cliente>/persons", methods=["GET"])
 def api_listar_pessoas(cliente):
-    """API: Lista todas as pessoas do cliente"""
+    """API: Lista pessoas do cliente
+
+    Sem parâmetros retorna todas as pessoas (compatibilidade). Com qualquer
+    um de limit, cursor, fields, name_prefix, email_prefix ou created_after
+    retorna uma página ordenada por subject_id e o next_cursor da próxima.
+    """
     if not validate_client(cliente):
         return jsonify({"error": "Cliente não encontrado"}), 404
     
     try:
-        metadata = carregar_metadata(cliente)
+        if not LISTAGEM_PARAMS & set(request.args):
+            metadata = carregar_metadata(cliente)
+            return jsonify({
+                "success": True,
+                "client": cliente,
+                "client_name": AVAILABLE_CLIENTS[cliente],
+                "total": len(metadata),
+                "persons": metadata
+            })
+        
+        # Validar parâmetros de paginação
+        try:
+            limite = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+            if not 1 <= limite <= MAX_PAGE_SIZE:
+                raise ValueError(f"limit deve estar entre 1 e {MAX_PAGE_SIZE}")
+            apos = decodificar_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+            filtros = ler_filtros_listagem(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        campos = [c.strip() for c in request.args.get("fields", "").split(",") if c.strip()]
+        
+        # Buscar uma pessoa a mais para saber se existe próxima página
+        ensure_client_structure(cliente)
+        pagina = metadata_backend.listar(cliente, limite=limite + 1, apos=apos, filtros=filtros)
+        proximo_cursor = codificar_cursor(pagina[limite - 1][0]) if len(pagina) > limite else None
+        pagina = pagina[:limite]
+        
         return jsonify({
             "success": True,
             "client": cliente,
             "client_name": AVAILABLE_CLIENTS[cliente],
-            "total": len(metadata),
-            "persons": metadata
+            "total": metadata_backend.contar(cliente),
+            "count": len(pagina),
+            "next_cursor": proximo_cursor,
+            "persons": {sid: projetar_pessoa(pessoa, campos) for sid, pessoa in pagina}
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route("/api/<cliente>/persons", methods=["POST"])
 def api_cadastrar_pessoa(cliente):
-    """API: Cadastra nova pessoa via JSON com imagem base64"""
+    """API: Cadastra nova pessoa via JSON (image_base64) ou multipart/form-data (file)"""
     if not validate_client(cliente):
         return jsonify({"error": "Cliente não encontrado"}), 404
     
     try:
-        data = request.get_json()
+        # Circuito aberto: 503 antes de ler, normalizar e gravar a imagem
+        obter_cliente().verificar_disponivel()
+        
+        multipart = request.mimetype == "multipart/form-data"
+        if multipart:
+            # Campos de texto em request.form; o arquivo já foi gravado em disco em partes
+            data = request.form
+            required_fields = ["name", "email", "phone"]
+            if "file" not in request.files:
+                return jsonify({"error": "Campo obrigatório: file"}), 400
+        else:
+            data = request.get_json()
+            required_fields = ["name", "email", "phone", "image_base64"]
         
         # Validar dados obrigatórios
-        required_fields = ["name", "email", "phone", "image_base64"]
         for field in required_fields:
             if field not in data:
                 return jsonify({"error": f"Campo obrigatório: {field}"}), 400
         
-        # Decodificar imagem base64
-        try:
-            image_data = base64.b64decode(data["image_base64"])
-        except Exception:
-            return jsonify({"error": "Imagem base64 inválida"}), 400
+        # Rejeitar email duplicado antes de gastar uma chamada ao CompreFace
+        duplicados = verificar_duplicados(cliente, data["email"], data["phone"])
+        if duplicados.get("duplicate_email_of") and not valor_verdadeiro(data.get("allow_duplicate")):
+            return jsonify({
+                "error": "Email já cadastrado para este cliente",
+                "duplicate_email_of": duplicados["duplicate_email_of"]
+            }), 409
         
-        # Gerar ID único e salvar imagem
-        subject_id = str(uuid.uuid4())
-        filename = secure_filename(f"{subject_id}.jpg")
-        faces_folder = get_faces_folder(cliente)
-        img_path = os.path.join(faces_folder, filename)
+        if multipart:
+            origem = request.files["file"].stream
+        else:
+            # Decodificar imagem base64
+            try:
+                origem = base64.b64decode(data["image_base64"])
+            except Exception:
+                return jsonify({"error": "Imagem base64 inválida"}), 400
         
-        with open(img_path, "wb") as f:
-            f.write(image_data)
+        # Normalizar (orientação EXIF, lado máximo, JPEG limitado) antes de salvar/enviar
+        try:
+            image_data = normalizar_imagem(origem)
+        except ImagemInvalida as e:
+            return jsonify({"error": str(e)}), 400
+        del origem
         
-        # Cadastrar face na API do CompreFace
-        api_subject_id = f"{cliente}_{subject_id}"
-        compreface_response = cadastrar_face(img_path, api_subject_id)
+        # Mesma foto já cadastrada (outro nome de arquivo, reenvio): devolve o subject existente
+        duplicada = verificar_imagem_duplicada(cliente, image_data)
+        if duplicada and not valor_verdadeiro(data.get("allow_duplicate")):
+            return jsonify({"error": "Imagem já cadastrada para este cliente", **duplicada}), 409
+        duplicados.update(duplicada)
         
-        # Salvar metadados
-        metadata = carregar_metadata(cliente)
-        metadata[subject_id] = {
-            "name": data["name"],
-            "email": data["email"],
-            "phone": data["phone"],
-            "image": filename
-        }
-        salvar_metadata(cliente, metadata)
+        # Modo assíncrono (?async=1, campo async ou Prefer: respond-async): 202 + job
+        assincrono = (valor_verdadeiro(request.args.get("async")) or valor_verdadeiro(data.get("async"))
+                      or "respond-async" in request.headers.get("Prefer", ""))
+        if assincrono:
+            subject_id, pessoa = salvar_imagem_pessoa(cliente, data, image_data)
+            job = fila_jobs.criar("enroll", {"client": cliente, "subject_id": subject_id, "person": pessoa,
+                                             "allow_duplicate": valor_verdadeiro(data.get("allow_duplicate"))})
+            fila_jobs.enfileirar(job, executar_job_cadastro)
+            status_url = url_for("api_obter_job", job_id=job["job_id"])
+            return jsonify({
+                "success": True,
+                "message": "Cadastro enfileirado",
+                "job_id": job["job_id"],
+                "status": job["status"],
+                "status_url": status_url,
+                "subject_id": subject_id,
+                **duplicados
+            }), 202, {"Location": status_url}
+        
+        subject_id, api_subject_id, compreface_response, pessoa = registrar_pessoa(
+            cliente, data, image_data, valor_verdadeiro(data.get("allow_duplicate")))
         
         return jsonify({
             "success": True,
@@ -419,9 +940,448 @@ def api_cadastrar_pessoa(cliente):
             "subject_id": subject_id,
             "api_subject_id": api_subject_id,
             "compreface_response": compreface_response,
-            "person": metadata[subject_id]
+            "person": pessoa,
+            **duplicados
         }), 201
         
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"Imagem maior que o limite de {MAX_UPLOAD_BYTES // (1024 * 1024)}MB"}), 413
+    except CompreFaceIndisponivel as e:
+        return resposta_indisponivel(e)
+    except CadastroDuplicado as e:
+        return jsonify({"error": str(e), **e.conflitos}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def excluir_pessoas(cliente, subject_ids):
+    """Exclui várias pessoas: CompreFace em paralelo, arquivos e metadados a cada DELETE_CHUNK_SIZE
+
+    Gravar por bloco limita o estrago de uma purga interrompida: as faces já
+    removidas do CompreFace não ficam listadas nos metadados. Retorna o
+    resultado por id, na ordem recebida.
+    """
+    pessoas = {}
+    
+    def excluir(subject_id):
+        pessoa = pessoas[subject_id]
+        if pessoa is None:
+            return {"subject_id": subject_id, "status": 404, "error": "Pessoa não encontrada"}
+        resultado = {"subject_id": subject_id, "status": 200}
+        try:
+            deletar_face_cliente(cliente, subject_id)
+        except CompreFaceIndisponivel as e:
+            # Mantém a pessoa: removê-la deixaria a face órfã no CompreFace
+            pessoas[subject_id] = None
+            return {"subject_id": subject_id, "status": 503, "error": str(e), "retry_after": math.ceil(e.retry_after)}
+        except Exception as api_error:
+            # Mesmo comportamento da exclusão individual: segue com a remoção local
+            resultado["compreface_error"] = str(api_error)
+        remover_arquivos_imagem(cliente, subject_id, pessoa)
+        return resultado
+    
+    resultados = []
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as executor:
+        for inicio in range(0, len(subject_ids), DELETE_CHUNK_SIZE):
+            bloco = subject_ids[inicio:inicio + DELETE_CHUNK_SIZE]
+            pessoas.clear()
+            pessoas.update((sid, metadata_backend.obter(cliente, sid)) for sid in bloco)
+            resultados.extend(executor.map(excluir, bloco))
+            metadata_backend.remover_varios(cliente, [sid for sid in bloco if pessoas[sid] is not None])
+    return resultados
+
+def ler_imagem_requisicao():
+    """Imagem enviada como multipart (file) ou JSON (image_base64), pronta para normalizar_imagem
+
+    Retorna (origem, erro); origem é None quando a requisição não traz uma imagem válida.
+    """
+    if request.mimetype == "multipart/form-data":
+        if "file" not in request.files:
+            return None, "Campo obrigatório: file"
+        return request.files["file"].stream, None
+    
+    data = request.get_json(silent=True) or {}
+    if "image_base64" not in data:
+        return None, "Campo obrigatório: image_base64"
+    try:
+        return base64.b64decode(data["image_base64"]), None
+    except Exception:
+        return None, "Imagem base64 inválida"
+
+def pessoas_citadas(cliente, compreface_results):
+    """Busca de uma vez as pessoas do cliente citadas em um ou mais resultados do CompreFace
+
+    Retorna dict subject_id -> pessoa (já com image_url) ou None se não houver metadados.
+    """
+    prefixo = f"{cliente}_"
+    subject_ids = {
+        subject.get("subject", "")[len(prefixo):]
+        for compreface_result in compreface_results
+        for resultado in compreface_result.get("result", [])
+        for subject in resultado.get("subjects", [])
+        if subject.get("subject", "").startswith(prefixo)
+    }
+    pessoas = {}
+    for subject_id in subject_ids:
+        pessoa = metadata_backend.obter(cliente, subject_id)
+        if pessoa is not None:
+            pessoa = {"subject_id": subject_id, **pessoa, "image_url": url_imagem(cliente, subject_id, pessoa, 256)}
+        pessoas[subject_id] = pessoa
+    return pessoas
+
+def resolver_reconhecimento(cliente, compreface_result, similaridade_minima=0.0, pessoas=None):
+    """Junta o resultado do CompreFace com os metadados do cliente
+
+    Subjects de outros clientes são descartados (isolamento entre clientes).
+    pessoas: resultado de pessoas_citadas (buscado aqui se não for informado).
+    """
+    if pessoas is None:
+        pessoas = pessoas_citadas(cliente, [compreface_result])
+    prefixo = f"{cliente}_"
+    faces = []
+    for resultado in compreface_result.get("result", []):
+        matches = []
+        for subject in resultado.get("subjects", []):
+            api_subject_id = subject.get("subject", "")
+            similaridade = subject.get("similarity", 0)
+            if not api_subject_id.startswith(prefixo) or similaridade < similaridade_minima:
+                continue
+            subject_id = api_subject_id[len(prefixo):]
+            matches.append({
+                "subject_id": subject_id,
+                "similarity": similaridade,
+                "person": pessoas.get(subject_id)
+            })
+        faces.append({
+            "box": resultado.get("box"),
+            "matches": matches,
+            "best_match": matches[0] if matches else None
+        })
+    return faces
+
+def consultar_compreface(cliente, image_data):
+    """Resultado cru do CompreFace para a imagem normalizada. Retorna (compreface_result, em_cache)
+
+    Imagens idênticas são respondidas pelo cache de reconhecimento.
+    """
+    image_hash = hash_conteudo(image_data)
+    compreface_result = cache_reconhecimento.obter(cliente, image_hash)
+    if compreface_result is not None:
+        return compreface_result, True
+    
+    geracao = cache_reconhecimento.geracao(cliente)
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+        f.write(image_data)
+    try:
+        compreface_result = reconhecer_face(f.name, cliente)
+    finally:
+        os.remove(f.name)
+    cache_reconhecimento.guardar(cliente, image_hash, compreface_result, geracao)
+    return compreface_result, False
+
+def reconhecer_imagem(cliente, image_data, similaridade_minima=0.0):
+    """Envia a imagem normalizada ao CompreFace (prefixo do cliente) e resolve as pessoas"""
+    compreface_result, _ = consultar_compreface(cliente, image_data)
+    return resolver_reconhecimento(cliente, compreface_result, similaridade_minima)
+
+def resposta_indisponivel(erro):
+    """503 com Retry-After quando o CompreFace está protegido pelo disjuntor/limite"""
+    retry_after = math.ceil(erro.retry_after)
+    response = jsonify({"error": str(erro), "retry_after": retry_after})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, 503
+
+def erro_compreface(erro):
+    """(mensagem, status HTTP) para uma falha ao chamar o CompreFace
+
+    4xx do CompreFace (ex: nenhuma face encontrada) é problema da imagem enviada.
+    """
+    if isinstance(erro, requests.HTTPError) and erro.response is not None:
+        status = 422 if erro.response.status_code < 500 else 502
+        return f"CompreFace: {erro.response.text}", status
+    return f"CompreFace indisponível: {erro}", 502
+
+def imagens_lote_requisicao():
+    """Imagens do reconhecimento em lote: multipart (vários campos file) ou JSON
+
+    JSON: {"images": ["<base64>", ...]} ou {"images": [{"id": "...", "image_base64": "..."}, ...]}.
+    Gera (id, origem, erro) na ordem de envio.
+    """
+    if request.mimetype == "multipart/form-data":
+        for arquivo in request.files.getlist("file") + request.files.getlist("files"):
+            yield arquivo.filename, arquivo.stream, None
+        return
+    
+    data = request.get_json(silent=True)
+    imagens = data.get("images") if isinstance(data, dict) else data
+    if not isinstance(imagens, list):
+        raise ValueError('Envie {"images": [...]} ou vários campos file em multipart/form-data')
+    for imagem in imagens:
+        identificador = None
+        if isinstance(imagem, dict):
+            identificador, imagem = imagem.get("id"), imagem.get("image_base64")
+        if not isinstance(imagem, str):
+            yield identificador, None, "Campo obrigatório: image_base64"
+            continue
+        try:
+            yield identificador, base64.b64decode(imagem), None
+        except Exception:
+            yield identificador, None, "Imagem base64 inválida"
+
+@app.route("/api/<cliente>/persons:batch", methods=["POST"])
+def api_cadastrar_lote(cliente):
+    """API: Cadastra várias pessoas numa requisição (JSON ou NDJSON)
+
+    Os cadastros no CompreFace rodam em paralelo (BATCH_CONCURRENCY) e todas as
+    pessoas aceitas são gravadas nos metadados numa única escrita no final.
+    """
+    if not validate_client(cliente):
+        return jsonify({"error": "Cliente não encontrado"}), 404
+    ensure_client_structure(cliente)
+    
+    resultados = []
+    aceitos = {}
+    emails_lote = set()
+    imagens_lote = set()
+    lock_lote = threading.Lock()
+    # Limita itens decodificados aguardando na fila (memória constante em lotes grandes)
+    vagas = threading.BoundedSemaphore(BATCH_CONCURRENCY * 2)
+    
+    def processar(indice, item):
+        try:
+            resultado, subject_id, pessoa = cadastrar_item_lote(cliente, item, emails_lote, imagens_lote, lock_lote)
+        except Exception as e:
+            resultado, subject_id, pessoa = {"status": 500, "error": str(e)}, None, None
+        finally:
+            vagas.release()
+        resultado["index"] = indice
+        if subject_id:
+            with lock_lote:
+                aceitos[subject_id] = pessoa
+        return resultado
+    
+    erro_lote, status = None, 200
+    futuros = []
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as executor:
+        try:
+            for indice, item, erro in ler_itens_lote():
+                if indice >= BATCH_MAX_ITEMS:
+                    resultados.append({"index": indice, "status": 413, "error": f"Lote limitado a {BATCH_MAX_ITEMS} itens"})
+                    continue
+                if erro:
+                    resultados.append({"index": indice, "status": 400, "error": erro})
+                    continue
+                vagas.acquire()
+                futuros.append(executor.submit(processar, indice, item))
+        except RequestEntityTooLarge as e:
+            erro_lote, status = e.description, 413
+        except ValueError as e:
+            erro_lote, status = str(e), 400
+    resultados += [futuro.result() for futuro in futuros]
+    
+    # Uma única escrita de metadados para o lote inteiro (inclusive se a leitura abortou)
+    if aceitos:
+        metadata_backend.gravar_varios(cliente, aceitos)
+    
+    resultados.sort(key=lambda r: r["index"])
+    criados = sum(1 for r in resultados if r["status"] == 201)
+    resposta = {
+        "success": erro_lote is None,
+        "client": cliente,
+        "total": len(resultados),
+        "created": criados,
+        "failed": len(resultados) - criados,
+        "results": resultados
+    }
+    if erro_lote:
+        resposta["error"] = erro_lote
+    return jsonify(resposta), status
+
+@app.route("/api/<cliente>/persons", methods=["DELETE"])
+def api_deletar_pessoas(cliente):
+    """API: Exclui várias pessoas ({"subject_ids": [...]}) ou todas ({"all": true, "confirm": "<cliente>"})"""
+    if not validate_client(cliente):
+        return jsonify({"error": "Cliente não encontrado"}), 404
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        if data.get("all"):
+            # Purga do cliente inteiro: exige repetir o nome do cliente
+            if data.get("confirm") != cliente:
+                return jsonify({"error": f'Para excluir todas as pessoas envie "confirm": "{cliente}"'}), 400
+            ensure_client_structure(cliente)
+            subject_ids = [sid for sid, _ in metadata_backend.listar(cliente)]
+        else:
+            subject_ids = data.get("subject_ids")
+            if not isinstance(subject_ids, list) or not all(isinstance(sid, str) for sid in subject_ids):
+                return jsonify({"error": "Campo obrigatório: subject_ids (lista)"}), 400
+            if len(subject_ids) > BATCH_MAX_ITEMS:
+                return jsonify({"error": f"Máximo de {BATCH_MAX_ITEMS} ids por requisição"}), 413
+            subject_ids = list(dict.fromkeys(subject_ids))
+        
+        resultados = excluir_pessoas(cliente, subject_ids)
+        removidos = sum(1 for r in resultados if r["status"] == 200)
+        return jsonify({
+            "success": True,
+            "client": cliente,
+            "total": len(resultados),
+            "deleted": removidos,
+            "failed": len(resultados) - removidos,
+            "results": resultados
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/<cliente>/recognize", methods=["POST"])
+def api_reconhecer(cliente):
+    """API: Reconhece as faces de uma imagem e retorna as pessoas do cliente numa única resposta
+
+    Aceita multipart/form-data (file) ou JSON (image_base64). ?min_similarity= filtra os matches.
+    """
+    if not validate_client(cliente):
+        return jsonify({"error": "Cliente não encontrado"}), 404
+    
+    try:
+        origem, erro = ler_imagem_requisicao()
+        if erro:
+            return jsonify({"error": erro}), 400
+        try:
+            image_data = normalizar_imagem(origem)
+        except ImagemInvalida as e:
+            return jsonify({"error": str(e)}), 400
+        
+        ensure_client_structure(cliente)
+        faces = reconhecer_imagem(cliente, image_data, request.args.get("min_similarity", 0.0, type=float))
+        return jsonify({
+            "success": True,
+            "client": cliente,
+            "count": len(faces),
+            "recognized": sum(1 for face in faces if face["best_match"]),
+            "faces": faces
+        })
+    
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"Imagem maior que o limite de {MAX_UPLOAD_BYTES // (1024 * 1024)}MB"}), 413
+    except requests.RequestException as e:
+        mensagem, status = erro_compreface(e)
+        return jsonify({"error": mensagem}), status
+    except CompreFaceIndisponivel as e:
+        return resposta_indisponivel(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/<cliente>/recognize:batch", methods=["POST"])
+def api_reconhecer_lote(cliente):
+    """API: Reconhece várias imagens numa requisição, com resultados na ordem de envio
+
+    As chamadas ao CompreFace rodam em paralelo (BATCH_CONCURRENCY); as pessoas
+    citadas são buscadas nos metadados de uma vez, no final.
+    """
+    if not validate_client(cliente):
+        return jsonify({"error": "Cliente não encontrado"}), 404
+    
+    inicio_lote = time.perf_counter()
+    similaridade_minima = request.args.get("min_similarity", 0.0, type=float)
+    
+    def processar(origem):
+        inicio = time.perf_counter()
+        try:
+            compreface_result, em_cache = consultar_compreface(cliente, normalizar_imagem(origem))
+            item = {"status": 200, "cached": em_cache, "compreface_result": compreface_result}
+        except ImagemInvalida as e:
+            item = {"status": 400, "error": str(e)}
+        except requests.RequestException as e:
+            mensagem, status = erro_compreface(e)
+            item = {"status": status, "error": mensagem}
+        except CompreFaceIndisponivel as e:
+            item = {"status": 503, "error": str(e), "retry_after": math.ceil(e.retry_after)}
+        except Exception as e:
+            item = {"status": 500, "error": str(e)}
+        item["latency_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+        return item
+    
+    try:
+        ensure_client_structure(cliente)
+        entradas = list(imagens_lote_requisicao())
+        if not entradas:
+            return jsonify({"error": "Nenhuma imagem enviada"}), 400
+        if len(entradas) > RECOGNIZE_BATCH_MAX_IMAGES:
+            return jsonify({"error": f"Máximo de {RECOGNIZE_BATCH_MAX_IMAGES} imagens por requisição"}), 413
+        
+        with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as executor:
+            futuros = [executor.submit(processar, origem) if not erro else None for _, origem, erro in entradas]
+            itens = [futuro.result() if futuro else {"status": 400, "error": erro, "latency_ms": 0.0}
+                     for futuro, (_, _, erro) in zip(futuros, entradas)]
+        
+        # Metadados: uma única passada para todas as pessoas citadas no lote
+        pessoas = pessoas_citadas(cliente, [item["compreface_result"] for item in itens if "compreface_result" in item])
+        resultados = []
+        for indice, ((identificador, _, _), item) in enumerate(zip(entradas, itens)):
+            resultado = {"index": indice, "id": identificador, **item}
+            compreface_result = resultado.pop("compreface_result", None)
+            if compreface_result is not None:
+                faces = resolver_reconhecimento(cliente, compreface_result, similaridade_minima, pessoas)
+                resultado.update(faces=faces, recognized=sum(1 for face in faces if face["best_match"]))
+            resultados.append(resultado)
+        
+        return jsonify({
+            "success": True,
+            "client": cliente,
+            "total": len(resultados),
+            "recognized": sum(1 for r in resultados if r.get("recognized")),
+            "failed": sum(1 for r in resultados if r["status"] != 200),
+            "total_ms": round((time.perf_counter() - inicio_lote) * 1000, 1),
+            "results": resultados
+        })
+    
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"Requisição maior que o limite de {MAX_REQUEST_BYTES // (1024 * 1024)}MB"}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/compreface/status", methods=["GET"])
+def api_status_compreface():
+    """API: Estado do disjuntor e chamadas ao CompreFace em andamento neste processo"""
+    return jsonify({"success": True, "pid": os.getpid(), **obter_cliente().estatisticas()})
+
+@app.route("/api/recognition/cache", methods=["GET"])
+def api_estatisticas_cache():
+    """API: Contadores do cache de reconhecimento deste processo"""
+    return jsonify({"success": True, "pid": os.getpid(), **cache_reconhecimento.estatisticas()})
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def api_obter_job(job_id):
+    """API: Estado de um job assíncrono (queued, running, succeeded, failed)"""
+    job = fila_jobs.obter(job_id)
+    if not job:
+        return jsonify({"error": "Job não encontrado"}), 404
+    
+    job.pop("pid", None)
+    job.pop("data", None)
+    return jsonify({"success": True, **job})
+
+@app.route("/api/<cliente>/persons/search", methods=["GET"])
+def api_buscar_pessoas(cliente):
+    """API: Busca pessoas por prefixo de nome, email ou telefone (?q=)"""
+    if not validate_client(cliente):
+        return jsonify({"error": "Cliente não encontrado"}), 404
+    
+    termo = request.args.get("q", "").strip()
+    if not termo:
+        return jsonify({"error": "Parâmetro obrigatório: q"}), 400
+    limite = min(max(request.args.get("limit", SEARCH_LIMIT, type=int), 1), MAX_PAGE_SIZE)
+    
+    try:
+        ensure_client_structure(cliente)
+        resultados = metadata_backend.buscar(cliente, termo, limite)
+        return jsonify({
+            "success": True,
+            "client": cliente,
+            "query": termo,
+            "count": len(resultados),
+            "persons": [{"subject_id": sid, **pessoa} for sid, pessoa in resultados]
+        })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -432,9 +1392,9 @@ def api_obter_pessoa(cliente, subject_id):
         return jsonify({"error": "Cliente não encontrado"}), 404
     
     try:
-        metadata = carregar_metadata(cliente)
+        pessoa = metadata_backend.obter(cliente, subject_id)
         
-        if subject_id not in metadata:
+        if pessoa is None:
             return jsonify({"error": "Pessoa não encontrada"}), 404
         
         return jsonify({
@@ -442,7 +1402,7 @@ def api_obter_pessoa(cliente, subject_id):
             "client": cliente,
             "client_name": AVAILABLE_CLIENTS[cliente],
             "subject_id": subject_id,
-            "person": metadata[subject_id]
+            "person": pessoa
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -455,25 +1415,18 @@ def api_editar_pessoa(cliente, subject_id):
     
     try:
         data = request.get_json()
-        metadata = carregar_metadata(cliente)
-        
-        if subject_id not in metadata:
-            return jsonify({"error": "Pessoa não encontrada"}), 404
         
         # Atualizar campos fornecidos
-        if "name" in data:
-            metadata[subject_id]["name"] = data["name"]
-        if "email" in data:
-            metadata[subject_id]["email"] = data["email"]
-        if "phone" in data:
-            metadata[subject_id]["phone"] = data["phone"]
+        campos = {campo: data[campo] for campo in ("name", "email", "phone") if campo in data}
+        pessoa = metadata_backend.atualizar(cliente, subject_id, campos)
         
-        salvar_metadata(cliente, metadata)
+        if pessoa is None:
+            return jsonify({"error": "Pessoa não encontrada"}), 404
         
         return jsonify({
             "success": True,
             "message": "Dados atualizados com sucesso",
-            "person": metadata[subject_id]
+            "person": pessoa
         })
         
     except Exception as e:
@@ -486,35 +1439,33 @@ def api_deletar_pessoa(cliente, subject_id):
         return jsonify({"error": "Cliente não encontrado"}), 404
     
     try:
-        metadata = carregar_metadata(cliente)
+        pessoa = metadata_backend.obter(cliente, subject_id)
         
-        if subject_id not in metadata:
+        if pessoa is None:
             return jsonify({"error": "Pessoa não encontrada"}), 404
         
-        pessoa = metadata[subject_id]
         
         # Deletar da API do CompreFace
-        api_subject_id = f"{cliente}_{subject_id}"
         try:
-            deletar_face(api_subject_id)
+            deletar_face_cliente(cliente, subject_id)
+        except CompreFaceIndisponivel:
+            raise
         except Exception as api_error:
             print(f"⚠️ Aviso: Erro ao deletar da API CompreFace: {api_error}")
         
-        # Deletar arquivo de imagem
-        faces_folder = get_faces_folder(cliente)
-        img_path = os.path.join(faces_folder, pessoa["image"])
-        if os.path.exists(img_path):
-            os.remove(img_path)
+        # Deletar arquivo de imagem e thumbnails
+        remover_arquivos_imagem(cliente, subject_id, pessoa)
         
         # Remover dos metadados
-        del metadata[subject_id]
-        salvar_metadata(cliente, metadata)
+        metadata_backend.remover(cliente, subject_id)
         
         return jsonify({
             "success": True,
             "message": f"Pessoa {pessoa['name']} removida com sucesso"
         })
         
+    except CompreFaceIndisponivel as e:
+        return resposta_indisponivel(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -536,9 +1487,17 @@ if __name__ == "__main__":
     print("   👉 GET    /api/clients - Listar clientes")
     print("   👉 GET    /api/<cliente>/persons - Listar pessoas")
     print("   👉 POST   /api/<cliente>/persons - Cadastrar pessoa")
+    print("   👉 POST   /api/<cliente>/persons:batch - Cadastrar pessoas em lote")
+    print("   👉 GET    /api/<cliente>/persons/search?q= - Buscar pessoas")
     print("   👉 GET    /api/<cliente>/persons/<id> - Obter pessoa")
     print("   👉 PUT    /api/<cliente>/persons/<id> - Editar pessoa")
     print("   👉 DELETE /api/<cliente>/persons/<id> - Deletar pessoa")
+    print("   👉 DELETE /api/<cliente>/persons - Deletar pessoas em lote (ou todas)")
+    print("   👉 GET    /api/jobs/<id> - Estado de cadastro assíncrono")
+    print("   👉 POST   /api/<cliente>/recognize - Reconhecer face (com dados da pessoa)")
+    print("   👉 POST   /api/<cliente>/recognize:batch - Reconhecer várias imagens")
+    print("   👉 GET    /api/recognition/cache - Estatísticas do cache de reconhecimento")
+    print("   👉 GET    /api/compreface/status - Disjuntor e chamadas ao CompreFace")
     print("🚀 Servidor iniciando...")
     
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -5,42 +5,140 @@ Sistema para upload automático de uma pasta de imagens para o Face Manager
 
 Como usar:
 1. Configure o arquivo upload_config.json com os dados das pessoas
+   (ou um .jsonl / .csv com uma pessoa por linha, lido em streaming)
 2. Coloque as imagens na pasta especificada (padrão: upload_images/)
 3. Execute: python bulk_upload.py
+   ou:      python bulk_upload.py --config pessoas.jsonl --client buybye
+
+Opções:
+    --setup           Cria estrutura e configuração de exemplo
+    --config ARQUIVO  upload_config.json, .jsonl/.ndjson ou .csv (image_file,name,email,phone)
+    --client NOME     Cliente (obrigatório para .jsonl/.csv; sobrepõe o do JSON)
+    --upload-folder   Pasta das imagens (sobrepõe a do JSON)
+    --multipart       Envia a imagem como multipart/form-data (sem base64)
+    --concurrency N   Cadastros simultâneos (padrão: 1)
+    --rps N           Limite de requisições por segundo (padrão: sem limite)
+    --resume          Continua um lote interrompido (pula quem já foi processado)
+    --retry-failed    Reprocessa apenas as pessoas que falharam
+    --restart         Descarta o ledger e recomeça o lote do zero
+    --ledger ARQUIVO  Ledger SQLite do lote (padrão: ao lado da entrada, <config>.ledger.db)
+    --no-dedup        Não pula fotos repetidas (hash da imagem normalizada)
+    --preflight       Verifica todas as imagens localmente (em paralelo) antes de enviar
+    --staging PASTA   Com a pré-verificação, envia versões reduzidas gravadas nesta pasta
 
 Autor: Face Manager Multi-Cliente
 """
 
+import argparse
+import csv
 import json
+from collections import Counter
 import os
 import base64
+import threading
+import time
 import requests
-import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+
+from image_pipeline import ImagemInvalida, hash_conteudo, normalizar_imagem
+from upload_ledger import LedgerUpload, chave_pessoa
+from upload_preflight import verificar_imagens
 
 # =====================
 # 🔧 CONFIGURAÇÕES
 # =====================
 
-API_BASE_URL = "https://facial-front.visionlabss.com/api"
+API_BASE_URL = os.environ.get("FACE_MANAGER_URL", "https://facial-front.visionlabss.com/api")
 CONFIG_FILE = "upload_config.json"
 DEFAULT_UPLOAD_FOLDER = "upload_images"
 
 # Extensões de imagem suportadas
 SUPPORTED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
 
+REQUEST_TIMEOUT = 30
+# Página da listagem usada para baixar os hashes das imagens já cadastradas
+HASHES_PAGE_SIZE = 1000
+# Reenvios quando o servidor responde 503/429 (CompreFace sobrecarregado), respeitando Retry-After
+MAX_RETRIES_OCUPADO = 3
+ERROS_FILE = "erros_upload.txt"
+PREFLIGHT_REPORT_FILE = "preflight_rejeitadas.csv"
+PREFLIGHT_LOG_EVERY = 1000
+
+CAMPOS_PESSOA = ("image_file", "name", "email", "phone")
+# Extensão do arquivo de entrada -> formato (o resto é o upload_config.json tradicional)
+FORMATOS_ENTRADA = {".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv"}
+
+def validar_pessoa(pessoa):
+    """Mensagem de erro da linha de entrada (ou None se a pessoa é válida)"""
+    if not isinstance(pessoa, dict):
+        return "A linha deve ser um objeto JSON"
+    faltando = [campo for campo in CAMPOS_PESSOA if not str(pessoa.get(campo) or "").strip()]
+    if faltando:
+        return f"Campos obrigatórios faltando: {', '.join(faltando)}"
+    return None
+
+class LimitadorTaxa:
+    """Espaça as requisições para no máximo `rps` por segundo (compartilhado entre threads)"""
+
+    def __init__(self, rps):
+        self.intervalo = 1.0 / rps
+        self._lock = threading.Lock()
+        self._proxima = time.monotonic()
+
+    def aguardar(self):
+        with self._lock:
+            agora = time.monotonic()
+            espera = self._proxima - agora
+            self._proxima = max(self._proxima, agora) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
 class BulkUploader:
-    def __init__(self, config_file=CONFIG_FILE):
+    def __init__(self, config_file=CONFIG_FILE, multipart=False, concurrency=1, rps=None,
+                 ledger_file=None, resume=False, retry_failed=False, restart=False, dedup=True,
+                 client=None, upload_folder=None, formato=None, preflight=False, staging=None,
+                 preflight_workers=None, preflight_report=PREFLIGHT_REPORT_FILE):
         self.config_file = config_file
+        self.formato = formato or FORMATOS_ENTRADA.get(os.path.splitext(config_file)[1].lower(), "json")
+        # upload_config.json -> upload_config.ledger.db; pessoas.csv -> pessoas.csv.ledger.db (sem colidir com pessoas.jsonl)
+        base = os.path.splitext(config_file)[0] if self.formato == "json" else config_file
+        self.ledger_file = ledger_file or f"{base}.ledger.db"
+        self.resume = resume
+        self.retry_failed = retry_failed
+        self.restart = restart
+        self.ledger = None
+        self.dedup = dedup
+        self.hashes_servidor = {}   # SHA-256 da imagem normalizada -> subject_id já cadastrado
+        self._hashes_lote = {}      # SHA-256 -> chave da primeira pessoa do lote com a imagem
+        self.preflight = preflight or bool(staging)
+        self.staging = staging
+        self.preflight_workers = preflight_workers
+        self.preflight_report = preflight_report
+        self.verificacoes = {}      # image_file -> resultado da pré-verificação
+        self.multipart = multipart
+        self.concurrency = max(1, concurrency)
+        self.limitador = LimitadorTaxa(rps) if rps else None
         self.config = None
-        self.upload_folder = None
-        self.client = None
+        self.upload_folder = upload_folder
+        self.client = client
         self.stats = {
             "total": 0,
             "success": 0,
             "errors": 0,
-            "skipped": 0
+            "skipped": 0,
+            "duplicates": 0
         }
+        self._lock = threading.Lock()
+        self._concluidos = 0
+        self.total_previsto = None
+        
+        # Sessão keep-alive compartilhada pelas threads, com uma conexão por worker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.log(f"🔧 Iniciando BulkUploader para o cliente: {self.client}")
         
     def log(self, message, level="INFO"):
@@ -56,24 +154,27 @@ class BulkUploader:
         print(f"[{timestamp}] {prefix.get(level, '')} {message}")
     
     def carregar_config(self):
-        """Carrega configuração do arquivo JSON"""
+        """Carrega configuração do arquivo JSON (ou valida o cabeçalho de uma entrada JSONL/CSV)"""
         try:
             if not os.path.exists(self.config_file):
                 self.log(f"Arquivo de configuração não encontrado: {self.config_file}", "ERROR")
                 return False
             
+            if self.formato != "json":
+                return self.preparar_entrada_streaming()
+            
             with open(self.config_file, "r", encoding="utf-8") as f:
                 self.config = json.load(f)
             
             # Validar configuração
-            required_keys = ["client", "persons"]
+            required_keys = ["persons"] if self.client else ["client", "persons"]
             for key in required_keys:
                 if key not in self.config:
                     self.log(f"Chave obrigatória '{key}' não encontrada na configuração", "ERROR")
                     return False
             
-            self.client = self.config["client"]
-            self.upload_folder = self.config.get("upload_folder", DEFAULT_UPLOAD_FOLDER)
+            self.client = self.client or self.config["client"]
+            self.upload_folder = self.upload_folder or self.config.get("upload_folder", DEFAULT_UPLOAD_FOLDER)
             
             self.log(f"Configuração carregada: Cliente '{self.client}', {len(self.config['persons'])} pessoas")
             return True
@@ -85,6 +186,55 @@ class BulkUploader:
             self.log(f"Erro ao carregar configuração: {e}", "ERROR")
             return False
     
+    def preparar_entrada_streaming(self):
+        """JSONL/CSV: pessoas lidas sob demanda; cliente e pasta vêm da linha de comando"""
+        if not self.client:
+            self.log(f"Informe o cliente com --client para entradas {self.formato.upper()}", "ERROR")
+            return False
+        self.upload_folder = self.upload_folder or DEFAULT_UPLOAD_FOLDER
+        
+        if self.formato == "csv":
+            with open(self.config_file, "r", encoding="utf-8-sig", newline="") as f:
+                cabecalho = next(csv.reader(f), [])
+            faltando = [campo for campo in CAMPOS_PESSOA if campo not in cabecalho]
+            if faltando:
+                self.log(f"Colunas obrigatórias ausentes no CSV: {', '.join(faltando)}", "ERROR")
+                return False
+        
+        self.log(f"Entrada {self.formato.upper()} lida em streaming: Cliente '{self.client}', arquivo {self.config_file}")
+        return True
+
+    def ler_pessoas(self):
+        """Gera (linha, pessoa, erro) sob demanda; linhas inválidas viram erro sem interromper o lote"""
+        if self.formato == "json":
+            for indice, pessoa in enumerate(self.config["persons"], 1):
+                yield indice, pessoa, validar_pessoa(pessoa)
+        
+        elif self.formato == "jsonl":
+            with open(self.config_file, "r", encoding="utf-8") as f:
+                for numero, linha in enumerate(f, 1):
+                    if not linha.strip():
+                        continue
+                    try:
+                        pessoa = json.loads(linha)
+                    except ValueError as e:
+                        yield numero, None, f"JSON inválido: {e}"
+                        continue
+                    yield numero, pessoa, validar_pessoa(pessoa)
+        
+        else:
+            with open(self.config_file, "r", encoding="utf-8-sig", newline="") as f:
+                leitor = csv.DictReader(f)
+                try:
+                    for linha in leitor:
+                        pessoa = {campo: (valor or "").strip() for campo, valor in linha.items() if campo}
+                        if not any(pessoa.values()):
+                            continue
+                        yield leitor.line_num, pessoa, validar_pessoa(pessoa)
+                except csv.Error as e:
+                    # Arquivo corrompido a partir daqui: o que já foi lido segue normalmente
+                    yield leitor.line_num, None, f"CSV inválido: {e}"
+
     def validar_estrutura(self):
         """Valida se a pasta de upload existe e contém imagens"""
         if not os.path.exists(self.upload_folder):
@@ -109,7 +259,7 @@ class BulkUploader:
     def testar_conexao(self):
         """Testa conexão com a API"""
         try:
-            response = requests.get(f"{API_BASE_URL}/clients", timeout=10)
+            response = self.session.get(f"{API_BASE_URL}/clients", timeout=10)
             if response.status_code == 200:
                 self.log("Conexão com Face Manager API: OK")
                 return True
@@ -121,6 +271,99 @@ class BulkUploader:
             self.log("Certifique-se que o Face Manager está rodando (python app.py)", "INFO")
             return False
     
+    def carregar_hashes_servidor(self):
+        """Baixa (paginado, só o campo image_hash) os hashes das imagens já cadastradas no cliente"""
+        url = f"{API_BASE_URL}/{self.client}/persons"
+        params = {"fields": "image_hash", "limit": HASHES_PAGE_SIZE}
+        try:
+            while True:
+                response = self.session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+                pagina = response.json()
+                for subject_id, pessoa in pagina["persons"].items():
+                    if pessoa.get("image_hash"):
+                        self.hashes_servidor[pessoa["image_hash"]] = subject_id
+                if not pagina.get("next_cursor"):
+                    break
+                params["cursor"] = pagina["next_cursor"]
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            # Sem os hashes, repetições ainda são barradas pelo servidor (409)
+            self.log(f"Não foi possível baixar os hashes das imagens cadastradas: {e}", "WARNING")
+            return
+        self.log(f"Imagens já cadastradas no cliente: {len(self.hashes_servidor)}")
+
+    def imagem_duplicada(self, pessoa):
+        """Verifica, sem rede, se a foto já está cadastrada ou repetida no lote
+
+        Retorna (subject_id existente ou None, descrição) ou None se a imagem é nova.
+        Usa o mesmo hash do servidor (SHA-256 da imagem normalizada).
+        """
+        verificacao = self.verificacoes.get(pessoa.get("image_file"))
+        try:
+            # A pré-verificação já calculou o hash em paralelo
+            image_hash = (verificacao or {}).get("hash") or hash_conteudo(
+                normalizar_imagem(self.caminho_imagem(pessoa.get("image_file") or "")))
+        except (ImagemInvalida, OSError):
+            return None  # imagem ilegível: o envio reporta o erro
+        
+        with self._lock:
+            if image_hash in self.hashes_servidor:
+                subject_id = self.hashes_servidor[image_hash]
+                return subject_id, f"Imagem já cadastrada ({subject_id})"
+            primeira = self._hashes_lote.setdefault(image_hash, chave_pessoa(pessoa))
+        if primeira != chave_pessoa(pessoa):
+            return None, f"Mesma imagem de {primeira}"
+        return None
+
+    def caminho_imagem(self, image_file):
+        """Arquivo a enviar: a versão em staging, se a pré-verificação gravou uma"""
+        verificacao = self.verificacoes.get(image_file)
+        if verificacao and verificacao["ok"]:
+            return verificacao["caminho"]
+        return os.path.join(self.upload_folder, image_file)
+
+    def executar_preflight(self):
+        """Verifica em paralelo as imagens que serão enviadas e grava o relatório de rejeitadas"""
+        imagens = []
+        vistas = set()
+        for _, pessoa, erro in self.ler_pessoas():
+            if erro or not self.deve_processar(pessoa)[0] or pessoa["image_file"] in vistas:
+                continue
+            vistas.add(pessoa["image_file"])
+            imagens.append(pessoa["image_file"])
+        del vistas
+        
+        self.log(f"🛫 Pré-verificação de {len(imagens)} imagens ({self.preflight_workers or os.cpu_count()} processos)...")
+        inicio = time.monotonic()
+        tarefas = [
+            (os.path.join(self.upload_folder, image_file),
+             os.path.join(self.staging, image_file) if self.staging else None)
+            for image_file in imagens
+        ]
+        resultados = verificar_imagens(tarefas, calcular_hash=self.dedup, workers=self.preflight_workers)
+        for numero, (image_file, resultado) in enumerate(zip(imagens, resultados), 1):
+            self.verificacoes[image_file] = resultado
+            if numero % PREFLIGHT_LOG_EVERY == 0:
+                self.log(f"   {numero}/{len(imagens)} imagens verificadas")
+        
+        rejeitadas = [(image_file, r) for image_file, r in self.verificacoes.items() if not r["ok"]]
+        with open(self.preflight_report, "w", encoding="utf-8", newline="") as f:
+            escritor = csv.writer(f)
+            escritor.writerow(["image_file", "motivo", "formato", "largura", "altura", "bytes"])
+            for image_file, r in rejeitadas:
+                escritor.writerow([image_file, r["motivo"], r["formato"], r["largura"], r["altura"], r["bytes"]])
+        
+        self.log(f"Pré-verificação: {len(imagens) - len(rejeitadas)} aprovadas, {len(rejeitadas)} rejeitadas "
+                 f"em {time.monotonic() - inicio:.1f}s")
+        # Resumo por motivo (sem os detalhes de cada arquivo, que estão no relatório)
+        motivos = Counter(r["motivo"].split(" (")[0].split(":")[0] for _, r in rejeitadas)
+        for motivo, quantidade in motivos.most_common():
+            self.log(f"   {quantidade:>6}  {motivo}", "WARNING")
+        if rejeitadas:
+            self.log(f"Relatório das rejeitadas: {self.preflight_report}")
+        if self.staging:
+            self.log(f"Versões reduzidas em: {self.staging}")
+
     def image_to_base64(self, image_path):
         """Converte imagem para base64"""
         try:
@@ -132,8 +375,15 @@ class BulkUploader:
             self.log(f"Erro ao converter imagem {image_path}: {e}", "ERROR")
             return None
     
-    def upload_pessoa(self, pessoa_config):
-        """Faz upload de uma pessoa para a API"""
+    def upload_pessoa(self, pessoa_config, recuperar=False):
+        """Faz upload de uma pessoa para a API
+
+        Retorna (sucesso, subject_id ou mensagem de erro, status HTTP).
+        recuperar: a pessoa pode ter sido cadastrada numa execução interrompida;
+        um 409 de email duplicado devolve o subject_id existente como sucesso.
+        Fora da recuperação, email ou imagem já cadastrados (409) retornam
+        (True, (subject_id existente, motivo), 409): o servidor já tem a pessoa.
+        """
         image_file = pessoa_config.get("image_file")
         name = pessoa_config.get("name")
         email = pessoa_config.get("email")
@@ -142,98 +392,250 @@ class BulkUploader:
         # Validar dados obrigatórios
         if not all([image_file, name, email, phone]):
             self.log(f"Dados incompletos para {name or 'pessoa'}: campos obrigatórios faltando", "ERROR")
-            return False
+            return False, "Dados incompletos", None
         
         # Verificar se arquivo de imagem existe
-        image_path = os.path.join(self.upload_folder, image_file)
+        image_path = self.caminho_imagem(image_file)
         if not os.path.exists(image_path):
             self.log(f"Imagem não encontrada: {image_file}", "ERROR")
-            return False
-        
-        # Converter imagem para base64
-        base64_image = self.image_to_base64(image_path)
-        if not base64_image:
-            return False
-        
-        # Preparar dados para API
-        payload = {
-            "name": name,
-            "email": email,
-            "phone": phone,
-            "image_base64": base64_image
-        }
+            return False, "Imagem não encontrada", None
         
         # Fazer requisição
         try:
             url = f"{API_BASE_URL}/{self.client}/persons"
-            response = requests.post(url, json=payload, timeout=30)
+            campos = {"name": name, "email": email, "phone": phone}
+            
+            base64_image = None
+            if not self.multipart:
+                # Converter imagem para base64
+                base64_image = self.image_to_base64(image_path)
+                if not base64_image:
+                    return False, "Erro ao ler a imagem", None
+            
+            for tentativa in range(MAX_RETRIES_OCUPADO + 1):
+                if self.limitador:
+                    self.limitador.aguardar()
+                if self.multipart:
+                    # Arquivo binário em multipart/form-data (sem inflar 33% com base64)
+                    with open(image_path, "rb") as f:
+                        response = self.session.post(url, data=campos, files={"file": (image_file, f)},
+                                                     timeout=REQUEST_TIMEOUT)
+                else:
+                    response = self.session.post(url, json={**campos, "image_base64": base64_image},
+                                                 timeout=REQUEST_TIMEOUT)
+                if response.status_code not in (429, 503) or tentativa == MAX_RETRIES_OCUPADO:
+                    break
+                espera = float(response.headers.get("Retry-After") or 2 ** tentativa)
+                self.log(f"{name}: servidor ocupado ({response.status_code}), nova tentativa em {espera:.0f}s", "WARNING")
+                time.sleep(espera)
             
             if response.status_code == 201:
                 self.log(f"✅ {name} cadastrado com sucesso", "SUCCESS")
-                return True
+                return True, response.json().get("subject_id"), 201
             else:
                 # Melhor tratamento de erro
                 try:
                     error_data = response.json()
                     error_msg = error_data.get("error", "Erro desconhecido")
 
-                    if "More than one face" in str(error_msg):
+                    if recuperar and response.status_code == 409 and error_data.get("duplicate_email_of"):
+                        subject_id = error_data["duplicate_email_of"][0]
+                        self.log(f"♻️ {name} já havia sido cadastrado (execução interrompida): {subject_id}", "SUCCESS")
+                        return True, subject_id, 201
+                    elif response.status_code == 409 and error_data.get("duplicate_email_of"):
+                        subject_id = error_data["duplicate_email_of"][0]
+                        self.log(f"{name}: email {email} já cadastrado ({subject_id})", "SKIP")
+                        return True, (subject_id, f"Email já cadastrado ({subject_id})"), 409
+                    elif response.status_code == 409 and error_data.get("duplicate_image_of"):
+                        subject_id = error_data["duplicate_image_of"][0]
+                        self.log(f"{name}: imagem {image_file} já cadastrada ({subject_id})", "SKIP")
+                        return True, (subject_id, f"Imagem já cadastrada ({subject_id})"), 409
+                    elif "More than one face" in str(error_msg):
                         self.log(f"❌ {name}: A imagem {image_file} contém MÚLTIPLAS FACES. Use uma imagem com apenas 1 face.", "ERROR")
-                        self.registrar_erro(name, image_file, "Múltiplas faces detectadas")
+                        error_msg = "Múltiplas faces detectadas"
                     elif "No face found" in str(error_msg):
                         self.log(f"❌ {name}: NENHUMA FACE detectada na imagem {image_file}. Verifique se é uma foto de rosto.", "ERROR")
-                        self.registrar_erro(name, image_file, "Nenhuma face detectada")
+                        error_msg = "Nenhuma face detectada"
                     elif "image_base64" in str(error_msg):
                         self.log(f"❌ {name}: Problema no formato da imagem {image_file}. Use JPG, PNG ou WEBP.", "ERROR")
-                        self.registrar_erro(name, image_file, "Erro no formato da imagem")
+                        error_msg = "Erro no formato da imagem"
                     else:
                         self.log(f"❌ {name}: {error_msg}", "ERROR")
-                        self.registrar_erro(name, image_file, error_msg)
                 
                 except:
-                    error_message = f"Erro HTTP {response.status_code} - {response.text}"
-                    self.log(f"❌ {name}: {error_message}", "ERROR")
-                    self.registrar_erro(name, image_file, error_message)
-                return False
+                    error_msg = f"Erro HTTP {response.status_code} - {response.text}"
+                    self.log(f"❌ {name}: {error_msg}", "ERROR")
+                self.registrar_erro(name, image_file, error_msg)
+                return False, error_msg, response.status_code
 
 
         except requests.exceptions.RequestException as e:
             self.log(f"Erro de rede ao cadastrar {name}: {e}", "ERROR")
-            return False
+            return False, f"Erro de rede: {e}", None
         except Exception as e:
             self.log(f"Erro inesperado ao cadastrar {name}: {e}", "ERROR")
-            return False
+            return False, f"Erro inesperado: {e}", None
     
 
     def registrar_erro(self, nome, imagem, mensagem):
         """Salva informações de erro em erros_upload.txt"""
-        log_path = "erros_upload.txt"
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(f"{nome} | {imagem} | {mensagem}\n")
+        with self._lock:
+            with open(ERROS_FILE, "a", encoding="utf-8") as f:
+                f.write(f"{nome} | {imagem} | {mensagem}\n")
 
+    def abrir_ledger(self):
+        """Abre o ledger do lote, recusando misturar execuções sem --resume/--retry-failed/--restart"""
+        self.ledger = LedgerUpload(self.ledger_file)
+        if self.restart:
+            return True  # histórico descartado só depois da confirmação
+        
+        resumo = self.ledger.resumo()
+        cliente_ledger = self.ledger.cliente()
+        if cliente_ledger and cliente_ledger != self.client:
+            self.log(f"Ledger {self.ledger_file} pertence ao cliente '{cliente_ledger}', não a '{self.client}'", "ERROR")
+            return False
+        if sum(resumo.values()) and not (self.resume or self.retry_failed):
+            self.log(f"Ledger {self.ledger_file} já registra um lote "
+                     f"({resumo['success']} sucessos, {resumo['error']} erros, {resumo['sending']} interrompidos)", "ERROR")
+            self.log("Use --resume para continuar, --retry-failed para reprocessar as falhas ou --restart para recomeçar", "INFO")
+            return False
+        
+        if sum(resumo.values()):
+            self.log(f"Ledger: {resumo['success']} sucessos, {resumo['error']} erros, {resumo['sending']} interrompidos")
+        return True
+
+    def deve_processar(self, pessoa):
+        """Decide pelo ledger se a pessoa entra nesta execução; retorna (processar, recuperar)"""
+        registro = self.ledger.estado(chave_pessoa(pessoa))
+        if registro is None:
+            # Nunca processada: entra em lote novo ou --resume, não em --retry-failed sozinho
+            return self.resume or not self.retry_failed, False
+        if registro["status"] == "sending":
+            # Interrompida sem resposta: o cadastro pode ter sido aplicado
+            return self.resume or self.retry_failed, True
+        if registro["status"] == "error":
+            # 409: o servidor já tem a pessoa (ledgers antigos); reenviar só repete o conflito
+            return self.retry_failed and registro["http_status"] != 409, False
+        return False, False
+
+    def processar_pessoa(self, pessoa, recuperar=False):
+        """Cadastra uma pessoa, registra no ledger e contabiliza o resultado (executado pelos workers)"""
+        chave = chave_pessoa(pessoa)
+        verificacao = self.verificacoes.get(pessoa["image_file"])
+        # Em recuperação a própria imagem pode já estar no servidor: quem decide é o 409 de email
+        duplicada = None
+        if self.dedup and not recuperar and not (verificacao and not verificacao["ok"]):
+            duplicada = self.imagem_duplicada(pessoa)
+        if verificacao and not verificacao["ok"]:
+            # Rejeitada na pré-verificação: não chega ao servidor (--retry-failed tenta de novo)
+            self.ledger.iniciar(chave, pessoa)
+            self.ledger.falhar(chave, f"Pré-verificação: {verificacao['motivo']}")
+            self.registrar_erro(pessoa.get("name"), pessoa["image_file"], verificacao["motivo"])
+            situacao = "ERRO"
+        elif duplicada:
+            subject_id, referencia = duplicada
+            self.ledger.marcar_duplicada(chave, pessoa, subject_id, referencia)
+            situacao = "DUPLICADA"
+        else:
+            self.ledger.iniciar(chave, pessoa)
+            sucesso, detalhe, http_status = self.upload_pessoa(pessoa, recuperar=recuperar)
+            if sucesso and http_status == 409:
+                subject_id, referencia = detalhe
+                self.ledger.marcar_duplicada(chave, pessoa, subject_id, referencia)
+                duplicada = detalhe
+                situacao = "DUPLICADA"
+            elif sucesso:
+                self.ledger.concluir(chave, detalhe)
+                situacao = "OK"
+            else:
+                self.ledger.falhar(chave, detalhe, http_status)
+                situacao = "ERRO"
+        with self._lock:
+            self.stats[{"OK": "success", "ERRO": "errors", "DUPLICADA": "duplicates"}[situacao]] += 1
+            self._concluidos += 1
+            concluidos = self._concluidos
+        detalhe = duplicada[1] if duplicada else (verificacao["motivo"] if verificacao and not verificacao["ok"] else None)
+        self.log(f"[{concluidos}/{self.total_previsto or '?'}] {situacao}: {pessoa.get('name', 'pessoa')}"
+                 + (f" ({detalhe})" if detalhe else ""))
+
+    def registrar_falha_inesperada(self, pessoa, erro):
+        """Exceção não tratada num worker: a pessoa conta como erro e fica como error no ledger"""
+        motivo = f"Erro inesperado: {type(erro).__name__}: {erro}"
+        self.log(f"{pessoa.get('name', 'pessoa')}: {motivo}", "ERROR")
+        self.registrar_erro(pessoa.get("name"), pessoa.get("image_file") or "-", motivo)
+        chave = chave_pessoa(pessoa)
+        try:
+            if self.ledger.estado(chave) is None:
+                self.ledger.iniciar(chave, pessoa)
+            self.ledger.falhar(chave, motivo)
+        except Exception as e:
+            self.log(f"Ledger: não foi possível registrar o erro de {chave}: {e}", "ERROR")
+        with self._lock:
+            self.stats["errors"] += 1
+            self._concluidos += 1
 
     def processar_upload(self):
         """Processa upload de todas as pessoas"""
-        # Limpar log anterior de erros
-        if os.path.exists("erros_upload.txt"):
-            os.remove("erros_upload.txt")
-        self.log("🚀 Iniciando upload em lote...")
+        # Limpar log anterior de erros (mantido ao continuar um lote)
+        if not (self.resume or self.retry_failed) and os.path.exists(ERROS_FILE):
+            os.remove(ERROS_FILE)
+        self.log(f"🚀 Iniciando upload em lote ({self.concurrency} simultâneo(s))...")
         
-        self.stats["total"] = len(self.config["persons"])
+        # Só o JSON tradicional tem o total antes de começar; JSONL/CSV contam durante a leitura
+        self.total_previsto = len(self.config["persons"]) if self.formato == "json" else None
+        inicio = time.monotonic()
         
-        for i, pessoa in enumerate(self.config["persons"], 1):
-            self.log(f"[{i}/{self.stats['total']}] Processando {pessoa.get('name', 'pessoa')}")
-            
-            if self.upload_pessoa(pessoa):
-                self.stats["success"] += 1
-            else:
-                self.stats["errors"] += 1
+        # Semáforo limita as pessoas enfileiradas: a fila não cresce além dos workers
+        vagas = threading.BoundedSemaphore(self.concurrency * 2)
+        
+        def executar(pessoa, recuperar):
+            try:
+                self.processar_pessoa(pessoa, recuperar)
+            except Exception as e:
+                self.registrar_falha_inesperada(pessoa, e)
+            finally:
+                vagas.release()
+        
+        chaves_lote = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="upload") as executor:
+            for linha, pessoa, erro in self.ler_pessoas():
+                with self._lock:
+                    self.stats["total"] += 1
+                if erro:
+                    self.log(f"Linha {linha}: {erro}", "ERROR")
+                    imagem = pessoa.get("image_file") if isinstance(pessoa, dict) else None
+                    self.registrar_erro(f"linha {linha}", imagem or "-", erro)
+                    with self._lock:
+                        self.stats["errors"] += 1
+                        self._concluidos += 1
+                    continue
+                chave = chave_pessoa(pessoa)
+                processar, recuperar = self.deve_processar(pessoa)
+                if chave in chaves_lote:
+                    self.log(f"{pessoa.get('name', 'pessoa')}: repetida no lote ({chave}), ignorada", "SKIP")
+                    processar = False
+                chaves_lote.add(chave)
+                if not processar:
+                    with self._lock:
+                        self.stats["skipped"] += 1
+                        self._concluidos += 1
+                    continue
+                vagas.acquire()
+                executor.submit(executar, pessoa, recuperar)
+        
+        duracao = time.monotonic() - inicio
         
         # Relatório final
         self.log("📊 RELATÓRIO FINAL:")
         self.log(f"   Total de pessoas: {self.stats['total']}")
         self.log(f"   Sucessos: {self.stats['success']}")
         self.log(f"   Erros: {self.stats['errors']}")
+        self.log(f"   Imagens repetidas (não enviadas): {self.stats['duplicates']}")
+        self.log(f"   Pulados (já processados): {self.stats['skipped']}")
+        resumo = self.ledger.resumo()
+        self.log(f"   Ledger ({self.ledger_file}): {resumo['success']} sucessos, {resumo['error']} erros, "
+                 f"{resumo['duplicate']} repetidas no total")
+        self.log(f"   Tempo: {duracao:.1f}s ({self.stats['total'] / duracao if duracao else 0:.1f} pessoas/s)")
         
         if self.stats["success"] > 0:
             self.log(f"🎉 Upload concluído! {self.stats['success']} pessoas cadastradas", "SUCCESS")
@@ -258,19 +660,40 @@ class BulkUploader:
         if not self.testar_conexao():
             return False
         
-        # 4. Confirmar upload
+        # 4. Ledger do lote (checkpoint por pessoa)
+        if not self.abrir_ledger():
+            return False
+        if self.dedup:
+            self.carregar_hashes_servidor()
+        
+        # Pré-verificação local: rejeitadas são reportadas antes de qualquer envio
+        if self.preflight:
+            self.executar_preflight()
+        
+        # 5. Confirmar upload
         self.log(f"Pronto para upload:")
         self.log(f"   Cliente: {self.client}")
         self.log(f"   Pasta: {self.upload_folder}")
-        self.log(f"   Pessoas: {len(self.config['persons'])}")
+        self.log(f"   Pessoas: {len(self.config['persons']) if self.formato == 'json' else f'{self.formato.upper()} em streaming'}")
+        self.log(f"   Envio: {'multipart/form-data' if self.multipart else 'JSON base64'}")
+        self.log(f"   Simultâneos: {self.concurrency}" + (f" | Limite: {1 / self.limitador.intervalo:g} req/s" if self.limitador else ""))
+        modos = [nome for ativo, nome in ((self.restart, "recomeçar"), (self.resume, "continuar"),
+                                          (self.retry_failed, "reprocessar falhas")) if ativo]
+        self.log(f"   Modo: {' + '.join(modos) or 'novo lote'} | Ledger: {self.ledger_file}")
         
         resposta = input("\n🤔 Confirma o upload? (s/N): ").strip().lower()
         if resposta not in ['s', 'sim', 'y', 'yes']:
             self.log("Upload cancelado pelo usuário", "INFO")
             return False
         
-        # 5. Processar upload
-        self.processar_upload()
+        # 6. Processar upload
+        if self.restart:
+            self.ledger.limpar()
+        self.ledger.definir_cliente(self.client)
+        try:
+            self.processar_upload()
+        finally:
+            self.ledger.close()
         return True
 
 def criar_estrutura_exemplo():
@@ -315,16 +738,48 @@ def criar_estrutura_exemplo():
 
 def main():
     """Função principal"""
-    if len(sys.argv) > 1 and sys.argv[1] == "--setup":
+    parser = argparse.ArgumentParser(description="Face Manager - Upload em Lote")
+    parser.add_argument("--setup", action="store_true", help="Cria estrutura e configuração de exemplo")
+    parser.add_argument("--config", default=CONFIG_FILE,
+                        help=f"Arquivo de configuração: JSON, .jsonl/.ndjson ou .csv (padrão: {CONFIG_FILE})")
+    parser.add_argument("--format", choices=("json", "jsonl", "csv"), default=None,
+                        help="Formato da entrada (padrão: pela extensão do arquivo)")
+    parser.add_argument("--client", default=None, help="Cliente (obrigatório para JSONL/CSV)")
+    parser.add_argument("--upload-folder", default=None, help=f"Pasta das imagens (padrão: {DEFAULT_UPLOAD_FOLDER})")
+    parser.add_argument("--multipart", action="store_true", help="Envia a imagem como multipart/form-data em vez de base64")
+    parser.add_argument("--concurrency", type=int, default=1, help="Cadastros simultâneos (padrão: 1)")
+    parser.add_argument("--rps", type=float, default=None, help="Máximo de requisições por segundo (padrão: sem limite)")
+    parser.add_argument("--ledger", default=None, help="Ledger SQLite do lote (padrão: <config>.ledger.db)")
+    parser.add_argument("--resume", action="store_true", help="Continua um lote interrompido, pulando quem já foi processado")
+    parser.add_argument("--retry-failed", action="store_true", help="Reprocessa apenas as pessoas que falharam")
+    parser.add_argument("--restart", action="store_true", help="Descarta o ledger e recomeça o lote do zero")
+    parser.add_argument("--no-dedup", action="store_true", help="Não pula fotos repetidas (hash da imagem normalizada)")
+    parser.add_argument("--preflight", action="store_true",
+                        help="Verifica todas as imagens localmente (em paralelo) antes do envio")
+    parser.add_argument("--staging", default=None,
+                        help="Pasta para as versões reduzidas das imagens (implica --preflight)")
+    parser.add_argument("--preflight-workers", type=int, default=None,
+                        help="Processos da pré-verificação (padrão: núcleos da CPU)")
+    parser.add_argument("--preflight-report", default=PREFLIGHT_REPORT_FILE,
+                        help=f"Relatório CSV das imagens rejeitadas (padrão: {PREFLIGHT_REPORT_FILE})")
+    args = parser.parse_args()
+    
+    if args.setup:
         criar_estrutura_exemplo()
         return
     
-    uploader = BulkUploader()
+    uploader = BulkUploader(config_file=args.config, multipart=args.multipart,
+                            concurrency=args.concurrency, rps=args.rps, ledger_file=args.ledger,
+                            resume=args.resume, retry_failed=args.retry_failed, restart=args.restart,
+                            dedup=not args.no_dedup, client=args.client,
+                            upload_folder=args.upload_folder, formato=args.format, preflight=args.preflight,
+                            staging=args.staging, preflight_workers=args.preflight_workers,
+                            preflight_report=args.preflight_report)
     
     try:
         uploader.executar()
     except KeyboardInterrupt:
-        print("\n⏹️  Upload interrompido pelo usuário")
+        print("\n⏹️  Upload interrompido pelo usuário (continue com --resume)")
     except Exception as e:
         print(f"\n❌ Erro inesperado: {e}")
 
@@ -0,0 +1,157 @@
+"""
+⚡ Face Manager - Cliente assíncrono do CompreFace
+Versão asyncio do compreface_client.py para scripts com muitas chamadas simultâneas.
+
+- Mesmos endpoints, chave e retentativas do cliente síncrono
+- Pool de conexões compartilhado (aiohttp.TCPConnector)
+- Semáforo limitando as chamadas em andamento
+- Timeout por chamada (conexão e leitura)
+
+Uso:
+    async with AsyncCompreFaceClient(concorrencia=32) as cliente:
+        resultados = await cliente.reconhecer_varios(caminhos, "carrefour")
+
+Requer: pip install aiohttp
+"""
+
+import asyncio
+import json
+import os
+import random
+
+try:
+    import aiohttp
+except ImportError:  # dependência opcional: só os scripts assíncronos precisam dela
+    aiohttp = None
+
+from compreface_client import (
+    API_KEY, BACKOFF_BASE, BACKOFF_MAX, CONNECT_TIMEOUT, LOG_BODY_LIMIT, MAX_RETRIES,
+    READ_TIMEOUT, RECOGNITION_URL, RETRY_STATUS, SUBJECTS_URL,
+)
+
+# =====================
+# 🔧 CONFIGURAÇÕES
+# =====================
+
+# Máximo de chamadas ao CompreFace em andamento ao mesmo tempo
+CONCURRENCY = int(os.environ.get("COMPREFACE_ASYNC_CONCURRENCY", 32))
+
+
+class CompreFaceErro(Exception):
+    """Resposta de erro do CompreFace (status HTTP e corpo)"""
+
+    def __init__(self, status, corpo):
+        super().__init__(f"CompreFace respondeu {status}: {corpo[:LOG_BODY_LIMIT]}")
+        self.status = status
+        self.corpo = corpo
+
+
+def _ler_arquivo(caminho):
+    with open(caminho, "rb") as f:
+        return f.read()
+
+
+class AsyncCompreFaceClient:
+    """Cliente asyncio do serviço de reconhecimento do CompreFace
+
+    Deve ser usado como `async with`, que abre e fecha a sessão compartilhada.
+    """
+
+    def __init__(self, base_url=None, api_key=None, concorrencia=None, connect_timeout=None,
+                 read_timeout=None, max_retries=None, subjects_url=None):
+        if aiohttp is None:
+            raise ImportError("aiohttp não instalado: pip install aiohttp")
+
+        self.base_url = (base_url or RECOGNITION_URL).rstrip("/")
+        self.subjects_url = subjects_url or (SUBJECTS_URL if base_url is None
+                                             else self.base_url.rsplit("/faces", 1)[0] + "/subjects")
+        self.api_key = api_key or API_KEY
+        self.concorrencia = concorrencia or CONCURRENCY
+        self.timeout = aiohttp.ClientTimeout(connect=connect_timeout or CONNECT_TIMEOUT,
+                                             sock_read=read_timeout or READ_TIMEOUT)
+        self.max_retries = MAX_RETRIES if max_retries is None else max_retries
+        self._semaforo = None
+        self.session = None
+
+    async def __aenter__(self):
+        self._semaforo = asyncio.Semaphore(self.concorrencia)
+        conector = aiohttp.TCPConnector(limit=self.concorrencia, keepalive_timeout=30)
+        self.session = aiohttp.ClientSession(connector=conector, timeout=self.timeout,
+                                             headers={"x-api-key": self.api_key})
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _requisicao(self, metodo, url, idempotente=True, arquivo=None, campos=None, **kwargs):
+        """Executa a requisição (dentro do semáforo) com retentativas em 5xx e falhas de conexão
+
+        arquivo: bytes enviados no campo multipart "file"; campos: demais campos do formulário.
+        """
+        tentativa = 0
+        while True:
+            if arquivo is not None:
+                # FormData é consumido no envio: recriar a cada tentativa
+                formulario = aiohttp.FormData()
+                formulario.add_field("file", arquivo, filename="image.jpg", content_type="image/jpeg")
+                for nome, valor in (campos or {}).items():
+                    formulario.add_field(nome, valor)
+                kwargs["data"] = formulario
+
+            try:
+                async with self._semaforo:
+                    async with self.session.request(metodo, url, **kwargs) as response:
+                        status = response.status
+                        corpo = await response.text()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # Timeout de leitura em cadastro não é repetido: pode ter sido aplicado
+                repetivel = idempotente or isinstance(e, aiohttp.ClientConnectorError)
+                if not repetivel or tentativa >= self.max_retries:
+                    raise
+                print(f"⚠️ [COMPREFACE] {metodo} falhou ({type(e).__name__}), tentativa {tentativa + 1}/{self.max_retries}")
+            else:
+                if status not in RETRY_STATUS or tentativa >= self.max_retries:
+                    if status >= 400:
+                        raise CompreFaceErro(status, corpo)
+                    return json.loads(corpo) if corpo else {}
+                print(f"⚠️ [COMPREFACE] {metodo} status {status}, tentativa {tentativa + 1}/{self.max_retries}")
+
+            await asyncio.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** tentativa))))
+            tentativa += 1
+
+    async def cadastrar(self, img_path, subject_id):
+        """Envia uma imagem para cadastrar no CompreFace"""
+        arquivo = await asyncio.to_thread(_ler_arquivo, img_path)
+        return await self._requisicao("POST", self.base_url, idempotente=False, arquivo=arquivo,
+                                      params={"subject": subject_id})
+
+    async def deletar(self, subject_id):
+        """Deleta todas as faces vinculadas ao subject"""
+        return await self._requisicao("DELETE", self.base_url, params={"subject": subject_id})
+
+    async def reconhecer(self, img_path, cliente):
+        """Reconhece a pessoa, restringindo aos subjects com prefixo do cliente"""
+        arquivo = await asyncio.to_thread(_ler_arquivo, img_path)
+        return await self._requisicao("POST", f"{self.base_url}/recognize", arquivo=arquivo,
+                                      campos={"subject": f"{cliente}_"})
+
+    async def listar_subjects(self):
+        """Lista os subjects cadastrados no CompreFace"""
+        return (await self._requisicao("GET", self.subjects_url)).get("subjects", [])
+
+    async def reconhecer_varios(self, caminhos, cliente):
+        """Reconhece várias imagens em paralelo, na ordem de entrada
+
+        Falhas individuais vêm como a exceção na posição correspondente.
+        """
+        return await asyncio.gather(*(self.reconhecer(caminho, cliente) for caminho in caminhos),
+                                    return_exceptions=True)
+
+    async def deletar_varios(self, subject_ids):
+        """Deleta vários subjects em paralelo (exceções na posição correspondente)"""
+        return await asyncio.gather(*(self.deletar(sid) for sid in subject_ids), return_exceptions=True)
@@ -1,58 +1,317 @@
+"""
+🤖 Face Manager - Cliente HTTP do CompreFace
+Sessão com keep-alive (pool de conexões), timeouts e retentativas com backoff.
+
+Configuração por variáveis de ambiente:
+    COMPREFACE_URL              URL base do serviço de reconhecimento
+    COMPREFACE_SUBJECTS_URL     URL da listagem de subjects (padrão: derivada de COMPREFACE_URL)
+    COMPREFACE_API_KEY          Chave da API
+    COMPREFACE_CONNECT_TIMEOUT  Timeout de conexão em segundos (padrão: 3)
+    COMPREFACE_READ_TIMEOUT     Timeout de leitura em segundos (padrão: 30)
+    COMPREFACE_MAX_RETRIES      Retentativas em erro 5xx/conexão (padrão: 2)
+    COMPREFACE_POOL_SIZE        Conexões mantidas abertas (padrão: 10)
+    COMPREFACE_MAX_IN_FLIGHT    Chamadas simultâneas por processo (padrão: 16)
+    COMPREFACE_BREAKER_*        Disjuntor (circuit breaker): ver DisjuntorCompreFace
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+
 import requests
+from requests.adapters import HTTPAdapter
+
+# =====================
+# 🔧 CONFIGURAÇÕES
+# =====================
 
 # Configurações da API do CompreFace
-API_KEY = "52f25461-4ef8-4489-a10d-c2b076fc62a2"
-RECOGNITION_URL = "https://facial-back.visionlabss.com/api/v1/recognition/faces"
+API_KEY = os.environ.get("COMPREFACE_API_KEY", "52f25461-4ef8-4489-a10d-c2b076fc62a2")
+RECOGNITION_URL = os.environ.get("COMPREFACE_URL", "https://facial-back.visionlabss.com/api/v1/recognition/faces")
+SUBJECTS_URL = os.environ.get("COMPREFACE_SUBJECTS_URL", RECOGNITION_URL.rstrip("/").rsplit("/faces", 1)[0] + "/subjects")
 HEADERS = {"x-api-key": API_KEY}
 
+CONNECT_TIMEOUT = float(os.environ.get("COMPREFACE_CONNECT_TIMEOUT", 3))
+READ_TIMEOUT = float(os.environ.get("COMPREFACE_READ_TIMEOUT", 30))
+MAX_RETRIES = int(os.environ.get("COMPREFACE_MAX_RETRIES", 2))
+POOL_SIZE = int(os.environ.get("COMPREFACE_POOL_SIZE", 10))
+
+# Backoff exponencial com jitter: espera aleatória em [0, min(MAX, BASE * 2^tentativa)]
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 4.0
+RETRY_STATUS = {500, 502, 503, 504}
+
+# Limite de caracteres da resposta exibida no log de erro
+LOG_BODY_LIMIT = 300
+
+# Proteção contra CompreFace lento/fora do ar (falha rápida em vez de prender workers)
+MAX_IN_FLIGHT = int(os.environ.get("COMPREFACE_MAX_IN_FLIGHT", 16))
+IN_FLIGHT_WAIT = float(os.environ.get("COMPREFACE_IN_FLIGHT_WAIT", 0.5))
+BREAKER_WINDOW = int(os.environ.get("COMPREFACE_BREAKER_WINDOW", 20))
+BREAKER_MIN_CALLS = int(os.environ.get("COMPREFACE_BREAKER_MIN_CALLS", 10))
+BREAKER_FAILURE_RATE = float(os.environ.get("COMPREFACE_BREAKER_FAILURE_RATE", 0.5))
+BREAKER_SLOW_CALL_SECONDS = float(os.environ.get("COMPREFACE_BREAKER_SLOW_CALL_SECONDS", 5))
+BREAKER_OPEN_SECONDS = float(os.environ.get("COMPREFACE_BREAKER_OPEN_SECONDS", 30))
+
+
+class CompreFaceIndisponivel(Exception):
+    """Chamada recusada sem contatar o CompreFace; retry_after em segundos"""
+
+    def __init__(self, mensagem, retry_after):
+        super().__init__(mensagem)
+        self.retry_after = retry_after
+
+
+class DisjuntorCompreFace:
+    """Circuit breaker: abre quando falhas ou chamadas lentas dominam a janela recente
+
+    closed    -> chamadas normais; janela com as últimas BREAKER_WINDOW chamadas
+    open      -> recusa tudo por BREAKER_OPEN_SECONDS
+    half_open -> deixa passar uma chamada de teste; sucesso fecha, falha reabre
+    Só o resultado da chamada de teste decide a transição: chamadas iniciadas
+    antes (com o circuito fechado) que terminam depois da abertura são ignoradas.
+    Falhas: erros de conexão, timeouts e 5xx. Respostas 4xx contam como sucesso
+    (o serviço respondeu); acima de BREAKER_SLOW_CALL_SECONDS a chamada é lenta.
+    """
+
+    def __init__(self, janela=BREAKER_WINDOW, minimo=BREAKER_MIN_CALLS, taxa=BREAKER_FAILURE_RATE,
+                 lenta=BREAKER_SLOW_CALL_SECONDS, aberto_por=BREAKER_OPEN_SECONDS):
+        self.minimo = minimo
+        self.taxa = taxa
+        self.lenta = lenta
+        self.aberto_por = aberto_por
+        self._lock = threading.Lock()
+        self._chamadas = deque(maxlen=janela)   # (falhou, lenta)
+        self.estado = "closed"
+        self._aberto_ate = 0.0
+        self._teste_em_andamento = False
+
+    def _verificar(self):
+        """Levanta CompreFaceIndisponivel se uma nova chamada seria recusada (com o lock)"""
+        if self.estado == "open":
+            restante = self._aberto_ate - time.monotonic()
+            if restante > 0:
+                raise CompreFaceIndisponivel("CompreFace indisponível (circuito aberto)", restante)
+        elif self.estado == "half_open" and self._teste_em_andamento:
+            raise CompreFaceIndisponivel("CompreFace em verificação (circuito semiaberto)", 1)
+
+    def verificar(self):
+        """Consulta sem reservar a chamada: levanta CompreFaceIndisponivel se ela seria recusada
+
+        Permite recusar um cadastro antes de qualquer trabalho local.
+        """
+        with self._lock:
+            self._verificar()
+
+    def permitir(self):
+        """Libera a chamada ou levanta CompreFaceIndisponivel
+
+        Retorna True quando a chamada é o teste do semiaberto (repassar a registrar/liberar_teste).
+        """
+        with self._lock:
+            self._verificar()
+            if self.estado == "open":
+                self.estado = "half_open"
+            if self.estado == "half_open":
+                self._teste_em_andamento = True
+                return True
+            return False
+
+    def registrar(self, falhou, duracao, teste=False):
+        with self._lock:
+            lenta = duracao > self.lenta
+            if teste:
+                self._teste_em_andamento = False
+                if falhou or lenta:
+                    self._abrir()
+                else:
+                    self.estado = "closed"
+                    self._chamadas.clear()
+                return
+            if self.estado != "closed":
+                return  # iniciada antes da abertura: não decide nada
+
+            self._chamadas.append((falhou, lenta))
+            if len(self._chamadas) < self.minimo:
+                return
+            falhas = sum(1 for f, _ in self._chamadas if f) / len(self._chamadas)
+            lentas = sum(1 for _, l in self._chamadas if l) / len(self._chamadas)
+            if falhas >= self.taxa or lentas >= self.taxa:
+                self._abrir()
+
+    def liberar_teste(self, teste):
+        """Devolve a vaga de teste do semiaberto sem registrar resultado"""
+        if not teste:
+            return
+        with self._lock:
+            self._teste_em_andamento = False
+
+    def _abrir(self):
+        if self.estado != "open":
+            print(f"🔌 [COMPREFACE] Circuito aberto por {self.aberto_por:.0f}s")
+        self.estado = "open"
+        self._aberto_ate = time.monotonic() + self.aberto_por
+        self._chamadas.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "state": self.estado,
+                "recent_calls": len(self._chamadas),
+                "recent_failures": sum(1 for f, _ in self._chamadas if f),
+                "recent_slow_calls": sum(1 for _, l in self._chamadas if l),
+                "retry_after": round(max(self._aberto_ate - time.monotonic(), 0), 1) if self.estado == "open" else 0
+            }
+
+
+class CompreFaceClient:
+    """Cliente do serviço de reconhecimento do CompreFace
+
+    Uma única sessão HTTP é compartilhada entre as chamadas (e threads),
+    reaproveitando conexões TLS em vez de abrir uma nova por requisição.
+    """
+
+    def __init__(self, base_url=None, api_key=None, connect_timeout=None, read_timeout=None,
+                 max_retries=None, pool_size=None, subjects_url=None):
+        self.base_url = (base_url or RECOGNITION_URL).rstrip("/")
+        self.subjects_url = subjects_url or (SUBJECTS_URL if base_url is None
+                                             else self.base_url.rsplit("/faces", 1)[0] + "/subjects")
+        self.api_key = api_key or API_KEY
+        self.timeout = (connect_timeout or CONNECT_TIMEOUT, read_timeout or READ_TIMEOUT)
+        self.max_retries = MAX_RETRIES if max_retries is None else max_retries
+        self.disjuntor = DisjuntorCompreFace()
+        self.max_in_flight = MAX_IN_FLIGHT
+        self._vagas = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+        self._em_andamento = 0
+        self._lock_contagem = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers.update({"x-api-key": self.api_key})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size or POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def _espera(self, tentativa):
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** tentativa)))
+
+    def _enviar(self, metodo, url, abrir_arquivo=None, **kwargs):
+        """Uma tentativa, dentro do limite de chamadas simultâneas e do disjuntor"""
+        teste = self.disjuntor.permitir()
+        if not self._vagas.acquire(timeout=IN_FLIGHT_WAIT):
+            self.disjuntor.liberar_teste(teste)
+            raise CompreFaceIndisponivel("Muitas chamadas simultâneas ao CompreFace", 1)
+
+        with self._lock_contagem:
+            self._em_andamento += 1
+        inicio = time.monotonic()
+        falhou = True
+        try:
+            if abrir_arquivo:
+                with open(abrir_arquivo, "rb") as f:
+                    kwargs["files"] = {**kwargs.get("files", {}), "file": f}
+                    response = self.session.request(metodo, url, timeout=self.timeout, **kwargs)
+            else:
+                response = self.session.request(metodo, url, timeout=self.timeout, **kwargs)
+            falhou = response.status_code >= 500
+            return response
+        finally:
+            with self._lock_contagem:
+                self._em_andamento -= 1
+            self._vagas.release()
+            self.disjuntor.registrar(falhou, time.monotonic() - inicio, teste)
+
+    def _requisicao(self, metodo, url, idempotente=True, abrir_arquivo=None, **kwargs):
+        """Executa a requisição com retentativas em 5xx e falhas de conexão
+
+        Timeouts de leitura só são repetidos em operações idempotentes: um
+        cadastro pode ter sido aplicado mesmo sem resposta.
+        abrir_arquivo: caminho reaberto a cada tentativa (o corpo multipart é consumido).
+        Com o circuito aberto ou o limite de chamadas atingido, levanta
+        CompreFaceIndisponivel sem contatar o serviço.
+        """
+        tentativa = 0
+        while True:
+            try:
+                response = self._enviar(metodo, url, abrir_arquivo, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                repetivel = idempotente or not isinstance(e, requests.ReadTimeout)
+                if not repetivel or tentativa >= self.max_retries:
+                    raise
+                print(f"⚠️ [COMPREFACE] {metodo} falhou ({type(e).__name__}), tentativa {tentativa + 1}/{self.max_retries}")
+            else:
+                if response.status_code not in RETRY_STATUS or tentativa >= self.max_retries:
+                    if not response.ok:
+                        print(f"❌ [COMPREFACE] {metodo} {response.status_code}: {response.text[:LOG_BODY_LIMIT]}")
+                    response.raise_for_status()
+                    return response.json()
+                print(f"⚠️ [COMPREFACE] {metodo} status {response.status_code}, tentativa {tentativa + 1}/{self.max_retries}")
+
+            time.sleep(self._espera(tentativa))
+            tentativa += 1
+
+    def cadastrar(self, img_path, subject_id):
+        """Envia uma imagem para cadastrar no CompreFace"""
+        return self._requisicao("POST", self.base_url, idempotente=False, abrir_arquivo=img_path,
+                                params={"subject": subject_id})
+
+    def deletar(self, subject_id):
+        """Deleta todas as faces vinculadas ao subject"""
+        return self._requisicao("DELETE", self.base_url, params={"subject": subject_id})
+
+    def reconhecer(self, img_path, cliente):
+        """Reconhece a pessoa, restringindo aos subjects com prefixo do cliente (ex: 'carrefour_')"""
+        prefixo_subject = f"{cliente}_"  # Importante: prefixo que restringe ao cliente
+        return self._requisicao("POST", f"{self.base_url}/recognize", abrir_arquivo=img_path,
+                                files={"subject": (None, prefixo_subject)})  # <- ESSENCIAL para filtrar
+
+    def listar_subjects(self):
+        """Lista os subjects cadastrados no CompreFace"""
+        return self._requisicao("GET", self.subjects_url).get("subjects", [])
+
+    def verificar_disponivel(self):
+        """Levanta CompreFaceIndisponivel se o disjuntor recusaria uma chamada agora"""
+        self.disjuntor.verificar()
+
+    def estatisticas(self):
+        """Estado do disjuntor e chamadas em andamento neste processo"""
+        return {**self.disjuntor.estatisticas(), "in_flight": self._em_andamento, "max_in_flight": self.max_in_flight}
+
+
+_cliente_padrao = None
+_cliente_lock = threading.Lock()
+
+def obter_cliente():
+    """Cliente compartilhado do processo (criado na primeira chamada)"""
+    global _cliente_padrao
+    if _cliente_padrao is None:
+        with _cliente_lock:
+            if _cliente_padrao is None:
+                _cliente_padrao = CompreFaceClient()
+    return _cliente_padrao
+
+
 def cadastrar_face(img_path, subject_id):
     """Envia uma imagem para cadastrar no CompreFace"""
-    with open(img_path, "rb") as f:
-        files = {"file": f}
-        response = requests.post(
-            f"{RECOGNITION_URL}?subject={subject_id}",
-            headers=HEADERS,
-            files=files
-        )
-    
-    print(f"📥 [CADASTRO] Status: {response.status_code}")
-    print(f"📥 [CADASTRO] Resposta: {response.text}")
-    response.raise_for_status()
-    return response.json()
+    resultado = obter_cliente().cadastrar(img_path, subject_id)
+    print(f"📥 [CADASTRO] Subject: {subject_id} - OK")
+    return resultado
 
 def deletar_face(subject_id):
     """Deleta todas as faces vinculadas ao subject"""
-    response = requests.delete(
-        f"{RECOGNITION_URL}?subject={subject_id}",
-        headers=HEADERS
-    )
-    
-    print(f"🗑️ [DELETE] Subject: {subject_id} - Status: {response.status_code}")
-    response.raise_for_status()
-    return response.json()
+    resultado = obter_cliente().deletar(subject_id)
+    print(f"🗑️ [DELETE] Subject: {subject_id} - OK")
+    return resultado
 
 def reconhecer_face(img_path, cliente):
     """
     Envia uma imagem para reconhecer a pessoa.
     Aplica filtro de subject pelo nome do cliente (ex: 'carrefour_').
     """
-    prefixo_subject = f"{cliente}_"  # Importante: prefixo que restringe ao cliente
-
-    with open(img_path, "rb") as f:
-        files = {
-            "file": f,
-            "subject": (None, prefixo_subject)  # <- ESSENCIAL para filtrar
-        }
-        response = requests.post(
-            f"{RECOGNITION_URL}/recognize",  # endpoint de reconhecimento
-            headers=HEADERS,
-            files=files
-        )
-
-    print(f"🔍 [RECONHECIMENTO] Enviando imagem para CompreFace...")
-    print(f"📦 [RECONHECIMENTO] Subject prefixo: {prefixo_subject}")
-    print(f"📊 [RECONHECIMENTO] Status: {response.status_code}")
-    print(f"📨 [RECONHECIMENTO] Resposta: {response.text}")
-
-    response.raise_for_status()
-    return response.json()
\ No newline at end of file
+    resultado = obter_cliente().reconhecer(img_path, cliente)
+    print(f"🔍 [RECONHECIMENTO] Cliente: {cliente} - {len(resultado.get('result', []))} face(s)")
+    return resultado
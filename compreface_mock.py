@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+🧪 Face Manager - CompreFace Simulado
+Servidor local que imita os endpoints do CompreFace usados pelo projeto, para
+testes de carga e benchmarks sem depender do serviço real.
+
+Endpoints:
+    POST   /api/v1/recognition/faces?subject=X      Cadastrar face
+    DELETE /api/v1/recognition/faces?subject=X      Deletar faces do subject
+    POST   /api/v1/recognition/faces/recognize      Reconhecer (campo subject = prefixo)
+    POST   /api/v1/recognition/recognize            Idem (rota antiga dos scripts)
+    GET    /api/v1/recognition/subjects             Listar subjects
+
+    GET/PUT /__mock/config   Injeção de falhas em tempo de execução
+    GET     /__mock/stats    Contadores de requisições
+    POST    /__mock/reset    Limpa subjects e contadores
+
+O reconhecimento compara o SHA-256 da imagem recebida com as imagens
+cadastradas: a mesma imagem (o Face Manager normaliza antes de enviar)
+volta com similaridade 0.99; qualquer outra volta como face desconhecida.
+
+Uso:
+    python compreface_mock.py --port 8000 --latency lognormal:120,0.4 --error-rate 0.02
+    COMPREFACE_URL=http://localhost:8000/api/v1/recognition/faces python app.py
+
+Distribuições de latência (ms): fixed:100 | uniform:50,200 | normal:100,20 | lognormal:100,0.5
+"""
+
+import argparse
+import hashlib
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import Flask, jsonify, request
+
+# =====================
+# 🔧 CONFIGURAÇÕES
+# =====================
+
+DEFAULT_PORT = 8000
+SIMILARIDADE_IGUAL = 0.99
+BOX_PADRAO = {"probability": 0.999, "x_min": 60, "y_min": 40, "x_max": 220, "y_max": 240}
+
+app = Flask(__name__)
+
+config = {
+    "latency": "fixed:0",        # distribuição da latência (ms)
+    "error_rate": 0.0,           # fração de respostas 500
+    "no_face_rate": 0.0,         # fração de "No face is found" (400)
+    "multi_face_rate": 0.0,      # fração de "More than one face" (cadastro) / 2 faces (reconhecimento)
+    "api_key": None              # se definido, exige x-api-key igual
+}
+
+_lock = threading.Lock()
+_subjects = {}                   # subject -> {image_id: sha256}
+_stats = Counter()
+_random = random.Random()
+
+
+def sortear_latencia(especificacao):
+    """Latência em segundos conforme 'tipo:parametros' (valores em ms)"""
+    tipo, _, parametros = especificacao.partition(":")
+    valores = [float(v) for v in parametros.split(",") if v] or [0.0]
+    if tipo == "fixed":
+        ms = valores[0]
+    elif tipo == "uniform":
+        ms = _random.uniform(valores[0], valores[1])
+    elif tipo == "normal":
+        ms = _random.gauss(valores[0], valores[1])
+    elif tipo == "lognormal":
+        # valores: mediana (ms) e sigma
+        ms = _random.lognormvariate(0, valores[1]) * valores[0]
+    else:
+        raise ValueError(f"Distribuição desconhecida: {tipo}")
+    return max(ms, 0.0) / 1000
+
+
+def validar_distribuicao(especificacao):
+    sortear_latencia(especificacao)
+    return especificacao
+
+
+def contar(chave):
+    with _lock:
+        _stats[chave] += 1
+
+
+def erro(mensagem, codigo, status):
+    return jsonify({"message": mensagem, "code": codigo}), status
+
+
+def hash_upload():
+    arquivo = request.files.get("file")
+    if arquivo is None:
+        return None
+    return hashlib.sha256(arquivo.read()).hexdigest()
+
+
+@app.before_request
+def simular():
+    """Aplica autenticação, latência e falhas aleatórias às rotas do CompreFace"""
+    if request.path.startswith("/__mock"):
+        return None
+
+    contar(f"{request.method} {request.path}")
+    if config["api_key"] and request.headers.get("x-api-key") != config["api_key"]:
+        contar("401")
+        return erro("Invalid API key", 401, 401)
+
+    time.sleep(sortear_latencia(config["latency"]))
+    if _random.random() < config["error_rate"]:
+        contar("500")
+        return erro("Simulated internal error", 0, 500)
+    if request.method == "POST" and _random.random() < config["no_face_rate"]:
+        contar("no_face")
+        return erro("No face is found in the given image", 28, 400)
+    return None
+
+
+@app.route("/api/v1/recognition/faces", methods=["POST"])
+def cadastrar():
+    subject = request.args.get("subject")
+    if not subject:
+        return erro("subject is required", 5, 400)
+    image_hash = hash_upload()
+    if image_hash is None:
+        return erro("file is required", 5, 400)
+    if _random.random() < config["multi_face_rate"]:
+        contar("multi_face")
+        return erro("More than one face is found in the given image", 30, 400)
+
+    image_id = str(uuid.uuid4())
+    with _lock:
+        _subjects.setdefault(subject, {})[image_id] = image_hash
+    return jsonify({"image_id": image_id, "subject": subject})
+
+
+@app.route("/api/v1/recognition/faces", methods=["DELETE"])
+def deletar():
+    subject = request.args.get("subject")
+    with _lock:
+        removidas = _subjects.pop(subject, {}) if subject else {}
+    return jsonify({"deleted": len(removidas)})
+
+
+@app.route("/api/v1/recognition/faces/recognize", methods=["POST"])
+@app.route("/api/v1/recognition/recognize", methods=["POST"])
+def reconhecer():
+    image_hash = hash_upload()
+    if image_hash is None:
+        return erro("file is required", 5, 400)
+    prefixo = request.form.get("subject", "")
+
+    with _lock:
+        encontrados = [
+            subject for subject, imagens in _subjects.items()
+            if subject.startswith(prefixo) and image_hash in imagens.values()
+        ]
+    faces = [{
+        "box": BOX_PADRAO,
+        "subjects": [{"subject": subject, "similarity": SIMILARIDADE_IGUAL} for subject in sorted(encontrados)]
+    }]
+    if _random.random() < config["multi_face_rate"]:
+        contar("multi_face")
+        faces.append({"box": {**BOX_PADRAO, "x_min": 300, "x_max": 460}, "subjects": []})
+    return jsonify({"result": faces})
+
+
+@app.route("/api/v1/recognition/subjects", methods=["GET"])
+def listar_subjects():
+    with _lock:
+        return jsonify({"subjects": sorted(_subjects)})
+
+
+# =====================
+# 🎛️ CONTROLE DO SIMULADOR
+# =====================
+
+@app.route("/__mock/config", methods=["GET", "PUT"])
+def mock_config():
+    if request.method == "PUT":
+        novos = request.get_json() or {}
+        desconhecidos = set(novos) - set(config)
+        if desconhecidos:
+            return jsonify({"error": f"Campos desconhecidos: {sorted(desconhecidos)}"}), 400
+        try:
+            if "latency" in novos:
+                validar_distribuicao(novos["latency"])
+        except (ValueError, IndexError) as e:
+            return jsonify({"error": str(e)}), 400
+        config.update(novos)
+    return jsonify(config)
+
+
+@app.route("/__mock/stats", methods=["GET"])
+def mock_stats():
+    with _lock:
+        total_faces = sum(len(imagens) for imagens in _subjects.values())
+        return jsonify({"subjects": len(_subjects), "faces": total_faces, "requests": dict(_stats)})
+
+
+@app.route("/__mock/reset", methods=["POST"])
+def mock_reset():
+    with _lock:
+        _subjects.clear()
+        _stats.clear()
+    return jsonify({"success": True})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CompreFace simulado para testes de carga")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=validar_distribuicao, default=config["latency"],
+                        help="fixed:MS | uniform:MIN,MAX | normal:MEDIA,DESVIO | lognormal:MEDIANA,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de respostas 500")
+    parser.add_argument("--no-face-rate", type=float, default=0.0, help='Fração de "No face is found"')
+    parser.add_argument("--multi-face-rate", type=float, default=0.0, help='Fração de "More than one face"')
+    parser.add_argument("--api-key", default=None, help="Exige este x-api-key")
+    parser.add_argument("--seed", type=int, default=None, help="Semente para falhas reproduzíveis")
+    args = parser.parse_args()
+
+    config.update(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        no_face_rate=args.no_face_rate,
+        multi_face_rate=args.multi_face_rate,
+        api_key=args.api_key
+    )
+    if args.seed is not None:
+        _random.seed(args.seed)
+
+    print("🧪 CompreFace simulado")
+    print(f"   👉 COMPREFACE_URL=http://{args.host}:{args.port}/api/v1/recognition/faces")
+    print(f"   ⏱️ Latência: {config['latency']} | erros: {config['error_rate']:.0%} | "
+          f"sem face: {config['no_face_rate']:.0%} | várias faces: {config['multi_face_rate']:.0%}")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,7 @@ const FaceUpload: React.FC = () => {
   const [selectedClient, setSelectedClient] = useState<string>('carrefour'); // Cliente selecionado pelo usuário
 
   // 🚀 CONFIGURAÇÕES DE PRODUÇÃO
-  const COMPREFACE_URL = 'https://facial-back.visionlabss.com/api/v1/recognition/recognize';
-  const FACE_MANAGER_URL = 'https://facial-front.visionlabss.com/api';
-  const API_KEY = '52f25461-4ef8-4489-a10d-c2b076fc62a2';
+  const FACE_MANAGER_URL = process.env.REACT_APP_FACE_MANAGER_URL || 'https://facial-front.visionlabss.com/api';
 
   // 🏢 CLIENTES DISPONÍVEIS
   const AVAILABLE_CLIENTS = {
@@ -41,146 +39,64 @@ const FaceUpload: React.FC = () => {
       return;
     }
 
-    logMessage('🚀 Enviando imagem para CompreFace...');
+    logMessage('🚀 Enviando imagem para reconhecimento...');
     logMessage(`🎯 Buscando na base de dados: ${AVAILABLE_CLIENTS[selectedClient as keyof typeof AVAILABLE_CLIENTS]}`);
 
     const formData = new FormData();
     formData.append('file', selectedFile);
 
     try {
-      const comprefaceResp = await fetch(COMPREFACE_URL, {
+      // Uma única chamada: o Face Manager consulta o CompreFace e já devolve os dados da pessoa
+      const apiUrl = `${FACE_MANAGER_URL}/${selectedClient}/recognize`;
+      logMessage(`📡 Enviando para: ${apiUrl}`);
+
+      const resp = await fetch(apiUrl, {
         method: 'POST',
         headers: {
-          'x-api-key': API_KEY
+          'Accept': 'application/json'
         },
-        body: formData
+        body: formData,
+        mode: 'cors'
       });
 
-      if (!comprefaceResp.ok) {
-        logMessage(`❌ Erro no CompreFace: ${comprefaceResp.status}`);
-        return;
-      }
-
-      const comprefaceData = await comprefaceResp.json();
-      console.log('🧠 Resposta CompreFace:', comprefaceData);
-
-      const result = comprefaceData.result?.[0];
-      if (!result || !result.subjects || result.subjects.length === 0) {
-        logMessage('😞 Nenhuma face reconhecida.');
-        return;
-      }
-
-      const bestMatch = result.subjects[0];
-      const subject = bestMatch.subject;
-      const confidence = bestMatch.similarity;
-
-      logMessage(`🎯 Face reconhecida: ${subject} (Confiança: ${(confidence * 100).toFixed(2)}%)`);
-
-
-      // 🧠 Detecta cliente com prefixo mais longo primeiro
-      const allClientKeys = Object.keys(AVAILABLE_CLIENTS).sort((a, b) => b.length - a.length);
-
-      let clienteDetectado = '';
-      let personId = '';
-
-      for (const clientKey of allClientKeys) {
-        if (subject.startsWith(clientKey + '_')) {
-          clienteDetectado = clientKey;
-          personId = subject.slice(clientKey.length + 1); // remove prefixo + "_"
-          break;
-        }
-      }
+      const data = await resp.json();
+      console.log('🧠 Resposta do reconhecimento:', data);
 
-      if (!clienteDetectado || !personId) {
-        logMessage(`❌ Não foi possível extrair cliente e ID do subject: ${subject}`);
+      if (!resp.ok) {
+        logMessage(`❌ Erro ${resp.status}: ${data.error || JSON.stringify(data)}`);
         return;
       }
 
-
-
-
-
-      
-      logMessage(`🔍 CompreFace detectou: ${clienteDetectado} | ID: ${personId}`);
-      logMessage(`🏢 Mas vamos buscar na base selecionada: ${selectedClient}`);
-
-      // Validar se temos um ID válido
-      if (!personId || personId.trim() === '') {
-        logMessage(`❌ ID da pessoa inválido ou vazio`);
+      if (!data.faces || data.faces.length === 0) {
+        logMessage('😞 Nenhuma face detectada.');
         return;
       }
 
-      // 🎯 BUSCA INTELIGENTE: Primeiro na empresa selecionada, depois na detectada
-      const trySearchInClient = async (clientToSearch: string, isOriginalClient: boolean = false) => {
-        const apiUrl = `${FACE_MANAGER_URL}/${clientToSearch}/persons/${personId}`;
-        logMessage(`📡 ${isOriginalClient ? 'Tentando' : 'Buscando'} em: ${apiUrl}`);
-        
-        try {
-          const pessoaResp = await fetch(apiUrl, {
-            method: 'GET',
-            headers: {
-              'Accept': 'application/json',
-              'Content-Type': 'application/json',
-            },
-            mode: 'cors'
-          });
-
-          if (pessoaResp.ok) {
-            const pessoa = await pessoaResp.json();
-            console.log('👤 Dados da pessoa:', pessoa);
+      data.faces.forEach((face: any, idx: number) => {
+        if (data.faces.length > 1) {
+          logMessage(`--- Face ${idx + 1} ---`);
+        }
 
-            // Verificar se a resposta tem os dados esperados
-            if (pessoa.success && pessoa.person) {
-              const p = pessoa.person;
-              logMessage(`✅ Pessoa encontrada no ${AVAILABLE_CLIENTS[clientToSearch as keyof typeof AVAILABLE_CLIENTS]}!`);
-              logMessage(`👤 Nome: ${p.name}`);
-              logMessage(`📧 Email: ${p.email}`);
-              logMessage(`📱 Telefone: ${p.phone}`);
-              return true;
-            } else if (pessoa.person) {
-              const p = pessoa.person;
-              logMessage(`✅ Pessoa: ${p.name} | Email: ${p.email} | Telefone: ${p.phone}`);
-              return true;
-            } else if (pessoa.name) {
-              logMessage(`✅ Pessoa: ${pessoa.name} | Email: ${pessoa.email} | Telefone: ${pessoa.phone}`);
-              return true;
-            } else {
-              logMessage(`⚠️ Resposta em formato inesperado: ${JSON.stringify(pessoa)}`);
-              return true;
-            }
-          } else {
-            if (!isOriginalClient) {
-              const errorText = await pessoaResp.text();
-              logMessage(`❌ Erro ${pessoaResp.status}: ${errorText}`);
-            }
-            return false;
-          }
-        } catch (fetchError: any) {
-          if (!isOriginalClient) {
-            logMessage(`❌ Erro ao buscar dados: ${fetchError.message}`);
-          }
-          return false;
+        const bestMatch = face.best_match;
+        if (!bestMatch) {
+          logMessage(`😞 Face não reconhecida no ${AVAILABLE_CLIENTS[selectedClient as keyof typeof AVAILABLE_CLIENTS]}`);
+          logMessage(`💡 Dica: Talvez essa pessoa precise ser cadastrada primeiro`);
+          return;
         }
-      };
 
-      // 🔍 BUSCA INTELIGENTE: Primeira tentativa na empresa selecionada
-      let found = await trySearchInClient(selectedClient, true);
+        logMessage(`🎯 Face reconhecida: ${bestMatch.subject_id} (Confiança: ${(bestMatch.similarity * 100).toFixed(2)}%)`);
 
-      if (!found && clienteDetectado !== selectedClient) {
-        // Se não encontrou na empresa selecionada, tenta na empresa detectada
-        logMessage(`🤔 Pessoa não encontrada no ${AVAILABLE_CLIENTS[selectedClient as keyof typeof AVAILABLE_CLIENTS]}`);
-        logMessage(`🔄 Tentando buscar no ${AVAILABLE_CLIENTS[clienteDetectado as keyof typeof AVAILABLE_CLIENTS]} (detectado pelo CompreFace)...`);
-        
-        found = await trySearchInClient(clienteDetectado, false);
-        
-        if (!found) {
-          logMessage(`😞 Pessoa não encontrada em nenhuma base de dados`);
-          logMessage(`💡 Dica: Talvez essa pessoa precise ser cadastrada primeiro`);
+        const p = bestMatch.person;
+        if (!p) {
+          logMessage(`⚠️ Face cadastrada no CompreFace, mas sem dados no Face Manager`);
+          return;
         }
-      } else if (!found) {
-        logMessage(`😞 Pessoa não encontrada no ${AVAILABLE_CLIENTS[selectedClient as keyof typeof AVAILABLE_CLIENTS]}`);
-        logMessage(`💡 Dica: Talvez essa pessoa precise ser cadastrada primeiro`);
-      }
+
+        logMessage(`✅ Pessoa encontrada no ${AVAILABLE_CLIENTS[selectedClient as keyof typeof AVAILABLE_CLIENTS]}!`);
+        logMessage(`👤 Nome: ${p.name}`);
+        logMessage(`📧 Email: ${p.email}`);
+        logMessage(`📱 Telefone: ${p.phone}`);
+      });
 
     } catch (err) {
       console.error('Erro:', err);
@@ -0,0 +1,139 @@
+"""
+🖼️ Face Manager - Processamento de Imagens
+Normalização, hashes (conteúdo e perceptual) e geração de thumbnails das faces cadastradas.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+
+from PIL import Image, ImageOps
+
+# =====================
+# 🔧 CONFIGURAÇÕES
+# =====================
+
+# Lados (em px) dos thumbnails gerados no cadastro
+THUMBNAIL_SIZES = (96, 256)
+THUMBNAIL_QUALITY = 85
+
+# Normalização no cadastro: JPEG com lado máximo e tamanho máximo em bytes
+MAX_IMAGE_SIDE = int(os.environ.get("FACE_MANAGER_MAX_IMAGE_SIDE", 1600))
+MAX_IMAGE_BYTES = int(os.environ.get("FACE_MANAGER_MAX_IMAGE_BYTES", 1024 * 1024))
+JPEG_QUALITY = int(os.environ.get("FACE_MANAGER_JPEG_QUALITY", 90))
+MIN_JPEG_QUALITY = 60
+
+
+class ImagemInvalida(ValueError):
+    """A imagem não pôde ser decodificada"""
+
+
+def _para_rgb(img):
+    """Converte para RGB, colocando transparência sobre fundo branco"""
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        fundo = Image.new("RGB", img.size, (255, 255, 255))
+        fundo.paste(img, mask=img.split()[-1])
+        return fundo
+    return img.convert("RGB")
+
+def _marca_normalizacao(lado_maximo, bytes_maximos):
+    """Comentário JPEG gravado na saída: identifica os parâmetros que a produziram"""
+    return f"face-manager:{lado_maximo}:{bytes_maximos}:{JPEG_QUALITY}".encode()
+
+def _bytes_origem(origem):
+    """Conteúdo original (bytes, caminho ou arquivo aberto, que é relido do início)"""
+    if isinstance(origem, (bytes, bytearray)):
+        return bytes(origem)
+    if hasattr(origem, "read"):
+        origem.seek(0)
+        return origem.read()
+    with open(origem, "rb") as f:
+        return f.read()
+
+def _ja_normalizada(img, marca, lado_maximo):
+    """Saída da própria normalizar_imagem, com os mesmos parâmetros"""
+    return (img.format == "JPEG" and img.info.get("comment") == marca and img.mode == "RGB"
+            and max(img.size) <= lado_maximo)
+
+def normalizar_imagem(origem, lado_maximo=MAX_IMAGE_SIDE, bytes_maximos=MAX_IMAGE_BYTES):
+    """Decodifica, aplica a orientação EXIF, reduz e recodifica como JPEG limitado
+
+    origem: bytes, caminho ou arquivo aberto. Retorna os bytes JPEG normalizados.
+    Idempotente: uma imagem já normalizada com os mesmos parâmetros volta sem
+    recodificar, e assim o hash não muda quando o upload em lote envia a versão
+    reduzida (--staging).
+    """
+    marca = _marca_normalizacao(lado_maximo, bytes_maximos)
+    try:
+        img = Image.open(io.BytesIO(origem) if isinstance(origem, (bytes, bytearray)) else origem)
+        if _ja_normalizada(img, marca, lado_maximo):
+            img.load()  # confirma que decodifica inteira
+            dados = _bytes_origem(origem)
+            if len(dados) <= bytes_maximos:
+                return dados
+        # JPEG: o decoder já reduz em potências de 2 (muito mais rápido em fotos de 12MP)
+        img.draft("RGB", (lado_maximo, lado_maximo))
+        img = _para_rgb(ImageOps.exif_transpose(img))
+    except Exception as e:
+        raise ImagemInvalida(f"Imagem inválida ou formato não suportado: {e}")
+
+    img.thumbnail((lado_maximo, lado_maximo), Image.LANCZOS)
+
+    qualidade = JPEG_QUALITY
+    while True:
+        saida = io.BytesIO()
+        img.save(saida, "JPEG", quality=qualidade, optimize=True, comment=marca)
+        if saida.tell() <= bytes_maximos:
+            return saida.getvalue()
+        if qualidade > MIN_JPEG_QUALITY:
+            qualidade -= 10
+        else:
+            # Ainda grande demais na qualidade mínima: reduzir a resolução
+            img = img.resize((max(img.width * 4 // 5, 1), max(img.height * 4 // 5, 1)), Image.LANCZOS)
+
+
+def hash_conteudo(dados):
+    """SHA-256 (hex) de um conteúdo em bytes"""
+    return hashlib.sha256(dados).hexdigest()
+
+def hash_perceptual(dados, lado=8):
+    """dHash (hex, lado*lado bits): compara pixels vizinhos da imagem reduzida em tons de cinza
+
+    Imagens iguais após recompressão ou redimensionamento ficam a poucos bits de distância.
+    """
+    with Image.open(io.BytesIO(dados)) as img:
+        img.draft("L", (lado * 4, lado * 4))
+        pixels = img.convert("L").resize((lado + 1, lado), Image.LANCZOS).tobytes()  # 1 byte por pixel
+    bits = 0
+    for linha in range(lado):
+        for coluna in range(lado):
+            esquerda = pixels[linha * (lado + 1) + coluna]
+            bits = (bits << 1) | (esquerda > pixels[linha * (lado + 1) + coluna + 1])
+    return f"{bits:0{lado * lado // 4}x}"
+
+def gerar_thumbnail(origem, destino, tamanho):
+    """Gera um JPEG quadrado (recorte central) de tamanho x tamanho px"""
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    with Image.open(origem) as img:
+        img = ImageOps.exif_transpose(img)
+        thumb = ImageOps.fit(img.convert("RGB"), (tamanho, tamanho), Image.LANCZOS)
+
+    # Nome temporário único: duas threads podem gerar o mesmo thumbnail ao mesmo tempo
+    fd, temporario = tempfile.mkstemp(dir=os.path.dirname(destino), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            thumb.save(f, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+        os.chmod(temporario, 0o644)  # mkstemp cria com 0600
+        os.replace(temporario, destino)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    return destino
+
+def gerar_thumbnails(origem, caminho_por_tamanho):
+    """Gera todos os THUMBNAIL_SIZES. caminho_por_tamanho(tamanho) -> caminho de destino"""
+    return {tamanho: gerar_thumbnail(origem, caminho_por_tamanho(tamanho), tamanho)
+            for tamanho in THUMBNAIL_SIZES}
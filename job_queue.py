@@ -0,0 +1,163 @@
+"""
+⏳ Face Manager - Fila de Jobs
+Execução em segundo plano (pool de threads local) com o estado de cada job em disco.
+
+- Um arquivo JSON por job em jobs/ (gravação atômica): qualquer worker do
+  gunicorn consulta o estado, mesmo que outro processo esteja executando
+- Estados: queued -> running -> succeeded | failed
+- Na inicialização, jobs na fila de processos que morreram são retomados e
+  jobs interrompidos no meio são marcados como falha
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from metadata_store import trava_entre_processos
+
+# =====================
+# 🔧 CONFIGURAÇÕES
+# =====================
+
+DEFAULT_JOBS_FOLDER = "jobs"
+LOCK_FILENAME = ".jobs.lock"
+JOB_WORKERS = int(os.environ.get("FACE_MANAGER_JOB_WORKERS", 4))
+# Jobs finalizados há mais que isso (segundos) são apagados na inicialização
+JOB_TTL = int(os.environ.get("FACE_MANAGER_JOB_TTL", 24 * 3600))
+
+ESTADOS_FINAIS = ("succeeded", "failed")
+
+
+def _agora_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class FilaJobs:
+    """Fila de jobs em pool de threads, com estado persistido em disco"""
+
+    def __init__(self, pasta=DEFAULT_JOBS_FOLDER, workers=JOB_WORKERS):
+        self.pasta = pasta
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        os.makedirs(pasta, exist_ok=True)
+
+    def _caminho(self, job_id):
+        return os.path.join(self.pasta, f"{job_id}.json")
+
+    def _gravar(self, job):
+        destino = self._caminho(job["job_id"])
+        temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(temporario, destino)
+
+    def _pool(self):
+        # Criado sob demanda: threads iniciadas antes do fork do gunicorn não sobrevivem
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            return self._executor
+
+    @staticmethod
+    def id_valido(job_id):
+        try:
+            return uuid.UUID(job_id).hex == job_id
+        except (ValueError, TypeError, AttributeError):
+            return False
+
+    def criar(self, tipo, dados):
+        """Registra um job na fila (ainda sem executar) e o retorna"""
+        agora = _agora_iso()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "type": tipo,
+            "status": "queued",
+            "created_at": agora,
+            "updated_at": agora,
+            "pid": os.getpid(),
+            "data": dados,
+            "result": None,
+            "error": None
+        }
+        self._gravar(job)
+        return job
+
+    def obter(self, job_id):
+        """Estado atual do job (ou None se não existir)"""
+        if not self.id_valido(job_id):
+            return None
+        try:
+            with open(self._caminho(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def atualizar(self, job, **campos):
+        job.update(campos, updated_at=_agora_iso())
+        self._gravar(job)
+        return job
+
+    def enfileirar(self, job, tarefa):
+        """Executa tarefa(job["data"]) no pool; o retorno vira job["result"]"""
+        self._pool().submit(self._executar, dict(job), tarefa)
+        return job
+
+    def _executar(self, job, tarefa):
+        self.atualizar(job, status="running")
+        try:
+            resultado = tarefa(job["data"])
+        except Exception as e:
+            # detalhes: campos extras do erro (ex: status 409 e ids em conflito)
+            detalhes = getattr(e, "detalhes", None)
+            self.atualizar(job, status="failed", error=str(e), **({"error_details": detalhes} if detalhes else {}))
+            print(f"❌ [JOB] {job['type']} {job['job_id']}: {e}")
+        else:
+            self.atualizar(job, status="succeeded", result=resultado)
+
+    def recuperar(self, tarefas, ao_falhar=None):
+        """Retoma jobs órfãos (processo dono morreu) e apaga jobs finalizados antigos
+
+        tarefas: dict tipo -> tarefa. ao_falhar(job): limpeza de jobs interrompidos.
+        """
+        limite = time.time() - JOB_TTL
+        with trava_entre_processos(os.path.join(self.pasta, LOCK_FILENAME)):
+            for nome in os.listdir(self.pasta):
+                if not nome.endswith(".json"):
+                    continue
+                caminho = os.path.join(self.pasta, nome)
+                try:
+                    with open(caminho, "r", encoding="utf-8") as f:
+                        job = json.load(f)
+                except (OSError, ValueError):
+                    continue
+
+                if job["status"] in ESTADOS_FINAIS:
+                    if os.path.getmtime(caminho) < limite:
+                        os.remove(caminho)
+                    continue
+                if _processo_vivo(job.get("pid", 0)) or job["type"] not in tarefas:
+                    continue
+
+                if job["status"] == "queued":
+                    # Nunca começou: seguro executar neste processo
+                    self.atualizar(job, pid=os.getpid())
+                    self.enfileirar(job, tarefas[job["type"]])
+                else:
+                    # Interrompido no meio: não dá para saber se a chamada externa foi aplicada
+                    self.atualizar(job, status="failed", error="Job interrompido (processo encerrado)")
+                    if ao_falhar:
+                        ao_falhar(job)
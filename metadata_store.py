@@ -0,0 +1,929 @@
+#!/usr/bin/env python3
+"""
+🗄️ Face Manager - Armazenamento de Metadados
+Backends plugáveis para os dados das pessoas de cada cliente.
+
+Backends disponíveis (variável de ambiente FACE_MANAGER_STORAGE):
+- json   (padrão): clients/<cliente>/metadata.json + metadata.journal,
+          com cache em memória e compactação em segundo plano
+- sqlite: banco indexado em clients/metadata.sqlite3
+
+Migração dos metadata.json existentes para o SQLite:
+    python metadata_store.py migrar [--db clients/metadata.sqlite3]
+
+Hash das imagens de pessoas antigas (URLs versionadas e deduplicação):
+    python metadata_store.py hashes [--storage json|sqlite]
+"""
+
+import argparse
+import bisect
+import contextlib
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+
+from image_pipeline import hash_conteudo, hash_perceptual, normalizar_imagem
+from person_index import IndicePessoas, normalizar_telefone, prefixo_telefone
+
+# =====================
+# 🔧 CONFIGURAÇÕES
+# =====================
+
+DEFAULT_CLIENTS_FOLDER = "clients"
+DEFAULT_SQLITE_FILE = "metadata.sqlite3"
+METADATA_FILENAME = "metadata.json"
+JOURNAL_FILENAME = "metadata.journal"
+LOCK_FILENAME = ".metadata.lock"
+FACES_FOLDERNAME = "faces"
+
+# 🔒 Trava entre processos (fcntl só existe em sistemas Unix)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    print("⚠️ fcntl não encontrado. Escritas de metadados sem trava entre processos (use 1 worker).")
+
+
+@contextlib.contextmanager
+def trava_entre_processos(caminho):
+    """Trava exclusiva (flock) no arquivo enquanto o bloco executa"""
+    if fcntl is None:
+        yield
+        return
+    with open(caminho, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class MetadataBackend:
+    """Interface comum dos backends de metadados"""
+
+    def carregar(self, cliente):
+        """Retorna todas as pessoas do cliente como dict subject_id -> pessoa"""
+        raise NotImplementedError
+
+    def salvar(self, cliente, metadata):
+        """Substitui todas as pessoas do cliente pelo dict informado"""
+        raise NotImplementedError
+
+    def obter(self, cliente, subject_id):
+        """Retorna a pessoa ou None se não existir"""
+        raise NotImplementedError
+
+    def gravar(self, cliente, subject_id, pessoa):
+        """Insere ou atualiza uma pessoa"""
+        raise NotImplementedError
+
+    def gravar_varios(self, cliente, pessoas):
+        """Insere ou atualiza várias pessoas (dict subject_id -> pessoa) numa única escrita"""
+        raise NotImplementedError
+
+    def gravar_se_unico(self, cliente, subject_id, pessoa, imagem=True):
+        """Insere a pessoa só se nenhuma outra usa o email (e a imagem, se imagem=True)
+
+        Verificação e escrita atômicas (mesma trava de escrita). Retorna {} se
+        gravou, ou os conflitos: {"duplicate_email_of": [...], "duplicate_image_of": [...]}.
+        """
+        raise NotImplementedError
+
+    def atualizar(self, cliente, subject_id, campos):
+        """Aplica campos a uma pessoa de forma atômica. Retorna a pessoa ou None"""
+        raise NotImplementedError
+
+    def remover(self, cliente, subject_id):
+        """Remove uma pessoa. Retorna True se ela existia"""
+        raise NotImplementedError
+
+    def remover_varios(self, cliente, subject_ids):
+        """Remove várias pessoas numa única escrita. Retorna o set dos ids que existiam"""
+        raise NotImplementedError
+
+    def contar(self, cliente):
+        """Retorna o total de pessoas do cliente"""
+        raise NotImplementedError
+
+    def listar(self, cliente, limite=None, apos=None, filtros=None):
+        """Lista [(subject_id, pessoa)] em ordem de subject_id
+
+        apos: só retorna subject_ids maiores que este (paginação por cursor)
+        filtros: dict com name_prefix, email_prefix e/ou created_after (ISO 8601)
+        """
+        raise NotImplementedError
+
+    def pagina(self, cliente, busca=None, ordem="name", decrescente=False, offset=0, limite=50):
+        """Página ordenada para o dashboard. Retorna (total_encontrado, [(subject_id, pessoa)])
+
+        busca: trecho procurado (sem caixa) em nome, email ou telefone
+        ordem: name, email, created_at ou subject_id
+        """
+        raise NotImplementedError
+
+
+    def buscar(self, cliente, termo, limite=20):
+        """Pessoas cujo nome, email ou telefone começa com o termo: [(subject_id, pessoa)]"""
+        raise NotImplementedError
+
+    def ids_com_email(self, cliente, email):
+        """subject_ids que já usam este email (comparação sem caixa)"""
+        raise NotImplementedError
+
+    def ids_com_telefone(self, cliente, telefone):
+        """subject_ids que já usam este telefone (comparação só dos dígitos)"""
+        raise NotImplementedError
+
+    def ids_com_imagem(self, cliente, image_hash):
+        """subject_ids cuja imagem normalizada tem este SHA-256"""
+        raise NotImplementedError
+
+    def ids_com_imagem_parecida(self, cliente, image_dhash, distancia):
+        """subject_ids cujo hash perceptual (hex) difere em até `distancia` bits"""
+        raise NotImplementedError
+
+
+CAMPOS_ORDENACAO = ("name", "email", "created_at", "subject_id")
+CAMPOS_BUSCA = ("name", "email", "phone")
+
+def _conflitos_cadastro(subject_id, ids_email, ids_imagem):
+    conflitos = {}
+    if ids_email - {subject_id}:
+        conflitos["duplicate_email_of"] = sorted(ids_email - {subject_id})
+    if ids_imagem - {subject_id}:
+        conflitos["duplicate_image_of"] = sorted(ids_imagem - {subject_id})
+    return conflitos
+
+def pessoa_contem(pessoa, busca):
+    """Verifica se o trecho buscado aparece em nome, email ou telefone"""
+    if not busca:
+        return True
+    busca = busca.lower()
+    return any(busca in (pessoa.get(campo) or "").lower() for campo in CAMPOS_BUSCA)
+
+def pessoa_corresponde(pessoa, filtros):
+    """Verifica se a pessoa atende aos filtros de listagem (prefixos sem caixa)"""
+    if not filtros:
+        return True
+    for campo in ("name", "email"):
+        prefixo = filtros.get(f"{campo}_prefix")
+        if prefixo and not (pessoa.get(campo) or "").lower().startswith(prefixo.lower()):
+            return False
+    criado_apos = filtros.get("created_after")
+    if criado_apos and (pessoa.get("created_at") or "") <= criado_apos:
+        return False
+    return True
+
+
+# =====================
+# 📄 BACKEND JSON
+# =====================
+
+class _EstadoCliente:
+    """Estado em memória de um cliente: snapshot + journal já aplicados"""
+
+    def __init__(self, dados, assinatura_snapshot):
+        self.dados = dados
+        self.assinatura_snapshot = assinatura_snapshot
+        self.journal_ino = None
+        self.journal_offset = 0
+        self._ordenados = None
+        self._indice = None
+
+    def ordenados(self):
+        """subject_ids em ordem, mantidos incrementalmente após o primeiro uso"""
+        if self._ordenados is None:
+            self._ordenados = sorted(self.dados)
+        return self._ordenados
+
+    def indice(self):
+        """Índices de busca, construídos no primeiro uso e mantidos incrementalmente"""
+        if self._indice is None:
+            self._indice = IndicePessoas.construir(self.dados)
+        return self._indice
+
+    def definir(self, subject_id, pessoa):
+        if self._ordenados is not None and subject_id not in self.dados:
+            bisect.insort(self._ordenados, subject_id)
+        if self._indice is not None:
+            self._indice.adicionar(subject_id, pessoa)
+        self.dados[subject_id] = pessoa
+
+    def descartar(self, subject_id):
+        if self.dados.pop(subject_id, None) is None:
+            return
+        if self._ordenados is not None:
+            self._ordenados.pop(bisect.bisect_left(self._ordenados, subject_id))
+        if self._indice is not None:
+            self._indice.remover(subject_id)
+
+
+class JsonMetadataBackend(MetadataBackend):
+    """Snapshot metadata.json + journal append-only por cliente
+
+    Cada criação/edição/exclusão vira uma linha em metadata.journal (O(1) por
+    escrita). O estado é o snapshot com o journal reaplicado por cima; quando
+    o journal passa de JOURNAL_MAX_BYTES uma thread em segundo plano grava um
+    novo snapshot (arquivo temporário + rename) e descarta a parte já
+    incorporada do journal.
+    """
+
+    JOURNAL_MAX_BYTES = int(os.environ.get("FACE_MANAGER_JOURNAL_MAX_BYTES", 4 * 1024 * 1024))
+
+    def __init__(self, clients_folder=DEFAULT_CLIENTS_FOLDER):
+        self.clients_folder = clients_folder
+        self._estados = {}
+        self._compactando = set()
+        self._travas = {}             # cliente -> RLock (threads deste processo)
+        self._lock = threading.Lock()  # protege _travas e _compactando
+
+    def _arquivo(self, cliente):
+        return os.path.join(self.clients_folder, cliente, METADATA_FILENAME)
+
+    def _journal(self, cliente):
+        return os.path.join(self.clients_folder, cliente, JOURNAL_FILENAME)
+
+    def _trava(self, cliente):
+        """RLock do cliente: leituras e escritas de clientes diferentes não se bloqueiam"""
+        with self._lock:
+            trava = self._travas.get(cliente)
+            if trava is None:
+                trava = self._travas[cliente] = threading.RLock()
+            return trava
+
+    @contextlib.contextmanager
+    def _mutacao(self, cliente):
+        """Trava de escrita do cliente: entre processos (flock) e entre threads (RLock)
+
+        O flock vem primeiro: enquanto outro processo escreve, as leituras deste
+        cliente (que só usam o RLock) seguem respondendo.
+        """
+        os.makedirs(os.path.join(self.clients_folder, cliente), exist_ok=True)
+        with trava_entre_processos(os.path.join(self.clients_folder, cliente, LOCK_FILENAME)):
+            with self._trava(cliente):
+                self._garantir_arquivo(cliente)
+                yield
+
+    def _garantir_arquivo(self, cliente):
+        arquivo = self._arquivo(cliente)
+        if not os.path.exists(arquivo):
+            os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+            _escrever_json_atomico(arquivo, {})
+        return arquivo
+
+    @staticmethod
+    def _assinatura(caminho):
+        st = os.stat(caminho)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _aplicar(estado, bloco):
+        """Aplica as linhas completas de um trecho do journal. Retorna bytes consumidos"""
+        fim = bloco.rfind(b"\n") + 1
+        for linha in bloco[:fim].splitlines():
+            if not linha.strip():
+                continue
+            entrada = json.loads(linha)
+            if entrada["op"] == "set":
+                estado.definir(entrada["id"], entrada["pessoa"])
+            elif entrada["op"] == "del":
+                estado.descartar(entrada["id"])
+        return fim
+
+    def _recarregar(self, cliente):
+        """Lê o snapshot e reaplica o journal inteiro"""
+        arquivo = self._garantir_arquivo(cliente)
+        assinatura = self._assinatura(arquivo)
+        with open(arquivo, "r", encoding="utf-8") as f:
+            estado = _EstadoCliente(json.load(f), assinatura)
+
+        try:
+            with open(self._journal(cliente), "rb") as f:
+                estado.journal_ino = os.fstat(f.fileno()).st_ino
+                estado.journal_offset = self._aplicar(estado, f.read())
+        except FileNotFoundError:
+            pass
+
+        self._estados[cliente] = estado
+        if estado.journal_offset > self.JOURNAL_MAX_BYTES:
+            self._agendar_compactacao(cliente)
+        return estado
+
+    def _estado(self, cliente):
+        """Estado atualizado do cliente, lendo só o que mudou no disco"""
+        estado = self._estados.get(cliente)
+        arquivo = self._garantir_arquivo(cliente)
+        if estado is None or self._assinatura(arquivo) != estado.assinatura_snapshot:
+            return self._recarregar(cliente)
+
+        try:
+            st = os.stat(self._journal(cliente))
+        except FileNotFoundError:
+            if estado.journal_offset:
+                return self._recarregar(cliente)
+            return estado
+
+        if estado.journal_ino not in (None, st.st_ino) or st.st_size < estado.journal_offset:
+            return self._recarregar(cliente)
+        if st.st_size > estado.journal_offset:
+            with open(self._journal(cliente), "rb") as f:
+                f.seek(estado.journal_offset)
+                estado.journal_offset += self._aplicar(estado, f.read())
+            estado.journal_ino = st.st_ino
+        return estado
+
+    def _anexar(self, cliente, entradas):
+        """Acrescenta entradas ao journal e as aplica no estado em memória"""
+        estado = self._estado(cliente)
+        bloco = b"".join(
+            json.dumps(e, ensure_ascii=False).encode("utf-8") + b"\n" for e in entradas
+        )
+        with open(self._journal(cliente), "ab") as f:
+            f.write(bloco)
+            f.flush()
+            estado.journal_ino = os.fstat(f.fileno()).st_ino
+        estado.journal_offset += self._aplicar(estado, bloco)
+
+        if estado.journal_offset > self.JOURNAL_MAX_BYTES:
+            self._agendar_compactacao(cliente)
+
+    # 🗜️ Compactação em segundo plano
+
+    def _agendar_compactacao(self, cliente):
+        with self._lock:
+            if cliente in self._compactando:
+                return
+            self._compactando.add(cliente)
+        threading.Thread(
+            target=self._compactar_em_background, args=(cliente,), daemon=True
+        ).start()
+
+    def _compactar_em_background(self, cliente):
+        try:
+            self.compactar(cliente)
+        except Exception as e:
+            print(f"⚠️ Erro ao compactar journal de {cliente}: {e}")
+        finally:
+            with self._lock:
+                self._compactando.discard(cliente)
+
+    def compactar(self, cliente):
+        """Incorpora o journal a um novo snapshot sem bloquear as escritas"""
+        with self._trava(cliente):
+            estado = self._estado(cliente)
+            if not estado.journal_offset:
+                return
+            dados = dict(estado.dados)
+            offset = estado.journal_offset
+            origem = (estado.assinatura_snapshot, estado.journal_ino)
+
+        # Serialização (a parte cara) fora do lock
+        arquivo = self._arquivo(cliente)
+        temporario = _escrever_json_temporario(arquivo, dados)
+
+        with self._mutacao(cliente):
+            estado = self._estado(cliente)
+            if (estado.assinatura_snapshot, estado.journal_ino) != origem:
+                # Outro processo compactou/substituiu os arquivos nesse meio tempo
+                os.remove(temporario)
+                return
+
+            journal = self._journal(cliente)
+            with open(journal, "rb") as f:
+                f.seek(offset)
+                resto = f.read()
+            os.replace(temporario, arquivo)
+            _escrever_bytes_atomico(journal, resto)
+
+            # O estado em memória já aplicou o journal até journal_offset
+            estado.assinatura_snapshot = self._assinatura(arquivo)
+            estado.journal_ino = os.stat(journal).st_ino
+            estado.journal_offset -= offset
+
+    # 📚 Interface do backend
+
+    def carregar(self, cliente):
+        with self._trava(cliente):
+            return dict(self._estado(cliente).dados)
+
+    def salvar(self, cliente, metadata):
+        with self._mutacao(cliente):
+            arquivo = self._garantir_arquivo(cliente)
+            _escrever_json_atomico(arquivo, metadata)
+            _escrever_bytes_atomico(self._journal(cliente), b"")
+            self._recarregar(cliente)
+
+    def obter(self, cliente, subject_id):
+        with self._trava(cliente):
+            pessoa = self._estado(cliente).dados.get(subject_id)
+            return dict(pessoa) if pessoa is not None else None
+
+    def gravar(self, cliente, subject_id, pessoa):
+        with self._mutacao(cliente):
+            self._anexar(cliente, [{"op": "set", "id": subject_id, "pessoa": dict(pessoa)}])
+
+    def gravar_varios(self, cliente, pessoas):
+        if not pessoas:
+            return
+        with self._mutacao(cliente):
+            self._anexar(cliente, [{"op": "set", "id": sid, "pessoa": dict(p)} for sid, p in pessoas.items()])
+
+    def gravar_se_unico(self, cliente, subject_id, pessoa, imagem=True):
+        with self._mutacao(cliente):
+            indice = self._estado(cliente).indice()
+            conflitos = _conflitos_cadastro(
+                subject_id,
+                indice.ids_com_email(pessoa.get("email")),
+                indice.ids_com_imagem(pessoa.get("image_hash")) if imagem else set(),
+            )
+            if not conflitos:
+                self._anexar(cliente, [{"op": "set", "id": subject_id, "pessoa": dict(pessoa)}])
+            return conflitos
+
+    def atualizar(self, cliente, subject_id, campos):
+        with self._mutacao(cliente):
+            pessoa = self._estado(cliente).dados.get(subject_id)
+            if pessoa is None:
+                return None
+            pessoa = {**pessoa, **campos}
+            self._anexar(cliente, [{"op": "set", "id": subject_id, "pessoa": pessoa}])
+            return dict(pessoa)
+
+    def remover(self, cliente, subject_id):
+        with self._mutacao(cliente):
+            if subject_id not in self._estado(cliente).dados:
+                return False
+            self._anexar(cliente, [{"op": "del", "id": subject_id}])
+            return True
+
+    def remover_varios(self, cliente, subject_ids):
+        with self._mutacao(cliente):
+            dados = self._estado(cliente).dados
+            existentes = {sid for sid in subject_ids if sid in dados}
+            if existentes:
+                self._anexar(cliente, [{"op": "del", "id": sid} for sid in sorted(existentes)])
+            return existentes
+
+    def contar(self, cliente):
+        with self._trava(cliente):
+            return len(self._estado(cliente).dados)
+
+    def listar(self, cliente, limite=None, apos=None, filtros=None):
+        with self._trava(cliente):
+            estado = self._estado(cliente)
+            ordenados = estado.ordenados()
+            inicio = bisect.bisect_right(ordenados, apos) if apos else 0
+            resultado = []
+            for subject_id in itertools.islice(ordenados, inicio, None):
+                pessoa = estado.dados[subject_id]
+                if not pessoa_corresponde(pessoa, filtros):
+                    continue
+                resultado.append((subject_id, dict(pessoa)))
+                if limite is not None and len(resultado) >= limite:
+                    break
+            return resultado
+
+    def pagina(self, cliente, busca=None, ordem="name", decrescente=False, offset=0, limite=50):
+        if ordem not in CAMPOS_ORDENACAO:
+            raise ValueError(f"Ordenação inválida: {ordem}")
+        with self._trava(cliente):
+            estado = self._estado(cliente)
+            if busca:
+                itens = [(sid, p) for sid, p in estado.dados.items() if pessoa_contem(p, busca)]
+            else:
+                itens = estado.dados.items()
+            total = len(itens)
+
+            if ordem == "subject_id":
+                chave = lambda item: item[0]
+            else:
+                chave = lambda item: ((item[1].get(ordem) or "").lower(), item[0])
+            # Só as primeiras offset + limite posições precisam ser ordenadas
+            selecionar = heapq.nlargest if decrescente else heapq.nsmallest
+            topo = selecionar(offset + limite, itens, key=chave)
+            return total, [(sid, dict(p)) for sid, p in topo[offset:]]
+
+    def buscar(self, cliente, termo, limite=20):
+        with self._trava(cliente):
+            estado = self._estado(cliente)
+            return [(sid, dict(estado.dados[sid])) for sid in estado.indice().buscar(termo, limite)]
+
+    def ids_com_email(self, cliente, email):
+        with self._trava(cliente):
+            return self._estado(cliente).indice().ids_com_email(email)
+
+    def ids_com_telefone(self, cliente, telefone):
+        with self._trava(cliente):
+            return self._estado(cliente).indice().ids_com_telefone(telefone)
+
+    def ids_com_imagem(self, cliente, image_hash):
+        with self._trava(cliente):
+            return self._estado(cliente).indice().ids_com_imagem(image_hash)
+
+    def ids_com_imagem_parecida(self, cliente, image_dhash, distancia):
+        with self._trava(cliente):
+            return self._estado(cliente).indice().ids_com_imagem_parecida(image_dhash, distancia)
+
+
+def _escrever_json_temporario(destino, dados):
+    """Serializa dados num arquivo temporário ao lado do destino. Retorna o caminho"""
+    temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(dados, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    return temporario
+
+def _escrever_json_atomico(destino, dados):
+    """Grava JSON via arquivo temporário + rename (nunca deixa arquivo pela metade)"""
+    os.replace(_escrever_json_temporario(destino, dados), destino)
+
+def _escrever_bytes_atomico(destino, conteudo):
+    """Grava bytes via arquivo temporário + rename"""
+    temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(conteudo)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, destino)
+
+
+# =====================
+# 🗃️ BACKEND SQLITE
+# =====================
+
+class SqliteMetadataBackend(MetadataBackend):
+    """Tabela única com coluna client e índices em subject_id, email, nome e hash da imagem"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS pessoas (
+            client     TEXT NOT NULL,
+            subject_id TEXT NOT NULL,
+            name       TEXT COLLATE NOCASE,
+            email      TEXT COLLATE NOCASE,
+            phone      TEXT,
+            dados      TEXT NOT NULL,
+            created_at TEXT,
+            phone_digits TEXT,
+            image_hash TEXT,
+            image_dhash TEXT,
+            PRIMARY KEY (client, subject_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_pessoas_email ON pessoas (client, email);
+        CREATE INDEX IF NOT EXISTS idx_pessoas_name ON pessoas (client, name);
+        CREATE INDEX IF NOT EXISTS idx_pessoas_created ON pessoas (client, created_at);
+        CREATE INDEX IF NOT EXISTS idx_pessoas_phone ON pessoas (client, phone_digits);
+        CREATE INDEX IF NOT EXISTS idx_pessoas_image ON pessoas (client, image_hash);
+    """
+    COLUNAS = "client, subject_id, name, email, phone, dados, created_at, phone_digits, image_hash, image_dhash"
+    MARCADORES = ", ".join("?" * len(COLUNAS.split(", ")))
+
+    def __init__(self, db_path=None, clients_folder=DEFAULT_CLIENTS_FOLDER):
+        self.db_path = db_path or os.path.join(clients_folder, DEFAULT_SQLITE_FILE)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._criar_schema()
+
+    def _criar_schema(self):
+        conn = self._conexao()
+        colunas = {row[1] for row in conn.execute("PRAGMA table_info(pessoas)")}
+        if colunas:
+            # Bancos criados antes das colunas created_at / phone_digits
+            with conn:
+                if "created_at" not in colunas:
+                    conn.execute("ALTER TABLE pessoas ADD COLUMN created_at TEXT")
+                    conn.execute("UPDATE pessoas SET created_at = json_extract(dados, '$.created_at')")
+                if "phone_digits" not in colunas:
+                    conn.execute("ALTER TABLE pessoas ADD COLUMN phone_digits TEXT")
+                    conn.executemany(
+                        "UPDATE pessoas SET phone_digits = ? WHERE client = ? AND subject_id = ?",
+                        [(normalizar_telefone(phone), client, sid) for client, sid, phone
+                         in conn.execute("SELECT client, subject_id, phone FROM pessoas").fetchall()],
+                    )
+                for coluna in ("image_hash", "image_dhash"):
+                    if coluna not in colunas:
+                        conn.execute(f"ALTER TABLE pessoas ADD COLUMN {coluna} TEXT")
+                        conn.execute(f"UPDATE pessoas SET {coluna} = json_extract(dados, '$.{coluna}')")
+        conn.executescript(self.SCHEMA)
+
+    def _conexao(self):
+        """Uma conexão por thread (sqlite3 não compartilha conexões entre threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _linha(cliente, subject_id, pessoa):
+        return (
+            cliente,
+            subject_id,
+            pessoa.get("name"),
+            pessoa.get("email"),
+            pessoa.get("phone"),
+            json.dumps(pessoa, ensure_ascii=False),
+            pessoa.get("created_at"),
+            normalizar_telefone(pessoa.get("phone")),
+            pessoa.get("image_hash"),
+            pessoa.get("image_dhash"),
+        )
+
+    def carregar(self, cliente):
+        cursor = self._conexao().execute(
+            "SELECT subject_id, dados FROM pessoas WHERE client = ?", (cliente,)
+        )
+        return {subject_id: json.loads(dados) for subject_id, dados in cursor}
+
+    def salvar(self, cliente, metadata):
+        conn = self._conexao()
+        with conn:
+            conn.execute("DELETE FROM pessoas WHERE client = ?", (cliente,))
+            conn.executemany(
+                f"INSERT INTO pessoas ({self.COLUNAS}) VALUES ({self.MARCADORES})",
+                [self._linha(cliente, sid, p) for sid, p in metadata.items()],
+            )
+
+    def obter(self, cliente, subject_id):
+        row = self._conexao().execute(
+            "SELECT dados FROM pessoas WHERE client = ? AND subject_id = ?",
+            (cliente, subject_id),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def gravar(self, cliente, subject_id, pessoa):
+        conn = self._conexao()
+        with conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO pessoas ({self.COLUNAS}) VALUES ({self.MARCADORES})",
+                self._linha(cliente, subject_id, pessoa),
+            )
+
+    def gravar_varios(self, cliente, pessoas):
+        conn = self._conexao()
+        with conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO pessoas ({self.COLUNAS}) VALUES ({self.MARCADORES})",
+                [self._linha(cliente, sid, p) for sid, p in pessoas.items()],
+            )
+
+    def gravar_se_unico(self, cliente, subject_id, pessoa, imagem=True):
+        conn = self._conexao()
+        with conn:
+            # BEGIN IMMEDIATE: nenhum outro cadastro entre a verificação e o INSERT
+            conn.execute("BEGIN IMMEDIATE")
+            conflitos = _conflitos_cadastro(
+                subject_id,
+                self.ids_com_email(cliente, pessoa.get("email")),
+                self.ids_com_imagem(cliente, pessoa.get("image_hash")) if imagem else set(),
+            )
+            if not conflitos:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO pessoas ({self.COLUNAS}) VALUES ({self.MARCADORES})",
+                    self._linha(cliente, subject_id, pessoa),
+                )
+        return conflitos
+
+    def atualizar(self, cliente, subject_id, campos):
+        conn = self._conexao()
+        with conn:
+            # BEGIN IMMEDIATE: trava de escrita antes da leitura (sem lost update)
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT dados FROM pessoas WHERE client = ? AND subject_id = ?",
+                (cliente, subject_id),
+            ).fetchone()
+            if row is None:
+                return None
+            pessoa = {**json.loads(row[0]), **campos}
+            conn.execute(
+                f"INSERT OR REPLACE INTO pessoas ({self.COLUNAS}) VALUES ({self.MARCADORES})",
+                self._linha(cliente, subject_id, pessoa),
+            )
+        return pessoa
+
+    def remover(self, cliente, subject_id):
+        conn = self._conexao()
+        with conn:
+            cursor = conn.execute(
+                "DELETE FROM pessoas WHERE client = ? AND subject_id = ?",
+                (cliente, subject_id),
+            )
+        return cursor.rowcount > 0
+
+    def remover_varios(self, cliente, subject_ids):
+        conn = self._conexao()
+        existentes = set()
+        with conn:
+            for subject_id in set(subject_ids):
+                cursor = conn.execute(
+                    "DELETE FROM pessoas WHERE client = ? AND subject_id = ?",
+                    (cliente, subject_id),
+                )
+                if cursor.rowcount > 0:
+                    existentes.add(subject_id)
+        return existentes
+
+    def contar(self, cliente):
+        row = self._conexao().execute(
+            "SELECT COUNT(*) FROM pessoas WHERE client = ?", (cliente,)
+        ).fetchone()
+        return row[0]
+
+    @staticmethod
+    def _like_prefixo(prefixo):
+        """Escapa curingas do LIKE e acrescenta % ao final"""
+        escapado = prefixo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return escapado + "%"
+
+    def _where(self, cliente, filtros):
+        """Cláusula WHERE e parâmetros para os filtros de listagem"""
+        condicoes, params = ["client = ?"], [cliente]
+        filtros = filtros or {}
+        for campo in ("name", "email"):
+            prefixo = filtros.get(f"{campo}_prefix")
+            if prefixo:
+                condicoes.append(f"{campo} LIKE ? ESCAPE '\\'")
+                params.append(self._like_prefixo(prefixo))
+        if filtros.get("created_after"):
+            condicoes.append("created_at > ?")
+            params.append(filtros["created_after"])
+        return " AND ".join(condicoes), params
+
+    def listar(self, cliente, limite=None, apos=None, filtros=None):
+        where, params = self._where(cliente, filtros)
+        if apos:
+            where += " AND subject_id > ?"
+            params.append(apos)
+        sql = f"SELECT subject_id, dados FROM pessoas WHERE {where} ORDER BY subject_id"
+        if limite is not None:
+            sql += " LIMIT ?"
+            params.append(limite)
+        cursor = self._conexao().execute(sql, params)
+        return [(subject_id, json.loads(dados)) for subject_id, dados in cursor]
+
+    def pagina(self, cliente, busca=None, ordem="name", decrescente=False, offset=0, limite=50):
+        if ordem not in CAMPOS_ORDENACAO:
+            raise ValueError(f"Ordenação inválida: {ordem}")
+        where, params = "client = ?", [cliente]
+        if busca:
+            trecho = "%" + self._like_prefixo(busca)
+            where += " AND (" + " OR ".join(f"{c} LIKE ? ESCAPE '\\'" for c in CAMPOS_BUSCA) + ")"
+            params += [trecho] * len(CAMPOS_BUSCA)
+
+        conn = self._conexao()
+        total = conn.execute(f"SELECT COUNT(*) FROM pessoas WHERE {where}", params).fetchone()[0]
+        direcao = "DESC" if decrescente else "ASC"
+        ordenacao = f"{ordem} {direcao}" if ordem == "subject_id" else f"{ordem} {direcao}, subject_id {direcao}"
+        cursor = conn.execute(
+            f"SELECT subject_id, dados FROM pessoas WHERE {where} ORDER BY {ordenacao} LIMIT ? OFFSET ?",
+            params + [limite, offset],
+        )
+        return total, [(subject_id, json.loads(dados)) for subject_id, dados in cursor]
+
+    def buscar(self, cliente, termo, limite=20):
+        termo = (termo or "").strip()
+        if not termo:
+            return []
+        prefixo = self._like_prefixo(termo)
+        cursor = self._conexao().execute(
+            "SELECT subject_id, dados FROM pessoas WHERE client = ? AND ("
+            " name LIKE ? ESCAPE '\\' OR name LIKE ? ESCAPE '\\'"
+            " OR email LIKE ? ESCAPE '\\' OR phone_digits LIKE ?"
+            ") ORDER BY name, subject_id LIMIT ?",
+            (cliente, prefixo, "% " + prefixo, prefixo, (prefixo_telefone(termo) or "-") + "%", limite),
+        )
+        return [(subject_id, json.loads(dados)) for subject_id, dados in cursor]
+
+    def ids_com_email(self, cliente, email):
+        cursor = self._conexao().execute(
+            "SELECT subject_id FROM pessoas WHERE client = ? AND email = ?",
+            (cliente, (email or "").strip()),
+        )
+        return {row[0] for row in cursor}
+
+    def ids_com_telefone(self, cliente, telefone):
+        digitos = normalizar_telefone(telefone)
+        if not digitos:
+            return set()
+        cursor = self._conexao().execute(
+            "SELECT subject_id FROM pessoas WHERE client = ? AND phone_digits = ?",
+            (cliente, digitos),
+        )
+        return {row[0] for row in cursor}
+
+    def ids_com_imagem(self, cliente, image_hash):
+        if not image_hash:
+            return set()
+        cursor = self._conexao().execute(
+            "SELECT subject_id FROM pessoas WHERE client = ? AND image_hash = ?",
+            (cliente, image_hash),
+        )
+        return {row[0] for row in cursor}
+
+    def ids_com_imagem_parecida(self, cliente, image_dhash, distancia):
+        # Distância de Hamming não tem índice no SQLite: compara só a coluna curta do cliente
+        alvo = int(image_dhash, 16)
+        cursor = self._conexao().execute(
+            "SELECT subject_id, image_dhash FROM pessoas WHERE client = ? AND image_dhash IS NOT NULL",
+            (cliente,),
+        )
+        return {subject_id for subject_id, dhash in cursor if bin(int(dhash, 16) ^ alvo).count("1") <= distancia}
+
+
+# =====================
+# 🏭 FÁBRICA E MIGRAÇÃO
+# =====================
+
+BACKENDS = {
+    "json": JsonMetadataBackend,
+    "sqlite": SqliteMetadataBackend,
+}
+
+def criar_backend(nome=None, clients_folder=DEFAULT_CLIENTS_FOLDER):
+    """Cria o backend configurado em FACE_MANAGER_STORAGE (padrão: json)"""
+    nome = (nome or os.environ.get("FACE_MANAGER_STORAGE", "json")).lower()
+    if nome not in BACKENDS:
+        raise ValueError(f"Backend de metadados desconhecido: {nome}")
+    return BACKENDS[nome](clients_folder=clients_folder)
+
+def migrar_json_para_sqlite(clients_folder=DEFAULT_CLIENTS_FOLDER, db_path=None):
+    """Importa todos os clients/*/metadata.json para o SQLite. Retorna {cliente: total}"""
+    origem = JsonMetadataBackend(clients_folder)
+    destino = SqliteMetadataBackend(db_path=db_path, clients_folder=clients_folder)
+    resultado = {}
+
+    for cliente in sorted(os.listdir(clients_folder)):
+        if not os.path.isfile(os.path.join(clients_folder, cliente, METADATA_FILENAME)):
+            continue
+        metadata = origem.carregar(cliente)
+        destino.salvar(cliente, metadata)
+        resultado[cliente] = len(metadata)
+
+    return resultado
+
+def preencher_hashes_imagens(backend, clients_folder=DEFAULT_CLIENTS_FOLDER):
+    """Grava image_hash/image_dhash das pessoas cadastradas antes deles existirem
+
+    Migração única: lê cada imagem sem hash uma vez. Retorna {cliente: pessoas atualizadas}.
+    """
+    resultado = {}
+    for cliente in sorted(os.listdir(clients_folder)):
+        faces_folder = os.path.join(clients_folder, cliente, FACES_FOLDERNAME)
+        if not os.path.isdir(faces_folder):
+            continue
+        atualizadas = 0
+        for subject_id, pessoa in backend.carregar(cliente).items():
+            if pessoa.get("image_hash") or not pessoa.get("image"):
+                continue
+            img_path = os.path.join(faces_folder, pessoa["image"])
+            if not os.path.isfile(img_path):
+                continue
+            try:
+                # Mesmo hash do cadastro: sobre a imagem normalizada (idempotente
+                # para as já normalizadas; as antigas são recodificadas como no upload)
+                dados = normalizar_imagem(img_path)
+            except Exception as e:
+                print(f"⚠️ {cliente}/{subject_id}: imagem ignorada ({e})")
+                continue
+            backend.atualizar(cliente, subject_id, {
+                "image_hash": hash_conteudo(dados),
+                "image_dhash": hash_perceptual(dados),
+            })
+            atualizadas += 1
+        resultado[cliente] = atualizadas
+    return resultado
+
+def main():
+    """Função principal (linha de comando)"""
+    parser = argparse.ArgumentParser(description="Ferramentas de armazenamento do Face Manager")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    migrar = sub.add_parser("migrar", help="Importa clients/*/metadata.json para o SQLite")
+    migrar.add_argument("--clients", default=DEFAULT_CLIENTS_FOLDER, help="Pasta dos clientes")
+    migrar.add_argument("--db", default=None, help="Arquivo SQLite de destino")
+    hashes = sub.add_parser("hashes", help="Calcula o hash das imagens de pessoas antigas")
+    hashes.add_argument("--clients", default=DEFAULT_CLIENTS_FOLDER, help="Pasta dos clientes")
+    hashes.add_argument("--storage", default=None, choices=sorted(BACKENDS),
+                        help="Backend (padrão: FACE_MANAGER_STORAGE)")
+    args = parser.parse_args()
+
+    if args.comando == "migrar":
+        resultado = migrar_json_para_sqlite(args.clients, args.db)
+        for cliente, total in resultado.items():
+            print(f"✅ {cliente}: {total} pessoas importadas")
+        print(f"🎉 Migração concluída: {sum(resultado.values())} pessoas")
+        print("💡 Inicie o app com FACE_MANAGER_STORAGE=sqlite para usar o banco")
+        print("💡 Depois: FACE_MANAGER_STORAGE=sqlite python metadata_store.py hashes")
+    elif args.comando == "hashes":
+        resultado = preencher_hashes_imagens(criar_backend(args.storage, args.clients), args.clients)
+        for cliente, total in resultado.items():
+            print(f"✅ {cliente}: {total} imagens com hash")
+        print(f"🎉 Concluído: {sum(resultado.values())} pessoas atualizadas")
+
+if __name__ == "__main__":
+    main()
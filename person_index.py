@@ -0,0 +1,147 @@
+"""
+🔎 Face Manager - Índices de Pessoas
+Índices secundários em memória sobre nome, email, telefone e imagem de um cliente.
+
+- Busca por prefixo (palavras do nome, email e dígitos do telefone) via bisect
+- Lookup exato de email/telefone/hash da imagem em O(1) para detectar duplicados
+- Busca de imagens parecidas pela distância de Hamming do hash perceptual
+- Atualização incremental a cada criação, edição ou exclusão
+"""
+
+import bisect
+import re
+
+
+def normalizar_texto(valor):
+    """Chave de busca sem diferenciar maiúsculas/minúsculas"""
+    return (valor or "").strip().lower()
+
+def normalizar_telefone(valor):
+    """Só os dígitos do telefone (ignora +, espaços, traços e parênteses)"""
+    return re.sub(r"\D", "", valor or "")
+
+def prefixo_telefone(termo):
+    """Dígitos do termo de busca, só se ele parece um telefone (dígitos, espaços, + - ( ))
+
+    "ana2024" ou "joao.55@" não viram busca por telefone.
+    """
+    termo = (termo or "").strip()
+    if not re.fullmatch(r"[\d\s+\-()]+", termo):
+        return ""
+    return normalizar_telefone(termo)
+
+
+class IndicePessoas:
+    """Índices de prefixo e de igualdade sobre as pessoas de um cliente"""
+
+    def __init__(self):
+        self._chaves = []        # lista ordenada de (chave, subject_id)
+        self._entradas = {}      # subject_id -> chaves inseridas (para remoção)
+        self._por_email = {}     # email normalizado -> {subject_id}
+        self._por_telefone = {}  # dígitos do telefone -> {subject_id}
+        self._por_imagem = {}    # SHA-256 da imagem normalizada -> {subject_id}
+        self._por_dhash = {}     # hash perceptual (int) -> {subject_id}
+
+    @classmethod
+    def construir(cls, metadata):
+        """Monta o índice de uma vez a partir do dict subject_id -> pessoa"""
+        indice = cls()
+        for subject_id, pessoa in metadata.items():
+            chaves = indice._chaves_da_pessoa(pessoa)
+            indice._entradas[subject_id] = (chaves, indice._registrar_igualdade(subject_id, pessoa))
+            indice._chaves.extend((chave, subject_id) for chave in chaves)
+        indice._chaves.sort()
+        return indice
+
+    @staticmethod
+    def _chaves_da_pessoa(pessoa):
+        chaves = set(normalizar_texto(pessoa.get("name")).split())
+        chaves.add(normalizar_texto(pessoa.get("name")))
+        chaves.add(normalizar_texto(pessoa.get("email")))
+        chaves.add(normalizar_telefone(pessoa.get("phone")))
+        chaves.discard("")
+        return sorted(chaves)
+
+    @staticmethod
+    def _chaves_igualdade(pessoa):
+        """(mapa, chave) de cada índice de igualdade em que a pessoa entra"""
+        dhash = pessoa.get("image_dhash")
+        return (
+            ("_por_email", normalizar_texto(pessoa.get("email"))),
+            ("_por_telefone", normalizar_telefone(pessoa.get("phone"))),
+            ("_por_imagem", pessoa.get("image_hash") or ""),
+            ("_por_dhash", int(dhash, 16) if dhash else ""),
+        )
+
+    def _registrar_igualdade(self, subject_id, pessoa):
+        """Registra nos índices de igualdade e retorna as chaves usadas (para remoção)"""
+        chaves = self._chaves_igualdade(pessoa)
+        for mapa, chave in chaves:
+            if chave != "":
+                getattr(self, mapa).setdefault(chave, set()).add(subject_id)
+        return chaves
+
+    @staticmethod
+    def _descartar_igualdade(mapa, chave, subject_id):
+        ids = mapa.get(chave)
+        if ids:
+            ids.discard(subject_id)
+            if not ids:
+                del mapa[chave]
+
+    def adicionar(self, subject_id, pessoa):
+        """Indexa (ou reindexa) uma pessoa"""
+        self.remover(subject_id)
+        chaves = self._chaves_da_pessoa(pessoa)
+        for chave in chaves:
+            bisect.insort(self._chaves, (chave, subject_id))
+        self._entradas[subject_id] = (chaves, self._registrar_igualdade(subject_id, pessoa))
+
+    def remover(self, subject_id):
+        """Remove uma pessoa do índice (ignora se não estiver indexada)"""
+        entrada = self._entradas.pop(subject_id, None)
+        if entrada is None:
+            return
+        chaves, igualdade = entrada
+        for chave in chaves:
+            posicao = bisect.bisect_left(self._chaves, (chave, subject_id))
+            if posicao < len(self._chaves) and self._chaves[posicao] == (chave, subject_id):
+                del self._chaves[posicao]
+        for mapa, chave in igualdade:
+            self._descartar_igualdade(getattr(self, mapa), chave, subject_id)
+
+    def buscar(self, termo, limite=20):
+        """subject_ids cujo nome (ou palavra do nome), email ou telefone começa com o termo"""
+        prefixos = {normalizar_texto(termo), prefixo_telefone(termo)}
+        prefixos.discard("")
+        encontrados = []
+        vistos = set()
+        for prefixo in sorted(prefixos):
+            posicao = bisect.bisect_left(self._chaves, (prefixo, ""))
+            while posicao < len(self._chaves) and len(encontrados) < limite:
+                chave, subject_id = self._chaves[posicao]
+                if not chave.startswith(prefixo):
+                    break
+                if subject_id not in vistos:
+                    vistos.add(subject_id)
+                    encontrados.append(subject_id)
+                posicao += 1
+        return encontrados
+
+    def ids_com_email(self, email):
+        """subject_ids com exatamente este email (sem diferenciar caixa)"""
+        return set(self._por_email.get(normalizar_texto(email), ()))
+
+    def ids_com_telefone(self, telefone):
+        """subject_ids com exatamente estes dígitos de telefone"""
+        return set(self._por_telefone.get(normalizar_telefone(telefone), ()))
+
+    def ids_com_imagem(self, image_hash):
+        """subject_ids cuja imagem normalizada tem exatamente este SHA-256"""
+        return set(self._por_imagem.get(image_hash or "", ()))
+
+    def ids_com_imagem_parecida(self, image_dhash, distancia):
+        """subject_ids cujo hash perceptual difere em até `distancia` bits"""
+        alvo = int(image_dhash, 16)
+        return {subject_id for dhash, ids in self._por_dhash.items()
+                if bin(dhash ^ alvo).count("1") <= distancia for subject_id in ids}
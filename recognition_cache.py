@@ -0,0 +1,126 @@
+"""
+🧠 Face Manager - Cache de Reconhecimento
+Cache LRU com expiração para respostas do CompreFace /recognize.
+
+- Chave: (cliente, SHA-256 da imagem normalizada) — quadros idênticos
+  reenviados por quiosques e retentativas não chamam o CompreFace de novo
+- Guarda a resposta crua do CompreFace; os dados das pessoas são resolvidos
+  a cada consulta, então edições de metadados não exigem invalidação
+- Exclusão de uma pessoa invalida as entradas que a citam; um novo cadastro
+  invalida o cliente inteiro (a face pode passar a ser reconhecida)
+- O cache é por processo: com vários workers, o TTL limita o tempo em que
+  outro worker pode responder com um resultado anterior à mudança
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# =====================
+# 🔧 CONFIGURAÇÕES
+# =====================
+
+CACHE_SIZE = int(os.environ.get("FACE_MANAGER_RECOGNITION_CACHE_SIZE", 1000))
+CACHE_TTL = float(os.environ.get("FACE_MANAGER_RECOGNITION_CACHE_TTL", 60))
+
+
+def subjects_do_resultado(compreface_result):
+    """api_subject_ids citados numa resposta do CompreFace"""
+    return {
+        subject.get("subject", "")
+        for resultado in compreface_result.get("result", [])
+        for subject in resultado.get("subjects", [])
+    }
+
+
+class CacheReconhecimento:
+    """Cache LRU + TTL de resultados de reconhecimento, com invalidação por subject"""
+
+    def __init__(self, max_itens=CACHE_SIZE, ttl=CACHE_TTL):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._itens = OrderedDict()   # (cliente, hash) -> (expira_em, resultado, subjects)
+        self._por_subject = {}        # api_subject_id -> {(cliente, hash)}
+        self._geracao = {}            # cliente -> contador de invalidações do cliente
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _descartar(self, chave):
+        _, _, subjects = self._itens.pop(chave)
+        for subject in subjects:
+            chaves = self._por_subject.get(subject)
+            if chaves:
+                chaves.discard(chave)
+                if not chaves:
+                    del self._por_subject[subject]
+
+    def geracao(self, cliente):
+        """Marca do estado do cliente; guardar() ignora resultados obtidos antes de uma invalidação"""
+        with self._lock:
+            return self._geracao.get(cliente, 0)
+
+    def obter(self, cliente, image_hash):
+        """Resultado em cache (ou None), atualizando a ordem LRU e os contadores"""
+        chave = (cliente, image_hash)
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None and item[0] < time.monotonic():
+                self._descartar(chave)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return item[1]
+
+    def guardar(self, cliente, image_hash, compreface_result, geracao):
+        if self.max_itens <= 0:
+            return
+        chave = (cliente, image_hash)
+        subjects = subjects_do_resultado(compreface_result)
+        with self._lock:
+            if self._geracao.get(cliente, 0) != geracao:
+                return  # houve cadastro/exclusão durante a chamada ao CompreFace
+            if chave in self._itens:
+                self._descartar(chave)
+            self._itens[chave] = (time.monotonic() + self.ttl, compreface_result, subjects)
+            for subject in subjects:
+                self._por_subject.setdefault(subject, set()).add(chave)
+            while len(self._itens) > self.max_itens:
+                self._descartar(next(iter(self._itens)))
+                self.evictions += 1
+
+    def invalidar_subject(self, cliente, api_subject_id):
+        """Remove as entradas que citam o subject (pessoa excluída)"""
+        with self._lock:
+            self._geracao[cliente] = self._geracao.get(cliente, 0) + 1
+            for chave in list(self._por_subject.get(api_subject_id, ())):
+                self._descartar(chave)
+                self.invalidations += 1
+
+    def invalidar_cliente(self, cliente):
+        """Remove todas as entradas do cliente (novo cadastro pode mudar qualquer resultado)"""
+        with self._lock:
+            self._geracao[cliente] = self._geracao.get(cliente, 0) + 1
+            for chave in [chave for chave in self._itens if chave[0] == cliente]:
+                self._descartar(chave)
+                self.invalidations += 1
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "size": len(self._itens),
+                "max_size": self.max_itens,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
@@ -8,12 +8,17 @@ Configuração:
 - Imagem: presidente.jpg (da pasta upload_images)
 
 Execute: python reconhecer_face.py
+Várias imagens (uma única requisição em lote): python reconhecer_face.py a.jpg b.jpg c.jpg
+Direto no CompreFace, dezenas de chamadas simultâneas (requer aiohttp):
+    python reconhecer_face.py --direto pasta/*.jpg
 """
 
+import asyncio
 import requests
 import json
 import os
 import base64
+import sys
 from datetime import datetime
 
 # =====================
@@ -26,13 +31,8 @@ CLIENTE_BUSCA = "pao_de_acucar"
 # Imagem para reconhecimento
 IMAGEM_TESTE = "teste_faces_bulk/jorlan.jpg"
 
-# URLs das APIs
-COMPREFACE_URL = "https://facial-back.visionlabss.com/api/v1/recognition/recognize"
-FACE_MANAGER_URL = "https://facial-front.visionlabss.com/api"
-
-# Chave da API CompreFace
-API_KEY = "52f25461-4ef8-4489-a10d-c2b076fc62a2"
-HEADERS = {"x-api-key": API_KEY}
+# URL da API do Face Manager (consulta o CompreFace e devolve os dados da pessoa)
+FACE_MANAGER_URL = os.environ.get("FACE_MANAGER_URL", "https://facial-front.visionlabss.com/api")
 
 def log(message, level="INFO"):
     """Log com timestamp e cores"""
@@ -62,126 +62,144 @@ def verificar_imagem():
     log(f"Imagem encontrada: {IMAGEM_TESTE}", "SUCCESS")
     return True
 
-def obter_pessoas_cliente():
-    """Obtém todas as pessoas do cliente para referência"""
-    try:
-        response = requests.get(f"{FACE_MANAGER_URL}/{CLIENTE_BUSCA}/persons")
-        if response.status_code == 200:
-            data = response.json()
-            log(f"Base de dados {CLIENTE_BUSCA}: {data['total']} pessoas cadastradas", "INFO")
-            return data['persons']
-        else:
-            log(f"Erro ao acessar base de dados: {response.status_code}", "ERROR")
-            return {}
-    except Exception as e:
-        log(f"Erro de conexão com Face Manager: {e}", "ERROR")
-        return {}
-
 def reconhecer_face():
-    """Executa reconhecimento facial usando CompreFace"""
+    """Envia a imagem ao Face Manager, que reconhece e já retorna os dados das pessoas"""
     try:
         log("🔍 Iniciando reconhecimento facial...", "INFO")
         
-        # Abrir e enviar imagem para CompreFace
         with open(IMAGEM_TESTE, "rb") as f:
-            files = {"file": f}
-            
-            # Fazer reconhecimento sem filtro de subject (para buscar em toda a base)
             response = requests.post(
-                COMPREFACE_URL,
-                headers=HEADERS,
-                files=files,
+                f"{FACE_MANAGER_URL}/{CLIENTE_BUSCA}/recognize",
+                files={"file": f},
                 timeout=30
             )
         
-        log(f"Status CompreFace: {response.status_code}", "INFO")
+        log(f"Status do reconhecimento: {response.status_code}", "INFO")
         
         if response.status_code == 200:
-            result = response.json()
-            log("Resposta do CompreFace recebida", "SUCCESS")
-            return result
+            log("Resposta do reconhecimento recebida", "SUCCESS")
+            return response.json()
         else:
-            log(f"Erro no CompreFace: {response.status_code} - {response.text}", "ERROR")
+            log(f"Erro no reconhecimento: {response.status_code} - {response.text}", "ERROR")
             return None
             
     except Exception as e:
         log(f"Erro no reconhecimento: {e}", "ERROR")
         return None
 
-def processar_resultado(compreface_result, pessoas_cliente):
-    """Processa resultado do CompreFace e busca dados da pessoa"""
-    if not compreface_result or 'result' not in compreface_result:
-        log("Nenhum resultado de reconhecimento", "WARNING")
-        return
-    
-    resultados = compreface_result['result']
+def reconhecer_lote(caminhos):
+    """Envia várias imagens numa única requisição ao endpoint de reconhecimento em lote"""
+    try:
+        log(f"🔍 Reconhecendo {len(caminhos)} imagens em lote...", "INFO")
+        files = []
+        for caminho in caminhos:
+            with open(caminho, "rb") as f:
+                files.append(("file", (os.path.basename(caminho), f.read())))
+        
+        response = requests.post(
+            f"{FACE_MANAGER_URL}/{CLIENTE_BUSCA}/recognize:batch",
+            files=files,
+            timeout=120
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            log(f"Lote processado em {data['total_ms']:.0f}ms ({data['recognized']}/{data['total']} reconhecidas)", "SUCCESS")
+            return data['results']
+        else:
+            log(f"Erro no reconhecimento: {response.status_code} - {response.text}", "ERROR")
+            return None
+            
+    except Exception as e:
+        log(f"Erro no reconhecimento: {e}", "ERROR")
+        return None
+
+async def _reconhecer_direto(caminhos):
+    from compreface_async import AsyncCompreFaceClient
+    async with AsyncCompreFaceClient() as cliente:
+        return await cliente.reconhecer_varios(caminhos, CLIENTE_BUSCA)
+
+def reconhecer_direto(caminhos):
+    """Reconhece as imagens direto no CompreFace, em paralelo (sem os dados do Face Manager)
+
+    Retorna os resultados no formato do reconhecimento em lote, na ordem de entrada.
+    """
+    log(f"🔍 Reconhecendo {len(caminhos)} imagens direto no CompreFace...", "INFO")
+    try:
+        respostas = asyncio.run(_reconhecer_direto(caminhos))
+    except ImportError as e:
+        log(str(e), "ERROR")
+        return None
+
+    resultados = []
+    for caminho, resposta in zip(caminhos, respostas):
+        resultado = {"id": caminho, "status": 200, "faces": []}
+        if isinstance(resposta, Exception):
+            resultado.update(status=getattr(resposta, "status", 502), error=str(resposta))
+        else:
+            for face in resposta.get("result", []):
+                subjects = face.get("subjects") or []
+                melhor = max(subjects, key=lambda s: s.get("similarity", 0), default=None)
+                resultado["faces"].append({
+                    "box": face.get("box"),
+                    "best_match": melhor and {"subject_id": melhor["subject"], "similarity": melhor["similarity"]},
+                })
+        resultados.append(resultado)
+    return resultados
+
+def processar_resultado(resultado):
+    """Exibe as faces detectadas e os dados das pessoas reconhecidas"""
+    faces = resultado.get('faces', [])
     
-    if not resultados:
-        log("😞 Nenhuma face reconhecida na imagem", "WARNING")
-        log(f"A pessoa não está cadastrada na base {CLIENTE_BUSCA.upper()}", "INFO")
+    if not faces:
+        log("😞 Nenhuma face detectada na imagem", "WARNING")
         return
     
-    log(f"🎯 {len(resultados)} face(s) detectada(s)", "SUCCESS")
+    log(f"🎯 {len(faces)} face(s) detectada(s)", "SUCCESS")
     
-    for i, resultado in enumerate(resultados, 1):
+    for i, face in enumerate(faces, 1):
         log(f"\n--- RESULTADO {i} ---", "INFO")
         
         # Informações da detecção
-        if 'box' in resultado:
-            box = resultado['box']
+        box = face.get('box') or {}
+        if box:
             log(f"📍 Posição: ({box.get('x_min', 0)}, {box.get('y_min', 0)}) - ({box.get('x_max', 0)}, {box.get('y_max', 0)})", "INFO")
         
-        # Verificar se há matches (pessoas reconhecidas)
-        if 'subjects' in resultado and resultado['subjects']:
-            melhor_match = resultado['subjects'][0]  # Primeiro é o melhor match
-            
-            subject_name = melhor_match.get('subject', '')
-            similarity = melhor_match.get('similarity', 0)
-            
-            log(f"🎯 PESSOA RECONHECIDA!", "SUCCESS")
-            log(f"   Confiança: {similarity:.2%}", "SUCCESS")
-            log(f"   Subject ID: {subject_name}", "INFO")
-            
-            # Extrair ID real (remover prefixo do cliente)
-            if subject_name.startswith(f"{CLIENTE_BUSCA}_"):
-                person_id = subject_name.replace(f"{CLIENTE_BUSCA}_", "")
-                log(f"   ID extraído: {person_id}", "INFO")
-                
-                # Buscar dados da pessoa - primeiro na cache local
-                if person_id in pessoas_cliente:
-                    pessoa = pessoas_cliente[person_id]
-                    
-                    log(f"\n👤 DADOS DA PESSOA:", "SUCCESS")
-                    log(f"   Nome: {pessoa['name']}", "SUCCESS")
-                    log(f"   Email: {pessoa['email']}", "SUCCESS")
-                    log(f"   Telefone: {pessoa['phone']}", "SUCCESS")
-                    log(f"   Cliente: {CLIENTE_BUSCA.upper()}", "SUCCESS")
-                    log(f"   ID: {person_id}", "INFO")
-                else:
-                    # Busca direta na API como fallback
-                    log(f"   Buscando na API...", "INFO")
-                    try:
-                        resp = requests.get(f"{FACE_MANAGER_URL}/{CLIENTE_BUSCA}/persons/{person_id}")
-                        if resp.status_code == 200:
-                            pessoa = resp.json()
-                            log(f"\n👤 DADOS DA PESSOA (via API):", "SUCCESS")
-                            log(f"   Nome: {pessoa['name']}", "SUCCESS")
-                            log(f"   Email: {pessoa['email']}", "SUCCESS")
-                            log(f"   Telefone: {pessoa['phone']}", "SUCCESS")
-                            log(f"   Cliente: {CLIENTE_BUSCA.upper()}", "SUCCESS")
-                            log(f"   ID: {person_id}", "INFO")
-                        else:
-                            log(f"⚠️ Pessoa não encontrada na API: {resp.status_code}", "WARNING")
-                    except Exception as e:
-                        log(f"⚠️ Erro ao consultar API: {e}", "ERROR")
-            else:
-                log(f"⚠️ Subject não pertence ao cliente {CLIENTE_BUSCA}", "WARNING")
-        else:
+        melhor_match = face.get('best_match')
+        if not melhor_match:
             log(f"👤 Face detectada mas não reconhecida", "WARNING")
             log(f"   A pessoa não está cadastrada na base {CLIENTE_BUSCA.upper()}", "INFO")
+            continue
+        
+        log(f"🎯 PESSOA RECONHECIDA!", "SUCCESS")
+        log(f"   Confiança: {melhor_match['similarity']:.2%}", "SUCCESS")
+        log(f"   ID: {melhor_match['subject_id']}", "INFO")
+        
+        if 'person' not in melhor_match:
+            continue  # reconhecimento direto no CompreFace: sem dados do Face Manager
+        pessoa = melhor_match['person']
+        if pessoa:
+            log(f"\n👤 DADOS DA PESSOA:", "SUCCESS")
+            log(f"   Nome: {pessoa['name']}", "SUCCESS")
+            log(f"   Email: {pessoa['email']}", "SUCCESS")
+            log(f"   Telefone: {pessoa['phone']}", "SUCCESS")
+            log(f"   Cliente: {CLIENTE_BUSCA.upper()}", "SUCCESS")
+        else:
+            log(f"⚠️ Face cadastrada no CompreFace, mas sem dados no Face Manager", "WARNING")
 
 def main():
     """Função principal"""
+    global IMAGEM_TESTE
+    imagens = sys.argv[1:]
+    direto = "--direto" in imagens
+    if direto:
+        imagens.remove("--direto")
+    if len(imagens) > 1 or direto:
+        main_lote(imagens, direto)
+        return
+    if imagens:
+        IMAGEM_TESTE = imagens[0]
+    
     log("🔍 FACE MANAGER - RECONHECIMENTO FACIAL", "INFO")
     log("=" * 60, "INFO")
     log(f"🎯 Cliente de busca: {CLIENTE_BUSCA.upper()}", "INFO")
@@ -192,29 +210,47 @@ def main():
     if not verificar_imagem():
         return
     
-    # 2. Obter pessoas do cliente
-    pessoas_cliente = obter_pessoas_cliente()
-    if not pessoas_cliente:
-        log("Não há pessoas cadastradas no cliente ou erro de conexão", "ERROR")
-        return
-    
-    print()
-    
-    # 3. Executar reconhecimento
+    # 2. Executar reconhecimento (uma única chamada ao Face Manager)
     resultado = reconhecer_face()
     
     if resultado:
         print()
-        # 4. Processar e exibir resultado
-        processar_resultado(resultado, pessoas_cliente)
+        # 3. Exibir resultado
+        processar_resultado(resultado)
     
     print()
     log("🎉 Reconhecimento concluído!", "SUCCESS")
     
-    # 5. Instruções para outros clientes
+    # 4. Instruções para outros clientes
     print("\n💡 DICA:")
     print("   Para buscar em outro cliente, edite a variável CLIENTE_BUSCA")
     print("   Clientes disponíveis: carrefour, pao_de_acucar, rede_sonda")
 
+def main_lote(imagens, direto=False):
+    """Reconhece várias imagens (numa requisição em lote ou direto no CompreFace) e exibe na ordem de entrada"""
+    existentes = [imagem for imagem in imagens if os.path.exists(imagem)]
+    for imagem in sorted(set(imagens) - set(existentes)):
+        log(f"Imagem não encontrada: {imagem}", "ERROR")
+    if not existentes:
+        return
+    
+    resultados = reconhecer_direto(existentes) if direto else reconhecer_lote(existentes)
+    if not resultados:
+        return
+    
+    for resultado in resultados:
+        print()
+        if direto:
+            log(f"📷 {resultado['id']}", "INFO")
+        else:
+            log(f"📷 {resultado['id']} ({resultado['latency_ms']:.0f}ms{', cache' if resultado.get('cached') else ''})", "INFO")
+        if resultado['status'] != 200:
+            log(f"Erro: {resultado.get('error')}", "ERROR")
+            continue
+        processar_resultado(resultado)
+    
+    print()
+    log("🎉 Reconhecimento concluído!", "SUCCESS")
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
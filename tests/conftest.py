@@ -0,0 +1,92 @@
+import base64
+import hashlib
+import io
+import os
+import sys
+import threading
+import time
+
+import pytest
+from PIL import Image, ImageDraw
+
+# Os módulos do projeto ficam na raiz do repositório (sem pacote instalável)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def imagem_base64(semente, tamanho=(320, 240)):
+    """PNG em base64, diferente para cada semente"""
+    img = Image.new("RGB", tamanho, "white")
+    ImageDraw.Draw(img).rectangle((semente * 7 % 250, 0, semente * 7 % 250 + 60, tamanho[1]), fill="black")
+    saida = io.BytesIO()
+    img.save(saida, "PNG")
+    return base64.b64encode(saida.getvalue()).decode()
+
+
+class CompreFaceFalso:
+    """Substitui as chamadas ao CompreFace: faces em memória, reconhecimento por SHA-256 do arquivo"""
+
+    def __init__(self):
+        self.faces = {}          # api_subject_id -> sha256 da imagem enviada
+        self.latencia = 0.0
+        self.falhar_em = set()   # api_subject_ids cujo cadastro falha
+        self.deletados = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(img_path):
+        with open(img_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def cadastrar(self, img_path, subject_id):
+        time.sleep(self.latencia)
+        if subject_id in self.falhar_em:
+            raise RuntimeError("CompreFace falhou")
+        with self._lock:
+            self.faces[subject_id] = self._hash(img_path)
+        return {"image_id": subject_id, "subject": subject_id}
+
+    def deletar(self, subject_id):
+        time.sleep(self.latencia)
+        with self._lock:
+            self.faces.pop(subject_id, None)
+            self.deletados.append(subject_id)
+        return {"deleted": 1}
+
+    def reconhecer(self, img_path, cliente):
+        time.sleep(self.latencia)
+        alvo = self._hash(img_path)
+        with self._lock:
+            subjects = [{"subject": s, "similarity": 0.99} for s, h in self.faces.items()
+                        if h == alvo and s.startswith(f"{cliente}_")]
+        return {"result": [{"box": {"x_min": 0, "y_min": 0, "x_max": 10, "y_max": 10}, "subjects": subjects}]}
+
+
+@pytest.fixture
+def app_teste(tmp_path, monkeypatch):
+    """(módulo app, test client, CompreFace falso) com clients/ e jobs/ em tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    import app as modulo
+    from job_queue import FilaJobs
+    from metadata_store import JsonMetadataBackend
+    from recognition_cache import CacheReconhecimento
+
+    compreface = CompreFaceFalso()
+    monkeypatch.setattr(modulo, "metadata_backend", JsonMetadataBackend(str(tmp_path / "clients")))
+    monkeypatch.setattr(modulo, "fila_jobs", FilaJobs(str(tmp_path / "jobs")))
+    monkeypatch.setattr(modulo, "cache_reconhecimento", CacheReconhecimento())
+    monkeypatch.setattr(modulo, "CLIENTS_FOLDER", str(tmp_path / "clients"))
+    monkeypatch.setattr(modulo, "cadastrar_face", compreface.cadastrar)
+    monkeypatch.setattr(modulo, "deletar_face", compreface.deletar)
+    monkeypatch.setattr(modulo, "reconhecer_face", compreface.reconhecer)
+    return modulo, modulo.app.test_client(), compreface
+
+
+def aguardar_job(modulo, job_id, limite=10):
+    """Estado final de um job da fila"""
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        job = modulo.fila_jobs.obter(job_id)
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} não terminou")
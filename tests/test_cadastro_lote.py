@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from conftest import imagem_base64
+
+
+def pessoa(email, semente, **extra):
+    return {"name": "Ana", "email": email, "phone": "", "image_base64": imagem_base64(semente), **extra}
+
+
+@pytest.fixture
+def gravacoes(app_teste, monkeypatch):
+    """Quantidade de pessoas em cada chamada a gravar_varios"""
+    modulo = app_teste[0]
+    chamadas = []
+    original = modulo.metadata_backend.gravar_varios
+
+    def gravar_varios(cliente, pessoas):
+        chamadas.append(len(pessoas))
+        return original(cliente, pessoas)
+
+    monkeypatch.setattr(modulo.metadata_backend, "gravar_varios", gravar_varios)
+    return chamadas
+
+
+def test_duplicado_no_lote_grava_um_so_mesmo_em_paralelo(app_teste):
+    modulo, cliente, _ = app_teste
+    resposta = cliente.post("/api/carrefour/persons:batch", json={"persons": [pessoa("a@x.com", n) for n in range(6)]})
+    assert sorted(r["status"] for r in resposta.json["results"]) == [201] + [409] * 5
+    assert modulo.metadata_backend.contar("carrefour") == 1
+
+
+def test_lote_json_com_resultado_por_item(app_teste, gravacoes, monkeypatch):
+    modulo, cliente, compreface = app_teste
+    monkeypatch.setattr(modulo, "BATCH_CONCURRENCY", 1)  # itens na ordem de envio
+    resposta = cliente.post("/api/carrefour/persons:batch", json={"persons": [
+        pessoa("a@x.com", 1), pessoa("A@x.com", 2), {"name": "Sem email"}, pessoa("b@x.com", 3)]})
+    assert resposta.status_code == 200
+    assert [r["status"] for r in resposta.json["results"]] == [201, 409, 400, 201]
+    assert [r["index"] for r in resposta.json["results"]] == [0, 1, 2, 3]
+    assert (resposta.json["created"], resposta.json["failed"]) == (2, 2)
+    assert gravacoes == [2]  # uma única escrita de metadados
+    assert modulo.metadata_backend.contar("carrefour") == 2
+    assert len(compreface.faces) == 2
+
+
+def test_lote_ndjson_com_linha_invalida(app_teste):
+    modulo, cliente, _ = app_teste
+    corpo = "\n".join([json.dumps(pessoa("a@x.com", 1)), "{nao é json", json.dumps(pessoa("b@x.com", 2))])
+    resposta = cliente.post("/api/carrefour/persons:batch", data=corpo, content_type="application/x-ndjson")
+    assert [r["status"] for r in resposta.json["results"]] == [201, 400, 201]
+    assert modulo.metadata_backend.contar("carrefour") == 2
+
+
+def test_duplicados_na_base_e_no_lote(app_teste, monkeypatch):
+    modulo, cliente, _ = app_teste
+    monkeypatch.setattr(modulo, "BATCH_CONCURRENCY", 1)
+    existente = cliente.post("/api/carrefour/persons", json=pessoa("a@x.com", 1)).json["subject_id"]
+    resposta = cliente.post("/api/carrefour/persons:batch", json={"persons": [
+        pessoa("a@x.com", 2), pessoa("b@x.com", 1), pessoa("c@x.com", 3), pessoa("d@x.com", 3),
+        pessoa("e@x.com", 3, allow_duplicate=True)]})
+    resultados = resposta.json["results"]
+    assert [r["status"] for r in resultados] == [409, 409, 201, 409, 201]
+    assert resultados[0]["duplicate_email_of"] == [existente]
+    assert resultados[1]["duplicate_image_of"] == [existente]
+    assert modulo.metadata_backend.contar("carrefour") == 3
+
+
+def test_item_que_falha_libera_email_e_imagem(app_teste, monkeypatch):
+    modulo, cliente, compreface = app_teste
+    monkeypatch.setattr(modulo, "BATCH_CONCURRENCY", 1)  # itens na ordem de envio
+    chamadas = []
+
+    def cadastrar(img_path, subject_id):
+        chamadas.append(subject_id)
+        if len(chamadas) == 1:
+            raise RuntimeError("CompreFace falhou")
+        return compreface.cadastrar(img_path, subject_id)
+
+    monkeypatch.setattr(modulo, "cadastrar_face", cadastrar)
+    resposta = cliente.post("/api/carrefour/persons:batch", json={"persons": [pessoa("a@x.com", 1), pessoa("a@x.com", 1)]})
+    assert [r["status"] for r in resposta.json["results"]] == [502, 201]
+    assert modulo.metadata_backend.contar("carrefour") == 1
+
+
+def test_lote_acima_do_limite(app_teste, monkeypatch):
+    modulo, cliente, _ = app_teste
+    monkeypatch.setattr(modulo, "BATCH_MAX_ITEMS", 2)
+    resposta = cliente.post("/api/carrefour/persons:batch", json={"persons": [
+        pessoa("a@x.com", 1), pessoa("b@x.com", 2), pessoa("c@x.com", 3)]})
+    assert [r["status"] for r in resposta.json["results"]] == [201, 201, 413]
+    assert modulo.metadata_backend.contar("carrefour") == 2
@@ -0,0 +1,129 @@
+import pytest
+
+import compreface_client
+from compreface_client import CompreFaceIndisponivel, DisjuntorCompreFace
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(compreface_client.time, "monotonic", relogio)
+    return relogio
+
+
+def disjuntor_aberto(relogio):
+    disjuntor = DisjuntorCompreFace(janela=4, minimo=4, taxa=0.5, lenta=5, aberto_por=30)
+    for _ in range(4):
+        assert disjuntor.permitir() is False
+        disjuntor.registrar(True, 0.1)
+    assert disjuntor.estado == "open"
+    return disjuntor
+
+
+def test_abre_quando_falhas_dominam_a_janela(relogio):
+    disjuntor = DisjuntorCompreFace(janela=4, minimo=4, taxa=0.5, lenta=5, aberto_por=30)
+    for falhou in (False, False, True):
+        disjuntor.permitir()
+        disjuntor.registrar(falhou, 0.1)
+    assert disjuntor.estado == "closed"
+    disjuntor.permitir()
+    disjuntor.registrar(True, 0.1)
+    assert disjuntor.estado == "open"
+
+
+def test_chamadas_lentas_tambem_abrem(relogio):
+    disjuntor = DisjuntorCompreFace(janela=4, minimo=4, taxa=0.5, lenta=5, aberto_por=30)
+    for duracao in (6, 6, 0.1, 0.1):
+        disjuntor.permitir()
+        disjuntor.registrar(False, duracao)
+    assert disjuntor.estado == "open"
+
+
+def test_aberto_recusa_com_retry_after(relogio):
+    disjuntor = disjuntor_aberto(relogio)
+    relogio.agora += 10
+    with pytest.raises(CompreFaceIndisponivel) as erro:
+        disjuntor.permitir()
+    assert erro.value.retry_after == pytest.approx(20)
+    with pytest.raises(CompreFaceIndisponivel):
+        disjuntor.verificar()
+
+
+def test_semiaberto_libera_uma_unica_chamada_de_teste(relogio):
+    disjuntor = disjuntor_aberto(relogio)
+    relogio.agora += 31
+    disjuntor.verificar()  # consulta não reserva o teste
+    assert disjuntor.permitir() is True
+    assert disjuntor.estado == "half_open"
+    with pytest.raises(CompreFaceIndisponivel):
+        disjuntor.permitir()
+    with pytest.raises(CompreFaceIndisponivel):
+        disjuntor.verificar()
+
+
+def test_sucesso_do_teste_fecha(relogio):
+    disjuntor = disjuntor_aberto(relogio)
+    relogio.agora += 31
+    teste = disjuntor.permitir()
+    disjuntor.registrar(False, 0.1, teste)
+    assert disjuntor.estado == "closed"
+    assert disjuntor.permitir() is False
+
+
+def test_falha_do_teste_reabre(relogio):
+    disjuntor = disjuntor_aberto(relogio)
+    relogio.agora += 31
+    teste = disjuntor.permitir()
+    disjuntor.registrar(True, 0.1, teste)
+    assert disjuntor.estado == "open"
+    with pytest.raises(CompreFaceIndisponivel):
+        disjuntor.permitir()
+
+
+def test_chamada_antiga_nao_decide_o_semiaberto(relogio):
+    disjuntor = DisjuntorCompreFace(janela=4, minimo=4, taxa=0.5, lenta=5, aberto_por=30)
+    antiga = disjuntor.permitir()  # iniciada com o circuito fechado
+    for _ in range(4):
+        disjuntor.permitir()
+        disjuntor.registrar(True, 0.1)
+    relogio.agora += 31
+    teste = disjuntor.permitir()
+    assert disjuntor.estado == "half_open"
+
+    disjuntor.registrar(False, 0.1, antiga)  # termina durante o semiaberto
+    assert disjuntor.estado == "half_open"
+    with pytest.raises(CompreFaceIndisponivel):
+        disjuntor.permitir()  # o teste continua em andamento
+
+    disjuntor.registrar(True, 0.1, teste)
+    assert disjuntor.estado == "open"
+
+
+def test_chamada_antiga_ignorada_com_circuito_aberto(relogio):
+    disjuntor = DisjuntorCompreFace(janela=4, minimo=4, taxa=0.5, lenta=5, aberto_por=30)
+    antiga = disjuntor.permitir()
+    for _ in range(4):
+        disjuntor.permitir()
+        disjuntor.registrar(True, 0.1)
+    disjuntor.registrar(False, 0.1, antiga)
+    assert disjuntor.estado == "open"
+    assert disjuntor.estatisticas()["recent_calls"] == 0
+
+
+def test_liberar_teste_devolve_so_a_vaga_do_teste(relogio):
+    disjuntor = disjuntor_aberto(relogio)
+    relogio.agora += 31
+    teste = disjuntor.permitir()
+    disjuntor.liberar_teste(False)
+    with pytest.raises(CompreFaceIndisponivel):
+        disjuntor.permitir()
+    disjuntor.liberar_teste(teste)
+    assert disjuntor.permitir() is True
@@ -0,0 +1,101 @@
+import pytest
+
+from compreface_client import CompreFaceIndisponivel
+from conftest import imagem_base64
+
+
+def cadastrar(cliente, quantidade):
+    ids = []
+    for i in range(quantidade):
+        resposta = cliente.post("/api/carrefour/persons", json={
+            "name": f"Pessoa {i}", "email": f"p{i}@x.com", "phone": "", "image_base64": imagem_base64(100 + i)})
+        assert resposta.status_code in (200, 201), resposta.json
+        ids.append(resposta.json["subject_id"])
+    return ids
+
+
+@pytest.fixture
+def gravacoes(app_teste, monkeypatch):
+    """Lista com os ids de cada chamada a remover_varios"""
+    modulo = app_teste[0]
+    chamadas = []
+    original = modulo.metadata_backend.remover_varios
+
+    def remover_varios(cliente, subject_ids):
+        chamadas.append(list(subject_ids))
+        return original(cliente, subject_ids)
+
+    monkeypatch.setattr(modulo.metadata_backend, "remover_varios", remover_varios)
+    monkeypatch.setattr(modulo, "DELETE_CHUNK_SIZE", 2)
+    return chamadas
+
+
+def test_exclusao_em_lote_com_ids_inexistentes(app_teste, gravacoes):
+    modulo, cliente, compreface = app_teste
+    ids = cadastrar(cliente, 3)
+    resposta = cliente.delete("/api/carrefour/persons", json={"subject_ids": [ids[0], "nao-existe", ids[2], ids[0]]})
+    assert resposta.status_code == 200
+    assert (resposta.json["total"], resposta.json["deleted"], resposta.json["failed"]) == (3, 2, 1)
+    assert [r["status"] for r in resposta.json["results"]] == [200, 404, 200]
+    assert modulo.metadata_backend.contar("carrefour") == 1
+    assert set(compreface.faces) == {f"carrefour_{ids[1]}"}
+
+
+def test_lista_invalida_e_recusada(app_teste):
+    _, cliente, _ = app_teste
+    assert cliente.delete("/api/carrefour/persons", json={"subject_ids": "abc"}).status_code == 400
+    assert cliente.delete("/api/carrefour/persons", json={"subject_ids": [1, 2]}).status_code == 400
+
+
+def test_purga_exige_confirmacao(app_teste):
+    modulo, cliente, _ = app_teste
+    cadastrar(cliente, 1)
+    resposta = cliente.delete("/api/carrefour/persons", json={"all": True, "confirm": "outro"})
+    assert resposta.status_code == 400
+    assert modulo.metadata_backend.contar("carrefour") == 1
+
+
+def test_purga_grava_metadados_por_bloco(app_teste, gravacoes):
+    modulo, cliente, compreface = app_teste
+    cadastrar(cliente, 5)
+    resposta = cliente.delete("/api/carrefour/persons", json={"all": True, "confirm": "carrefour"})
+    assert resposta.json["deleted"] == 5
+    assert [len(ids) for ids in gravacoes] == [2, 2, 1]
+    assert modulo.metadata_backend.contar("carrefour") == 0
+    assert compreface.faces == {}
+
+
+def test_purga_interrompida_mantem_metadados_dos_blocos_concluidos(app_teste, gravacoes, monkeypatch):
+    modulo, cliente, compreface = app_teste
+    ids = cadastrar(cliente, 5)
+    excluir = compreface.deletar
+
+    def deletar(subject_id):
+        if subject_id == f"carrefour_{ids[3]}":
+            raise KeyboardInterrupt  # processo derrubado no meio da purga
+        return excluir(subject_id)
+
+    monkeypatch.setattr(modulo, "deletar_face", deletar)
+    with pytest.raises(KeyboardInterrupt):
+        modulo.excluir_pessoas("carrefour", ids)
+    # O primeiro bloco já saiu do CompreFace e dos metadados
+    assert gravacoes[0] == ids[:2]
+    assert all(modulo.metadata_backend.obter("carrefour", sid) is None for sid in ids[:2])
+    assert {sid for sid, _ in modulo.metadata_backend.listar("carrefour")} == set(ids[2:])
+
+
+def test_compreface_indisponivel_mantem_a_pessoa(app_teste, gravacoes, monkeypatch):
+    modulo, cliente, _ = app_teste
+    ids = cadastrar(cliente, 2)
+
+    def deletar(subject_id):
+        if subject_id.endswith(ids[1]):
+            raise CompreFaceIndisponivel("Circuito aberto", 12.5)
+        return {"deleted": 1}
+
+    monkeypatch.setattr(modulo, "deletar_face", deletar)
+    resposta = cliente.delete("/api/carrefour/persons", json={"subject_ids": ids})
+    assert [r["status"] for r in resposta.json["results"]] == [200, 503]
+    assert resposta.json["results"][1]["retry_after"] == 13
+    assert modulo.metadata_backend.obter("carrefour", ids[1]) is not None
+    assert gravacoes == [[ids[0]]]
@@ -0,0 +1,132 @@
+import io
+import os
+import threading
+
+import pytest
+from PIL import Image, ImageDraw
+
+from image_pipeline import ImagemInvalida, gerar_thumbnail, hash_conteudo, hash_perceptual, normalizar_imagem
+from metadata_store import JsonMetadataBackend, preencher_hashes_imagens
+from upload_preflight import verificar_imagem, verificar_imagens
+
+
+def gerar_imagem(caminho, tamanho=(2400, 1800), formato="JPEG", modo="RGB", **opcoes):
+    img = Image.new(modo, tamanho, "white")
+    desenho = ImageDraw.Draw(img)
+    for i in range(0, tamanho[0], 97):
+        desenho.ellipse((i, i % tamanho[1], i + 300, i % tamanho[1] + 200), fill="black" if modo != "RGBA" else (0, 0, 0, 128))
+    img.save(caminho, formato, **opcoes)
+    return str(caminho)
+
+
+@pytest.fixture(params=["jpeg_grande", "jpeg_rotacionado", "png_transparente", "jpeg_pequeno"])
+def foto(request, tmp_path):
+    if request.param == "jpeg_grande":
+        return gerar_imagem(tmp_path / "grande.jpg", quality=95)
+    if request.param == "jpeg_rotacionado":
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: girar 90°
+        return gerar_imagem(tmp_path / "rotacionado.jpg", exif=exif)
+    if request.param == "png_transparente":
+        return gerar_imagem(tmp_path / "transparente.png", (900, 700), "PNG", "RGBA")
+    return gerar_imagem(tmp_path / "pequeno.jpg", (320, 240))
+
+
+def test_normalizacao_idempotente(foto):
+    normalizada = normalizar_imagem(foto)
+    assert normalizar_imagem(normalizada) == normalizada
+    assert normalizar_imagem(normalizar_imagem(normalizada)) == normalizada
+
+
+def test_mesmo_resultado_para_caminho_bytes_e_arquivo(foto):
+    with open(foto, "rb") as f:
+        dados = f.read()
+    with open(foto, "rb") as f:
+        de_arquivo = normalizar_imagem(f)
+    assert normalizar_imagem(foto) == normalizar_imagem(dados) == de_arquivo
+    with pytest.raises(ImagemInvalida):
+        normalizar_imagem(b"nao e imagem")
+
+
+def test_arquivo_aberto_ja_normalizado_e_relido_inteiro(foto):
+    normalizada = normalizar_imagem(foto)
+    assert normalizar_imagem(io.BytesIO(normalizada)) == normalizada
+
+
+def test_outros_parametros_renormalizam(tmp_path):
+    normalizada = normalizar_imagem(gerar_imagem(tmp_path / "a.jpg"))
+    menor = normalizar_imagem(normalizada, lado_maximo=800)
+    assert max(Image.open(io.BytesIO(menor)).size) == 800
+    assert normalizar_imagem(menor, lado_maximo=800) == menor
+
+
+def test_normalizada_truncada_e_recusada(tmp_path):
+    normalizada = normalizar_imagem(gerar_imagem(tmp_path / "a.jpg"))
+    with pytest.raises(ImagemInvalida):
+        normalizar_imagem(normalizada[: len(normalizada) // 2])
+
+
+def test_hash_igual_com_e_sem_staging(foto, tmp_path):
+    servidor = hash_conteudo(normalizar_imagem(foto))  # cadastro sem staging
+
+    sem_staging = verificar_imagem(foto, calcular_hash=True)
+    staging = verificar_imagem(foto, str(tmp_path / "staging" / "foto.jpg"), calcular_hash=True)
+    assert sem_staging["ok"] and staging["ok"]
+    assert sem_staging["hash"] == staging["hash"] == servidor
+
+    # O servidor normaliza de novo o arquivo enviado da pasta de staging
+    with open(staging["caminho"], "rb") as f:
+        assert hash_conteudo(normalizar_imagem(f.read())) == servidor
+
+
+def test_preflight_rejeita_sem_derrubar_o_lote(tmp_path):
+    boa = gerar_imagem(tmp_path / "boa.jpg", (400, 300))
+    pequena = gerar_imagem(tmp_path / "pequena.jpg", (50, 50))
+    (tmp_path / "texto.jpg").write_text("hello")
+    truncada = tmp_path / "truncada.jpg"
+    truncada.write_bytes(open(boa, "rb").read()[:600])
+    tarefas = [(boa, None), (pequena, None), (str(tmp_path / "texto.jpg"), None),
+               (str(truncada), None), (str(tmp_path / "nao_existe.jpg"), None)]
+
+    resultados = list(verificar_imagens(tarefas, calcular_hash=True, workers=2))
+    assert [r["ok"] for r in resultados] == [True, False, False, False, False]
+    assert resultados[0]["hash"] == hash_conteudo(normalizar_imagem(boa))
+    assert "pequena demais" in resultados[1]["motivo"]
+    assert resultados[4]["motivo"] == "Imagem não encontrada"
+
+
+def test_backfill_usa_o_mesmo_hash_do_cadastro(tmp_path):
+    faces = tmp_path / "clients" / "loja" / "faces"
+    faces.mkdir(parents=True)
+    original = gerar_imagem(faces / "ana.jpg", quality=95)
+    backend = JsonMetadataBackend(str(tmp_path / "clients"))
+    backend.salvar("loja", {"ana": {"name": "Ana", "image": "ana.jpg"}})
+
+    assert preencher_hashes_imagens(backend, str(tmp_path / "clients")) == {"loja": 1}
+    normalizada = normalizar_imagem(original)
+    pessoa = backend.obter("loja", "ana")
+    assert pessoa["image_hash"] == hash_conteudo(normalizada)
+    assert pessoa["image_dhash"] == hash_perceptual(normalizada)
+    assert backend.ids_com_imagem("loja", hash_conteudo(normalizar_imagem(original))) == {"ana"}
+
+
+def test_thumbnails_concorrentes_nao_disputam_o_temporario(tmp_path):
+    origem = gerar_imagem(tmp_path / "foto.jpg", (640, 480))
+    destino = str(tmp_path / "thumbs" / "foto_96.jpg")
+    erros = []
+
+    def gerar():
+        try:
+            gerar_thumbnail(origem, destino, 96)
+        except Exception as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=gerar) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert erros == []
+    assert os.listdir(tmp_path / "thumbs") == ["foto_96.jpg"]
+    with Image.open(destino) as thumb:
+        assert thumb.size == (96, 96)
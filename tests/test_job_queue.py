@@ -0,0 +1,126 @@
+import json
+import os
+
+from conftest import aguardar_job, imagem_base64
+from job_queue import FilaJobs
+
+
+def test_job_executa_e_grava_resultado(tmp_path):
+    fila = FilaJobs(str(tmp_path))
+    job = fila.enfileirar(fila.criar("soma", {"a": 1, "b": 2}), lambda dados: dados["a"] + dados["b"])
+    final = aguardar_fila(fila, job["job_id"])
+    assert (final["status"], final["result"], final["error"]) == ("succeeded", 3, None)
+
+
+def test_falha_guarda_mensagem_e_detalhes(tmp_path):
+    class Conflito(Exception):
+        detalhes = {"status": 409}
+
+    def tarefa(dados):
+        raise Conflito("Email já cadastrado")
+
+    fila = FilaJobs(str(tmp_path))
+    job = fila.enfileirar(fila.criar("x", {}), tarefa)
+    final = aguardar_fila(fila, job["job_id"])
+    assert (final["status"], final["error"], final["error_details"]) == ("failed", "Email já cadastrado", {"status": 409})
+
+
+def test_id_invalido_nao_le_arquivos(tmp_path):
+    fila = FilaJobs(str(tmp_path))
+    assert fila.obter("../../etc/passwd") is None
+    assert fila.obter("0" * 32) is None
+
+
+def job_orfao(fila, status, pid=2 ** 22 + 12345):
+    job = fila.criar("enroll", {"n": status})
+    fila.atualizar(job, status=status, pid=pid)  # processo dono inexistente
+    return job
+
+
+def test_recuperacao_retoma_fila_e_falha_interrompidos(tmp_path):
+    fila = FilaJobs(str(tmp_path))
+    na_fila = job_orfao(fila, "queued")
+    interrompido = job_orfao(fila, "running")
+    vivo = fila.criar("enroll", {})  # pid deste processo: não é tocado
+    descartados = []
+
+    fila.recuperar({"enroll": lambda dados: "ok"}, ao_falhar=descartados.append)
+
+    assert aguardar_fila(fila, na_fila["job_id"])["result"] == "ok"
+    falhou = fila.obter(interrompido["job_id"])
+    assert falhou["status"] == "failed" and "interrompido" in falhou["error"]
+    assert [j["job_id"] for j in descartados] == [interrompido["job_id"]]
+    assert fila.obter(vivo["job_id"])["status"] == "queued"
+
+
+def test_recuperacao_apaga_finalizados_antigos(tmp_path):
+    fila = FilaJobs(str(tmp_path))
+    antigo = fila.atualizar(fila.criar("enroll", {}), status="succeeded")
+    recente = fila.atualizar(fila.criar("enroll", {}), status="failed")
+    caminho = os.path.join(str(tmp_path), f"{antigo['job_id']}.json")
+    os.utime(caminho, (0, 0))
+    (tmp_path / "lixo.json").write_text("{")  # arquivo corrompido é ignorado
+
+    fila.recuperar({})
+    assert fila.obter(antigo["job_id"]) is None
+    assert fila.obter(recente["job_id"])["status"] == "failed"
+
+
+def aguardar_fila(fila, job_id):
+    class Modulo:
+        fila_jobs = fila
+    return aguardar_job(Modulo, job_id)
+
+
+# =====================
+# Cadastro assíncrono (POST /api/<cliente>/persons?async=1)
+# =====================
+
+def cadastrar_assincrono(cliente, email, semente, **extra):
+    return cliente.post("/api/carrefour/persons?async=1", json={
+        "name": "Ana", "email": email, "phone": "11 9999-0000", "image_base64": imagem_base64(semente), **extra})
+
+
+def test_cadastro_assincrono_conclui(app_teste):
+    modulo, cliente, compreface = app_teste
+    resposta = cadastrar_assincrono(cliente, "ana@x.com", 1)
+    assert resposta.status_code == 202
+    job = aguardar_job(modulo, resposta.json["job_id"])
+    assert job["status"] == "succeeded"
+    assert modulo.metadata_backend.obter("carrefour", resposta.json["subject_id"])["email"] == "ana@x.com"
+    assert cliente.get(resposta.json["status_url"]).json["status"] == "succeeded"
+
+
+def test_jobs_concorrentes_com_mesmo_email_gravam_um_so(app_teste):
+    modulo, cliente, compreface = app_teste
+    compreface.latencia = 0.2  # os dois jobs ficam pendentes ao mesmo tempo
+    respostas = [cadastrar_assincrono(cliente, "ana@x.com", 1), cadastrar_assincrono(cliente, "ANA@x.com", 2)]
+    assert [r.status_code for r in respostas] == [202, 202]
+
+    jobs = [aguardar_job(modulo, r.json["job_id"]) for r in respostas]
+    assert sorted(j["status"] for j in jobs) == ["failed", "succeeded"]
+    falhou = next(j for j in jobs if j["status"] == "failed")
+    assert falhou["error_details"]["status"] == 409
+    assert falhou["error_details"]["duplicate_email_of"]
+
+    assert modulo.metadata_backend.contar("carrefour") == 1
+    assert len(compreface.faces) == 1  # a face do perdedor foi removida do CompreFace
+    assert len(os.listdir(modulo.get_faces_folder("carrefour"))) == 2  # imagem do vencedor + pasta thumbs
+
+
+def test_jobs_concorrentes_com_mesma_imagem_gravam_um_so(app_teste):
+    modulo, cliente, compreface = app_teste
+    compreface.latencia = 0.2
+    respostas = [cadastrar_assincrono(cliente, "a@x.com", 5), cadastrar_assincrono(cliente, "b@x.com", 5)]
+    jobs = [aguardar_job(modulo, r.json["job_id"]) for r in respostas]
+    assert sorted(j["status"] for j in jobs) == ["failed", "succeeded"]
+    assert modulo.metadata_backend.contar("carrefour") == 1
+
+
+def test_allow_duplicate_grava_os_dois(app_teste):
+    modulo, cliente, compreface = app_teste
+    compreface.latencia = 0.1
+    respostas = [cadastrar_assincrono(cliente, "ana@x.com", 1, allow_duplicate=True),
+                 cadastrar_assincrono(cliente, "ana@x.com", 2, allow_duplicate=True)]
+    assert all(aguardar_job(modulo, r.json["job_id"])["status"] == "succeeded" for r in respostas)
+    assert modulo.metadata_backend.contar("carrefour") == 2
@@ -0,0 +1,100 @@
+import json
+import time
+
+import metadata_store
+from metadata_store import JOURNAL_FILENAME, METADATA_FILENAME, JsonMetadataBackend
+
+
+def arquivos(tmp_path, cliente="loja"):
+    pasta = tmp_path / "clients" / cliente
+    return pasta / METADATA_FILENAME, pasta / JOURNAL_FILENAME
+
+
+def test_escritas_vao_para_o_journal_e_sobrevivem_a_releitura(tmp_path):
+    backend = JsonMetadataBackend(str(tmp_path / "clients"))
+    backend.gravar("loja", "a", {"name": "Ana"})
+    backend.gravar("loja", "b", {"name": "Bruno"})
+    backend.atualizar("loja", "a", {"email": "ana@x.com"})
+    backend.remover("loja", "b")
+
+    snapshot, journal = arquivos(tmp_path)
+    assert json.loads(snapshot.read_text()) == {}
+    assert len(journal.read_bytes().splitlines()) == 4
+    assert JsonMetadataBackend(str(tmp_path / "clients")).carregar("loja") == {"a": {"name": "Ana", "email": "ana@x.com"}}
+
+
+def test_compactar_incorpora_o_journal_no_snapshot(tmp_path):
+    backend = JsonMetadataBackend(str(tmp_path / "clients"))
+    backend.gravar_varios("loja", {"a": {"name": "Ana"}, "b": {"name": "Bruno"}})
+    backend.remover("loja", "b")
+    backend.compactar("loja")
+
+    snapshot, journal = arquivos(tmp_path)
+    assert json.loads(snapshot.read_text()) == {"a": {"name": "Ana"}}
+    assert journal.read_bytes() == b""
+    backend.gravar("loja", "c", {"name": "Carla"})
+    assert set(JsonMetadataBackend(str(tmp_path / "clients")).carregar("loja")) == {"a", "c"}
+
+
+def test_escrita_durante_a_compactacao_nao_se_perde(tmp_path, monkeypatch):
+    backend = JsonMetadataBackend(str(tmp_path / "clients"))
+    backend.gravar("loja", "a", {"name": "Ana"})
+    serializar = metadata_store._escrever_json_temporario
+
+    def serializar_com_escrita_concorrente(destino, dados):
+        temporario = serializar(destino, dados)
+        backend.gravar("loja", "b", {"name": "Bruno"})  # chega enquanto o snapshot é gravado
+        return temporario
+
+    monkeypatch.setattr(metadata_store, "_escrever_json_temporario", serializar_com_escrita_concorrente)
+    backend.compactar("loja")
+
+    snapshot, journal = arquivos(tmp_path)
+    assert json.loads(snapshot.read_text()) == {"a": {"name": "Ana"}}
+    assert len(journal.read_bytes().splitlines()) == 1
+    assert set(backend.carregar("loja")) == {"a", "b"}
+    assert set(JsonMetadataBackend(str(tmp_path / "clients")).carregar("loja")) == {"a", "b"}
+
+
+def test_outro_processo_ve_escritas_e_compactacao(tmp_path):
+    pasta = str(tmp_path / "clients")
+    leitor, escritor = JsonMetadataBackend(pasta), JsonMetadataBackend(pasta)
+    escritor.gravar("loja", "a", {"name": "Ana"})
+    assert leitor.obter("loja", "a") == {"name": "Ana"}
+
+    escritor.compactar("loja")
+    escritor.gravar("loja", "b", {"name": "Bruno"})
+    assert set(leitor.carregar("loja")) == {"a", "b"}
+
+    leitor.remover("loja", "a")
+    assert escritor.obter("loja", "a") is None
+
+
+def test_linha_incompleta_do_journal_espera_o_restante(tmp_path):
+    pasta = str(tmp_path / "clients")
+    backend = JsonMetadataBackend(pasta)
+    backend.gravar("loja", "a", {"name": "Ana"})
+    _, journal = arquivos(tmp_path)
+    linha = json.dumps({"op": "set", "id": "b", "pessoa": {"name": "Bruno"}}).encode() + b"\n"
+
+    with open(journal, "ab") as f:
+        f.write(linha[:10])  # escrita de outro processo ainda em andamento
+    assert backend.obter("loja", "b") is None
+    with open(journal, "ab") as f:
+        f.write(linha[10:])
+    assert backend.obter("loja", "b") == {"name": "Bruno"}
+
+
+def test_journal_grande_compacta_em_segundo_plano(tmp_path, monkeypatch):
+    monkeypatch.setattr(JsonMetadataBackend, "JOURNAL_MAX_BYTES", 200)
+    backend = JsonMetadataBackend(str(tmp_path / "clients"))
+    for i in range(10):
+        backend.gravar("loja", f"p{i}", {"name": f"Pessoa {i}"})
+
+    snapshot, _ = arquivos(tmp_path)
+    fim = time.monotonic() + 5
+    while time.monotonic() < fim and len(json.loads(snapshot.read_text())) < 5:
+        time.sleep(0.02)
+    assert len(json.loads(snapshot.read_text())) >= 5
+    assert backend.contar("loja") == 10
+    assert JsonMetadataBackend(str(tmp_path / "clients")).contar("loja") == 10
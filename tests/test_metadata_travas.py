@@ -0,0 +1,64 @@
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from metadata_store import LOCK_FILENAME, JsonMetadataBackend, trava_entre_processos
+
+fcntl = pytest.importorskip("fcntl")
+
+
+def gravar_em_outro_processo(pasta, processo, quantidade):
+    backend = JsonMetadataBackend(pasta)
+    for i in range(quantidade):
+        backend.gravar("loja", f"p{processo}-{i}", {"name": f"Pessoa {processo}-{i}"})
+
+
+def test_processos_concorrentes_nao_perdem_escritas(tmp_path):
+    pasta = str(tmp_path / "clients")
+    JsonMetadataBackend(pasta).salvar("loja", {})
+    contexto = multiprocessing.get_context("fork")
+    processos = [contexto.Process(target=gravar_em_outro_processo, args=(pasta, n, 40)) for n in range(4)]
+    for processo in processos:
+        processo.start()
+    for processo in processos:
+        processo.join(30)
+        assert processo.exitcode == 0
+
+    backend = JsonMetadataBackend(pasta)
+    assert backend.contar("loja") == 160
+    backend.compactar("loja")
+    assert len(JsonMetadataBackend(pasta).carregar("loja")) == 160
+
+
+def test_espera_pela_trava_de_um_cliente_nao_bloqueia_os_outros(tmp_path):
+    backend = JsonMetadataBackend(str(tmp_path / "clients"))
+    for cliente in ("a", "b"):
+        backend.salvar(cliente, {"x": {"name": "X"}})
+
+    liberar = threading.Event()
+    travado = threading.Event()
+
+    def outro_processo_segura_a():
+        with trava_entre_processos(os.path.join(backend.clients_folder, "a", LOCK_FILENAME)):
+            travado.set()
+            liberar.wait(10)
+
+    dono = threading.Thread(target=outro_processo_segura_a)
+    dono.start()
+    travado.wait(5)
+    esperando = threading.Thread(target=backend.gravar, args=("a", "y", {"name": "Y"}))
+    esperando.start()
+
+    outro = threading.Thread(target=lambda: (backend.gravar("b", "y", {"name": "Y"}), backend.obter("a", "x")))
+    outro.start()
+    outro.join(2)
+    bloqueado = outro.is_alive()
+    liberar.set()
+    for thread in (dono, esperando, outro):
+        thread.join(5)
+
+    assert not bloqueado
+    assert backend.obter("a", "y") == {"name": "Y"}
+    assert backend.obter("b", "y") == {"name": "Y"}
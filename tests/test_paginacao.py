@@ -0,0 +1,99 @@
+import pytest
+
+from metadata_store import JsonMetadataBackend, SqliteMetadataBackend
+
+PESSOAS = {
+    f"id{i:02d}": {
+        "name": ("Ana " if i % 3 == 0 else "Bruno ") + str(i),
+        "email": f"p{i}@{'loja' if i % 2 else 'outra'}.com",
+        "created_at": f"2026-01-{i + 1:02d}T10:00:00+00:00",
+    }
+    for i in range(25)
+}
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "json":
+        backend = JsonMetadataBackend(str(tmp_path / "clients"))
+    else:
+        backend = SqliteMetadataBackend(clients_folder=str(tmp_path / "clients"))
+    backend.salvar("loja", {sid: dict(p) for sid, p in PESSOAS.items()})
+    return backend
+
+
+def test_listar_pagina_por_subject_id(backend):
+    primeira = backend.listar("loja", limite=10)
+    assert [sid for sid, _ in primeira] == sorted(PESSOAS)[:10]
+    segunda = backend.listar("loja", limite=10, apos=primeira[-1][0])
+    assert [sid for sid, _ in segunda] == sorted(PESSOAS)[10:20]
+    assert backend.listar("loja", apos="id24") == []
+
+
+@pytest.mark.parametrize("filtros, esperado", [
+    ({"name_prefix": "ana"}, {sid for sid, p in PESSOAS.items() if p["name"].startswith("Ana")}),
+    ({"email_prefix": "P1"}, {"id01", "id10", "id11", "id12", "id13", "id14", "id15", "id16", "id17", "id18", "id19"}),
+    ({"created_after": "2026-01-20T10:00:00+00:00"}, {"id20", "id21", "id22", "id23", "id24"}),
+    ({"name_prefix": "bruno", "created_after": "2026-01-20T10:00:00+00:00"}, {"id20", "id22", "id23"}),
+])
+def test_filtros_iguais_nos_dois_backends(backend, filtros, esperado):
+    assert {sid for sid, _ in backend.listar("loja", filtros=filtros)} == esperado
+
+
+def test_cursor_continua_depois_de_exclusao_e_insercao(backend):
+    primeira = backend.listar("loja", limite=5)
+    backend.remover("loja", "id05")
+    backend.gravar("loja", "id00a", {"name": "Antes do cursor"})
+    backend.gravar("loja", "id06a", {"name": "Depois do cursor"})
+    segunda = backend.listar("loja", limite=3, apos=primeira[-1][0])
+    assert [sid for sid, _ in segunda] == ["id06", "id06a", "id07"]
+
+
+# =====================
+# GET /api/<cliente>/persons
+# =====================
+
+@pytest.fixture
+def api(app_teste):
+    modulo, cliente, _ = app_teste
+    modulo.metadata_backend.salvar("carrefour", {sid: dict(p) for sid, p in PESSOAS.items()})
+    return cliente
+
+
+def test_sem_parametros_retorna_todas(api):
+    resposta = api.get("/api/carrefour/persons")
+    assert resposta.json["total"] == 25
+    assert set(resposta.json["persons"]) == set(PESSOAS)
+    assert "next_cursor" not in resposta.json
+
+
+def test_percorre_todas_as_paginas_pelo_cursor(api):
+    vistos, cursor = [], None
+    while True:
+        resposta = api.get("/api/carrefour/persons", query_string={"limit": 7, **({"cursor": cursor} if cursor else {})})
+        assert resposta.status_code == 200
+        assert resposta.json["total"] == 25
+        vistos.extend(resposta.json["persons"])
+        cursor = resposta.json["next_cursor"]
+        if cursor is None:
+            break
+    assert vistos == sorted(PESSOAS)
+
+
+def test_pagina_exata_nao_tem_proximo_cursor(api):
+    resposta = api.get("/api/carrefour/persons?limit=25")
+    assert resposta.json["count"] == 25
+    assert resposta.json["next_cursor"] is None
+
+
+def test_fields_e_filtros(api):
+    resposta = api.get("/api/carrefour/persons?fields=name,inexistente&name_prefix=ana&created_after=2026-01-10T10:00:00Z")
+    assert resposta.json["persons"] == {
+        sid: {"name": p["name"]} for sid, p in PESSOAS.items()
+        if p["name"].startswith("Ana") and p["created_at"] > "2026-01-10T10:00:00+00:00"
+    }
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=abc", "limit=100000", "cursor=%%%", "created_after=ontem"])
+def test_parametros_invalidos(api, query):
+    assert api.get(f"/api/carrefour/persons?{query}").status_code == 400
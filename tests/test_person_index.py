@@ -0,0 +1,78 @@
+import pytest
+
+from metadata_store import JsonMetadataBackend, SqliteMetadataBackend
+from person_index import IndicePessoas, prefixo_telefone
+
+PESSOAS = {
+    "ana": {"name": "Ana Souza", "email": "ana@ex.com", "phone": "+55 (11) 91234-0000"},
+    "bruno": {"name": "Bruno Lima", "email": "bruno@ex.com", "phone": "2024 5555"},
+    "joao": {"name": "João Silva", "email": "joao.55@ex.com", "phone": "+55 21 98888-7777"},
+    "carla": {"name": "Carla Dias", "email": "carla@ex.com", "phone": ""},
+}
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "json":
+        backend = JsonMetadataBackend(str(tmp_path / "clients"))
+    else:
+        backend = SqliteMetadataBackend(clients_folder=str(tmp_path / "clients"))
+    backend.salvar("loja", {sid: dict(pessoa) for sid, pessoa in PESSOAS.items()})
+    return backend
+
+
+@pytest.mark.parametrize("termo, esperado", [
+    ("(11) 9", "119"),
+    ("+55 21", "5521"),
+    ("2024-", "2024"),
+    ("ana2024", ""),
+    ("joao.55@", ""),
+    ("55abc", ""),
+    ("", ""),
+])
+def test_prefixo_telefone_so_para_termos_com_cara_de_telefone(termo, esperado):
+    assert prefixo_telefone(termo) == esperado
+
+
+@pytest.mark.parametrize("termo, esperado", [
+    ("ana", {"ana"}),
+    ("SOUZA", {"ana"}),
+    ("silva", {"joao"}),
+    ("joao.55@", {"joao"}),
+    ("bruno@", {"bruno"}),
+    ("+55", {"ana", "joao"}),
+    ("(21) 98", set()),
+    ("55 21", {"joao"}),
+    ("2024", {"bruno"}),
+    ("ana2024", set()),
+    ("xyz", set()),
+])
+def test_busca_por_prefixo_igual_nos_dois_backends(backend, termo, esperado):
+    assert {sid for sid, _ in backend.buscar("loja", termo)} == esperado
+
+
+def test_busca_respeita_limite(backend):
+    assert len(backend.buscar("loja", "+55", limite=1)) == 1
+
+
+def test_indice_atualiza_em_edicao_e_remocao():
+    indice = IndicePessoas.construir({"ana": PESSOAS["ana"]})
+    indice.adicionar("ana", {**PESSOAS["ana"], "name": "Ana Beatriz", "email": "bia@ex.com"})
+    assert indice.buscar("souza") == []
+    assert indice.buscar("beatriz") == ["ana"]
+    assert indice.ids_com_email("ana@ex.com") == set()
+    assert indice.ids_com_email("BIA@ex.com") == {"ana"}
+
+    indice.remover("ana")
+    assert indice.buscar("ana") == []
+    assert indice.ids_com_telefone("5511912340000") == set()
+
+
+def test_imagem_parecida_pela_distancia_de_hamming():
+    indice = IndicePessoas.construir({
+        "a": {"name": "A", "image_hash": "h1", "image_dhash": "ff00"},
+        "b": {"name": "B", "image_hash": "h2", "image_dhash": "0f0f"},
+    })
+    assert indice.ids_com_imagem("h1") == {"a"}
+    assert indice.ids_com_imagem_parecida("ff01", 1) == {"a"}
+    assert indice.ids_com_imagem_parecida("ff01", 0) == set()
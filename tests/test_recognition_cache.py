@@ -0,0 +1,99 @@
+import base64
+
+import pytest
+
+from conftest import imagem_base64
+from recognition_cache import CacheReconhecimento, subjects_do_resultado
+
+
+def resultado(*subjects):
+    return {"result": [{"subjects": [{"subject": s, "similarity": 0.99} for s in subjects]}]}
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr("recognition_cache.time.monotonic", lambda: agora[0])
+    return agora
+
+
+def test_subjects_do_resultado():
+    assert subjects_do_resultado(resultado("loja_a", "loja_b")) == {"loja_a", "loja_b"}
+    assert subjects_do_resultado({}) == set()
+
+
+def test_hit_miss_e_expiracao(relogio):
+    cache = CacheReconhecimento(max_itens=10, ttl=60)
+    assert cache.obter("loja", "h1") is None
+    cache.guardar("loja", "h1", resultado("loja_a"), cache.geracao("loja"))
+    assert cache.obter("loja", "h1") == resultado("loja_a")
+    assert cache.obter("outra", "h1") is None  # a chave inclui o cliente
+
+    relogio[0] += 61
+    assert cache.obter("loja", "h1") is None
+    estatisticas = cache.estatisticas()
+    assert (estatisticas["hits"], estatisticas["misses"], estatisticas["size"]) == (1, 3, 0)
+
+
+def test_lru_descarta_o_menos_usado(relogio):
+    cache = CacheReconhecimento(max_itens=2, ttl=60)
+    for image_hash in ("h1", "h2"):
+        cache.guardar("loja", image_hash, resultado(), 0)
+    cache.obter("loja", "h1")
+    cache.guardar("loja", "h3", resultado(), 0)
+    assert cache.obter("loja", "h2") is None
+    assert cache.obter("loja", "h1") is not None
+    assert cache.estatisticas()["evictions"] == 1
+
+
+def test_tamanho_zero_desliga_o_cache():
+    cache = CacheReconhecimento(max_itens=0)
+    cache.guardar("loja", "h1", resultado(), 0)
+    assert cache.obter("loja", "h1") is None
+
+
+def test_invalidar_subject_remove_so_as_entradas_que_o_citam():
+    cache = CacheReconhecimento()
+    cache.guardar("loja", "h1", resultado("loja_a"), 0)
+    cache.guardar("loja", "h2", resultado("loja_b"), 0)
+    cache.invalidar_subject("loja", "loja_a")
+    assert cache.obter("loja", "h1") is None
+    assert cache.obter("loja", "h2") is not None
+
+
+def test_invalidar_cliente_remove_todas_as_entradas_do_cliente():
+    cache = CacheReconhecimento()
+    cache.guardar("loja", "h1", resultado(), 0)
+    cache.guardar("outra", "h1", resultado(), 0)
+    cache.invalidar_cliente("loja")
+    assert cache.obter("loja", "h1") is None
+    assert cache.obter("outra", "h1") is not None
+
+
+def test_resultado_obtido_antes_de_invalidacao_nao_e_guardado():
+    cache = CacheReconhecimento()
+    geracao = cache.geracao("loja")
+    cache.invalidar_subject("loja", "loja_a")  # exclusão durante a chamada ao CompreFace
+    cache.guardar("loja", "h1", resultado("loja_a"), geracao)
+    assert cache.obter("loja", "h1") is None
+
+
+def test_reconhecimento_durante_exclusao_nao_fica_em_cache(app_teste, monkeypatch):
+    modulo, cliente, compreface = app_teste
+    subject_id = cliente.post("/api/carrefour/persons", json={
+        "name": "Ana", "email": "ana@x.com", "phone": "", "image_base64": imagem_base64(1)}).json["subject_id"]
+    image_data = modulo.normalizar_imagem(base64.b64decode(imagem_base64(1)))
+    excluir = compreface.deletar
+
+    def deletar(api_subject_id):
+        # Outra requisição reconhece a foto enquanto o CompreFace ainda tem a face
+        durante, em_cache = modulo.consultar_compreface("carrefour", image_data)
+        assert api_subject_id in subjects_do_resultado(durante) and not em_cache
+        return excluir(api_subject_id)
+
+    monkeypatch.setattr(modulo, "deletar_face", deletar)
+    assert cliente.delete(f"/api/carrefour/persons/{subject_id}").status_code == 200
+
+    depois, em_cache = modulo.consultar_compreface("carrefour", image_data)
+    assert not em_cache
+    assert subjects_do_resultado(depois) == set()
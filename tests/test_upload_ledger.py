@@ -0,0 +1,161 @@
+import sqlite3
+
+import pytest
+
+from bulk_upload import BulkUploader
+from upload_ledger import LedgerUpload, chave_pessoa
+
+
+def pessoa(n):
+    return {"image_file": f"p{n}.jpg", "name": f"Pessoa {n}", "email": f"P{n}@Exemplo.com", "phone": "1"}
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = LedgerUpload(str(tmp_path / "lote.ledger.db"))
+    yield ledger
+    ledger.close()
+
+
+@pytest.fixture
+def novo_uploader(tmp_path, monkeypatch):
+    """BulkUploader sem rede sobre um ledger em tmp_path (erros_upload.txt também fica lá)"""
+    monkeypatch.chdir(tmp_path)
+    criados = []
+
+    def criar(pessoas=(), **opcoes):
+        uploader = BulkUploader("lote.json", client="carrefour", dedup=False, **opcoes)
+        uploader.config = {"persons": list(pessoas)}
+        assert uploader.abrir_ledger()
+        criados.append(uploader)
+        return uploader
+
+    yield criar
+    for uploader in criados:
+        uploader.ledger.close()
+
+
+def preencher(ledger):
+    """Um registro em cada estado: p1 success, p2 error, p3 sending, p4 duplicate, p5 error 409"""
+    for n in (1, 2, 3, 5):
+        ledger.iniciar(chave_pessoa(pessoa(n)), pessoa(n))
+    ledger.concluir(chave_pessoa(pessoa(1)), "sid-1")
+    ledger.falhar(chave_pessoa(pessoa(2)), "Nenhuma face detectada", 422)
+    ledger.marcar_duplicada(chave_pessoa(pessoa(4)), pessoa(4), "sid-9", "Mesma imagem de p9")
+    ledger.falhar(chave_pessoa(pessoa(5)), "Email já cadastrado para este cliente", 409)
+
+
+def test_chave_normaliza_email():
+    assert chave_pessoa({"email": "  Ana@Exemplo.COM "}) == "ana@exemplo.com"
+    assert chave_pessoa({"image_file": "a.jpg"}) == "image:a.jpg"
+
+
+def test_estados_e_resumo(ledger):
+    preencher(ledger)
+    assert ledger.resumo() == {"sending": 1, "success": 1, "error": 2, "duplicate": 1}
+    assert ledger.estado("p1@exemplo.com")["subject_id"] == "sid-1"
+    assert ledger.estado("p4@exemplo.com")["http_status"] == 409
+
+    ledger.iniciar("p2@exemplo.com", pessoa(2))
+    registro = ledger.estado("p2@exemplo.com")
+    assert (registro["status"], registro["attempts"], registro["error"]) == ("sending", 2, None)
+
+    ledger.limpar()
+    assert sum(ledger.resumo().values()) == 0
+
+
+def test_ledger_sobrevive_a_reabertura(tmp_path):
+    caminho = str(tmp_path / "lote.ledger.db")
+    ledger = LedgerUpload(caminho)
+    ledger.definir_cliente("carrefour")
+    preencher(ledger)
+    ledger.close()
+
+    ledger = LedgerUpload(caminho)
+    assert ledger.cliente() == "carrefour"
+    assert ledger.resumo()["success"] == 1
+    ledger.close()
+
+
+def test_ledger_preenchido_exige_opcao(novo_uploader):
+    uploader = novo_uploader()
+    preencher(uploader.ledger)
+    uploader.ledger.close()
+
+    bloqueado = BulkUploader("lote.json", client="carrefour")
+    assert bloqueado.abrir_ledger() is False
+    bloqueado.ledger.close()
+    for opcao in ("resume", "retry_failed", "restart"):
+        permitido = BulkUploader("lote.json", client="carrefour", **{opcao: True})
+        assert permitido.abrir_ledger() is True
+        permitido.ledger.close()
+
+
+def test_ledger_de_outro_cliente_e_recusado(novo_uploader):
+    uploader = novo_uploader()
+    uploader.ledger.definir_cliente("buybye")
+    outro = BulkUploader("lote.json", client="carrefour", resume=True)
+    assert outro.abrir_ledger() is False
+    outro.ledger.close()
+
+
+@pytest.mark.parametrize("opcoes, esperado", [
+    # p1 success, p2 error, p3 sending, p4 duplicate, p5 error 409, p6 nunca processada
+    ({"resume": True}, {1: (False, False), 2: (False, False), 3: (True, True), 4: (False, False),
+                        5: (False, False), 6: (True, False)}),
+    ({"retry_failed": True}, {1: (False, False), 2: (True, False), 3: (True, True), 4: (False, False),
+                              5: (False, False), 6: (False, False)}),
+    ({"resume": True, "retry_failed": True}, {1: (False, False), 2: (True, False), 3: (True, True),
+                                              4: (False, False), 5: (False, False), 6: (True, False)}),
+])
+def test_deve_processar(novo_uploader, opcoes, esperado):
+    uploader = novo_uploader(**opcoes)
+    preencher(uploader.ledger)
+    assert {n: uploader.deve_processar(pessoa(n)) for n in esperado} == esperado
+
+
+def test_email_ja_cadastrado_fica_como_duplicada(novo_uploader):
+    uploader = novo_uploader([pessoa(1), pessoa(2)])
+    respostas = {
+        "Pessoa 1": (True, ("sid-1", "Email já cadastrado (sid-1)"), 409),
+        "Pessoa 2": (False, "Nenhuma face detectada", 422),
+    }
+    uploader.upload_pessoa = lambda p, recuperar=False: respostas[p["name"]]
+    uploader.processar_upload()
+
+    assert uploader.stats["duplicates"] == 1 and uploader.stats["errors"] == 1
+    duplicada = uploader.ledger.estado("p1@exemplo.com")
+    assert (duplicada["status"], duplicada["subject_id"]) == ("duplicate", "sid-1")
+    assert uploader.ledger.estado("p2@exemplo.com")["status"] == "error"
+
+
+def test_recuperacao_registra_sucesso(novo_uploader):
+    uploader = novo_uploader([pessoa(3)], resume=True)
+    uploader.ledger.iniciar("p3@exemplo.com", pessoa(3))  # interrompida numa execução anterior
+    chamadas = []
+
+    def upload(p, recuperar=False):
+        chamadas.append(recuperar)
+        return True, "sid-3", 201
+
+    uploader.upload_pessoa = upload
+    uploader.processar_upload()
+    assert chamadas == [True]
+    assert uploader.ledger.estado("p3@exemplo.com")["status"] == "success"
+
+
+def test_excecao_no_worker_vira_erro_no_ledger(novo_uploader):
+    uploader = novo_uploader([pessoa(1), pessoa(2)], concurrency=2)
+
+    def upload(p, recuperar=False):
+        if p["name"] == "Pessoa 1":
+            raise sqlite3.OperationalError("database is locked")
+        return True, "sid-2", 201
+
+    uploader.upload_pessoa = upload
+    uploader.processar_upload()
+
+    assert uploader.stats == {"total": 2, "success": 1, "errors": 1, "skipped": 0, "duplicates": 0}
+    registro = uploader.ledger.estado("p1@exemplo.com")
+    assert registro["status"] == "error"
+    assert "database is locked" in registro["error"]
@@ -0,0 +1,119 @@
+"""
+📒 Face Manager - Registro de Upload em Lote
+Ledger SQLite com o resultado de cada pessoa enviada pelo bulk_upload.py.
+
+- Uma linha por pessoa (chave: email normalizado), gravada a cada resultado:
+  um Ctrl-C ou queda no meio do lote não perde o que já foi cadastrado
+- Estados: sending -> success | error; duplicate para imagens ou emails já
+  cadastrados (subject_id do cadastro existente) ou imagens repetidas no lote
+- "sending" que sobra de uma execução interrompida indica que o cadastro pode
+  ter sido aplicado sem resposta; o bulk_upload trata o 409 de email
+  duplicado nesse caso como sucesso, recuperando o subject_id existente
+"""
+
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+ESTADOS = ("sending", "success", "error", "duplicate")
+
+
+def _agora_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+def chave_pessoa(pessoa):
+    """Identificador estável da pessoa entre execuções (o servidor exige email único por cliente)"""
+    email = str(pessoa.get("email") or "").strip().lower()
+    return email or f"image:{pessoa.get('image_file', '')}"
+
+
+class LedgerUpload:
+    """Resultado por pessoa de um lote, compartilhado pelas threads de upload"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    chave TEXT PRIMARY KEY,
+                    name TEXT,
+                    image_file TEXT,
+                    status TEXT NOT NULL,
+                    subject_id TEXT,
+                    http_status INTEGER,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def close(self):
+        self._conn.close()
+
+    def cliente(self):
+        """Cliente do lote registrado (ou None para um ledger novo)"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'client'").fetchone()
+        return row["value"] if row else None
+
+    def definir_cliente(self, cliente):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('client', ?)", (cliente,))
+
+    def estado(self, chave):
+        """Registro da pessoa (dict) ou None se ainda não foi processada"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM entries WHERE chave = ?", (chave,)).fetchone()
+        return dict(row) if row else None
+
+    def iniciar(self, chave, pessoa):
+        """Marca a pessoa como em envio, antes da requisição"""
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO entries (chave, name, image_file, status, attempts, updated_at)
+                VALUES (?, ?, ?, 'sending', 1, ?)
+                ON CONFLICT(chave) DO UPDATE SET
+                    name = excluded.name, image_file = excluded.image_file, status = 'sending',
+                    error = NULL, http_status = NULL, attempts = attempts + 1, updated_at = excluded.updated_at
+            """, (chave, pessoa.get("name"), pessoa.get("image_file"), _agora_iso()))
+
+    def concluir(self, chave, subject_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE entries SET status = 'success', subject_id = ?, http_status = 201, error = NULL, "
+                "updated_at = ? WHERE chave = ?", (subject_id, _agora_iso(), chave))
+
+    def falhar(self, chave, erro, http_status=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE entries SET status = 'error', http_status = ?, error = ?, updated_at = ? WHERE chave = ?",
+                (http_status, str(erro), _agora_iso(), chave))
+
+    def marcar_duplicada(self, chave, pessoa, subject_id, referencia):
+        """Registra a pessoa como imagem repetida, sem envio ao servidor"""
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO entries (chave, name, image_file, status, subject_id, http_status, error, updated_at)
+                VALUES (?, ?, ?, 'duplicate', ?, 409, ?, ?)
+                ON CONFLICT(chave) DO UPDATE SET
+                    status = 'duplicate', subject_id = excluded.subject_id, http_status = 409,
+                    error = excluded.error, updated_at = excluded.updated_at
+            """, (chave, pessoa.get("name"), pessoa.get("image_file"), subject_id, referencia, _agora_iso()))
+
+    def resumo(self):
+        """Quantidade de pessoas por estado"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS total FROM entries GROUP BY status").fetchall()
+        return {**{estado: 0 for estado in ESTADOS}, **{row["status"]: row["total"] for row in rows}}
+
+    def limpar(self):
+        """Descarta o histórico (novo lote do zero)"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM meta")
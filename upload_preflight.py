@@ -0,0 +1,96 @@
+"""
+🛫 Face Manager - Pré-verificação do Upload em Lote
+Decodifica as imagens do lote localmente, em paralelo (um processo por núcleo),
+antes de qualquer requisição: imagens que o servidor ou o CompreFace recusariam
+são rejeitadas sem custar base64, requisição ao Face Manager e chamada externa.
+
+- Arquivo inexistente, grande demais, formato não suportado, ilegível/truncado,
+  pequeno demais ou com pixels demais (bomba de descompressão)
+- Opcional: grava a versão normalizada (JPEG reduzido, como no servidor) numa
+  pasta de staging, de onde o upload envia bem menos bytes
+- Opcional: calcula o hash usado na deduplicação (mesmo SHA-256 do servidor)
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from PIL import Image
+
+from image_pipeline import ImagemInvalida, hash_conteudo, normalizar_imagem
+
+# =====================
+# 🔧 CONFIGURAÇÕES
+# =====================
+
+# Mesmo limite de upload do servidor
+MAX_FILE_BYTES = int(os.environ.get("FACE_MANAGER_MAX_UPLOAD_BYTES", 20 * 1024 * 1024))
+MIN_SIDE = int(os.environ.get("FACE_MANAGER_PREFLIGHT_MIN_SIDE", 100))
+MAX_PIXELS = int(os.environ.get("FACE_MANAGER_PREFLIGHT_MAX_PIXELS", 50_000_000))
+# MPO: JPEG com várias imagens (comum em fotos de celular)
+FORMATOS_ACEITOS = {"JPEG", "MPO", "PNG", "WEBP", "GIF"}
+CHUNK_SIZE = 16
+
+
+def verificar_imagem(caminho, destino=None, calcular_hash=False):
+    """Valida uma imagem (executado nos processos do pool)
+
+    destino: grava ali a versão normalizada. Retorna dict com ok, motivo da
+    rejeição, formato, dimensões, bytes, caminho a enviar e hash (se pedido).
+    """
+    resultado = {"ok": False, "motivo": None, "caminho": caminho, "formato": None,
+                 "largura": None, "altura": None, "bytes": None, "hash": None}
+    try:
+        resultado["bytes"] = os.path.getsize(caminho)
+    except OSError:
+        resultado["motivo"] = "Imagem não encontrada"
+        return resultado
+    if resultado["bytes"] > MAX_FILE_BYTES:
+        resultado["motivo"] = f"Arquivo maior que {MAX_FILE_BYTES // (1024 * 1024)}MB"
+        return resultado
+
+    try:
+        with Image.open(caminho) as img:
+            largura, altura = img.size
+            resultado.update(formato=img.format, largura=largura, altura=altura)
+            if img.format not in FORMATOS_ACEITOS:
+                resultado["motivo"] = f"Formato não suportado: {img.format}"
+            elif largura * altura > MAX_PIXELS:
+                resultado["motivo"] = f"Imagem grande demais ({largura}x{altura})"
+            elif min(largura, altura) < MIN_SIDE:
+                resultado["motivo"] = f"Imagem pequena demais ({largura}x{altura}, mínimo {MIN_SIDE}px)"
+            else:
+                img.load()  # decodifica de verdade: pega arquivos truncados
+    except Exception as e:
+        resultado["motivo"] = f"Imagem ilegível: {e}"
+    if resultado["motivo"]:
+        return resultado
+
+    if destino or calcular_hash:
+        try:
+            dados = normalizar_imagem(caminho)
+        except ImagemInvalida as e:
+            resultado["motivo"] = str(e)
+            return resultado
+        if destino:
+            os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+            temporario = f"{destino}.{os.getpid()}.tmp"
+            with open(temporario, "wb") as f:
+                f.write(dados)
+            os.replace(temporario, destino)
+            resultado["caminho"] = destino
+        if calcular_hash:
+            # Igual com ou sem staging: o servidor não recodifica a versão já normalizada
+            resultado["hash"] = hash_conteudo(dados)
+
+    resultado["ok"] = True
+    return resultado
+
+def _verificar(tarefa, calcular_hash):
+    caminho, destino = tarefa
+    return verificar_imagem(caminho, destino, calcular_hash)
+
+def verificar_imagens(tarefas, calcular_hash=False, workers=None):
+    """Verifica [(caminho, destino ou None)] num pool de processos; gera os resultados na ordem"""
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(partial(_verificar, calcular_hash=calcular_hash), tarefas, chunksize=CHUNK_SIZE)